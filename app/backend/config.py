@@ -25,9 +25,18 @@ class Config:
 
    PAGE_TITLE = "Scalable-Chatbot"
    OLLAMA_MODELS = ('deepseek-r1:1.5b', 'qwen2.5', 'granite3.2-vision')
+   REASONING_MODELS = ('deepseek-r1:1.5b',)  # Models that wrap their reasoning in <think>...</think>
+   TOOL_SELECTION_PROMPT = os.getenv("TOOL_SELECTION_PROMPT", "short")  # "short" (schema-constrained) or "full" (with examples)
+   TOOL_SELECTION_MAX_TOKENS = 128  # Output cap for a tool selection call
    
    WEB_SEARCH_HOST = os.getenv("WEB_SEARCH_HOST", "web-search")
    WEB_SEARCH_PORT = os.getenv("WEB_SEARCH_PORT", 5069)
+   WEB_SEARCH_RETRIEVAL = os.getenv("WEB_SEARCH_RETRIEVAL", "ephemeral")  # "ephemeral" (in-memory ranking) or "qdrant" (store, search, delete)
+   # Persistent cross-user cache of scraped pages; takes precedence over WEB_SEARCH_RETRIEVAL when enabled
+   WEB_CORPUS_ENABLED = os.getenv("WEB_CORPUS_ENABLED", "true").lower() == "true"
+   WEB_CORPUS_COLLECTION = "web_corpus"
+   WEB_CORPUS_TTL = float(os.getenv("WEB_CORPUS_TTL_HOURS", 24)) * 3600  # Seconds before a cached page is scraped again
+   WEB_CORPUS_EXPIRY_INTERVAL = float(os.getenv("WEB_CORPUS_EXPIRY_MINUTES", 60)) * 60  # Seconds between sweeps of chunks older than the TTL
    
    POSTGRES_HOST = os.getenv("POSTGRES_HOST", "postgres")
    POSTGRES_PORT = os.getenv("POSTGRES_PORT", 6432)
@@ -38,12 +47,117 @@ class Config:
    REDIS_HOST = os.getenv("REDIS_HOST", "redis")
    REDIS_PORT = os.getenv("REDIS_PORT", 6379)
    
+   # Conversation memory: recent turns verbatim, older turns folded into a rolling summary
+   RECENT_CONTEXT_MESSAGES = 8  # Messages kept verbatim in Redis
+   SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "qwen2.5")  # Summaries and RAPTOR; must be pulled (see README), e.g. qwen2.5:0.5b
+   SUMMARY_EVERY_N_TURNS = int(os.getenv("SUMMARY_EVERY_N_TURNS", 4))  # Turns between summary updates
+   SUMMARY_MAX_WORDS = 200
+   SUMMARY_MAX_TOKENS = 384
+
    OLLAMA_HOST = os.getenv("OLLAMA_HOST", "ollama")
    OLLAMA_PORT = os.getenv("OLLAMA_PORT", 11434)
    
+   # Model residency: how long Ollama keeps a model loaded after a call, and which models are preloaded at startup
+   OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "24h")
+   MODEL_KEEP_ALIVE = {}  # Per-model overrides, e.g. {"granite3.2-vision": "10m"}
+   OLLAMA_WARMUP_ENABLED = os.getenv("OLLAMA_WARMUP_ENABLED", "true").lower() == "true"
+   OLLAMA_WARMUP_MODELS = OLLAMA_MODELS
+
+   # Vision uploads: downsized to the encoder's input size, answers cached per (image, prompt)
+   VISION_MAX_SIDE = int(os.getenv("VISION_MAX_SIDE", 768))  # Longest side sent to the model (2x2 tiles of the 384px encoder)
+   VISION_THUMBNAIL_SIDE = 256
+   VISION_JPEG_QUALITY = 85
+   VISION_CACHE_TTL = 86400  # Seconds encoded payloads and answers stay cached
+   ATTACHMENT_DIR = os.getenv("ATTACHMENT_DIR", "/data/attachments")  # Originals and thumbnails (shared by app and chat API)
+
+   # Chunking (backend/utils/text_splitter.py), measured in tokens of the embedding model's tokenizer
+   SPLITTER_CHUNK_TOKENS = int(os.getenv("SPLITTER_CHUNK_TOKENS", 200))  # all-MiniLM-L6-v2 truncates inputs at 256 tokens
+   SPLITTER_OVERLAP_TOKENS = int(os.getenv("SPLITTER_OVERLAP_TOKENS", 40))
+
+   # Hybrid retrieval: dense and SPLADE prefetch fused with RRF in Qdrant. Applies to collections
+   # created while it is enabled (sparse vectors cannot be added to an existing collection)
+   HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH_ENABLED", "false").lower() == "true"
+   HYBRID_PREFETCH_LIMIT = 40  # Candidates per prefetch before fusion
+
+   # Retrieved context (backend/utils/context_selection.py): near-duplicates dropped, MMR order, token budget
+   RAG_CANDIDATES = 20  # Chunks fetched per search before selection
+   RAG_MAX_RESULTS = 6
+   RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", 1200))  # Budget for all retrieved chunks together
+   RAG_MMR_LAMBDA = 0.7  # Relevance weight; lower values favour diversity
+   RAG_SIMHASH_DISTANCE = 3  # Differing bits (of 64) up to which two texts count as near-duplicates
+
+   # Document uploads (backend/utils/document_ingest.py), streamed from disk page by page
+   DOCUMENT_COLLECTION = "uploaded_documents"
+   DOCUMENT_TYPES = ["pdf", "txt", "md", "docx"]
+   INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 64))  # Chunks embedded and upserted together
+   INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 2))  # Embedding/upsert threads per process, shared by all uploads
+   INGEST_MAX_PENDING_BATCHES = 4  # Batches in flight per upload before extraction waits (bounds memory)
+   INGEST_TEXT_PAGE_CHARS = 4000  # Page size for formats without pages (TXT, MD, DOCX)
+   INGEST_RAPTOR_ENABLED = os.getenv("INGEST_RAPTOR_ENABLED", "false").lower() == "true"  # Also build a summary tree per session
+   INGEST_RAPTOR_PAGES = 50  # Pages added to the tree per update
+
+   # RAPTOR summary tree (backend/utils/raptor.py)
+   RAPTOR_COLLECTION = "raptor_tree"
+   RAPTOR_SUMMARY_MODEL = os.getenv("RAPTOR_SUMMARY_MODEL", SUMMARY_MODEL)
+   RAPTOR_CLUSTER_SIZE = 8  # Target children per summary node
+   RAPTOR_MAX_CHILDREN = 16  # Full branches are not extended by incremental builds
+   RAPTOR_MIN_CLUSTER_INPUT = 3  # Fewer parentless nodes than this are not summarized on their own
+   RAPTOR_MAX_LEVELS = 4
+   RAPTOR_ASSIGN_THRESHOLD = 0.6  # Cosine similarity needed to join an existing branch
+   RAPTOR_SUMMARY_MAX_TOKENS = 256
+   RAPTOR_SUMMARY_INPUT_TOKENS = 3000  # Children text sent per summary call
+   RAPTOR_SUMMARY_WORKERS = 4
+   RAPTOR_TOKEN_BUDGET = int(os.getenv("RAPTOR_TOKEN_BUDGET", 2000))  # Context tokens per retrieval
+   RAPTOR_CANDIDATES = 40  # Nodes ranked before applying the budget
+   RAPTOR_LOCK_SECONDS = 600
+
+   # Chunk embedding cache in Redis, keyed by (model, sha1(text))
+   EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+   EMBEDDING_CACHE_TTL = 30 * 86400  # Seconds; vectors of a given text never change for a model
+
+   # Per-call LLM telemetry (TTFT, tokens/sec, token counts, queue time)
+   TELEMETRY_RECENT_CALLS = 500  # Calls kept for percentiles
+   TELEMETRY_LOG_CALLS = os.getenv("TELEMETRY_LOG_CALLS", "false").lower() == "true"
+   DEBUG_PANEL = os.getenv("DEBUG_PANEL", "false").lower() == "true"  # Show the telemetry panel by default
+   
+   # LLM admission control (Redis-backed fair queue in front of Ollama)
+   ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+   ADMISSION_DEFAULT_CONCURRENCY = int(os.getenv("ADMISSION_DEFAULT_CONCURRENCY", 4))  # Match OLLAMA_NUM_PARALLEL
+   ADMISSION_MODEL_CONCURRENCY = {}  # Per-model overrides, e.g. {"qwen2.5": 2}
+   ADMISSION_REQUEST_COST_MS = 2000  # Virtual time charged per call for per-user fairness
+   ADMISSION_LEASE_SECONDS = 60  # Slot lease, renewed while a stream is running
+   ADMISSION_STALE_SECONDS = 10  # Waiters that stop polling for this long are dropped
+   ADMISSION_POLL_INTERVAL = 0.1
+   ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", 120))
+
+   # Chat API (chat_api.py); when set, the Streamlit app streams turns from it instead of running them in-process
+   CHAT_API_URL = os.getenv("CHAT_API_URL", "").rstrip("/")
+   CHAT_API_TIMEOUT = float(os.getenv("CHAT_API_TIMEOUT", 300))  # Seconds to wait between streamed events
+   CHAT_API_WORKERS = int(os.getenv("CHAT_API_WORKERS", 32))  # Concurrent turns per API process
+
    QDRANT_HOST = os.getenv("QDRANT_HOST", "localhost")
    QDRANT_PORT = int(os.getenv("QDRANT_PORT", 6333))
-   
+   # Collection layout (VectorStoreManager.ensure_collection; migrate existing ones with migrate_qdrant.py)
+   QDRANT_QUANTIZATION = os.getenv("QDRANT_QUANTIZATION", "true").lower() == "true"  # int8 vectors in RAM, float32 originals on disk
+   QDRANT_QUANTILE = 0.99  # Outliers beyond this quantile are clipped when quantizing
+   QDRANT_OVERSAMPLING = 2.0  # Quantized candidates per result, rescored with the original vectors
+   QDRANT_TENANT_KEY = os.getenv("QDRANT_TENANT_KEY", "session_id")  # Payload key session-scoped collections are partitioned by; queries must filter on it
+   QDRANT_PAYLOAD_M = 16  # HNSW links within each tenant's graph
+
+   # Streamed output is re-rendered at most every STREAM_FLUSH_INTERVAL seconds or STREAM_FLUSH_TOKENS tokens
+   STREAM_FLUSH_INTERVAL = float(os.getenv("STREAM_FLUSH_INTERVAL", 0.05))
+   STREAM_FLUSH_TOKENS = int(os.getenv("STREAM_FLUSH_TOKENS", 20))
+
+   # Calculator limits: keep a single hostile expression from pinning a worker
+   CALCULATOR_MAX_LENGTH = 500  # Characters in an expression
+   CALCULATOR_MAX_STEPS = 2000  # AST nodes visited per evaluation
+   CALCULATOR_MAX_DIGITS = 1000  # Digits allowed in any integer operand or result
+   CALCULATOR_MAX_EXPONENT = 10000  # Largest allowed |exponent|
+   CALCULATOR_MAX_FACTORIAL = 450  # Largest factorial/comb/perm argument (~1000 digits)
+   CALCULATOR_USE_PROCESS = os.getenv("CALCULATOR_USE_PROCESS", "false").lower() == "true"  # Evaluate in a worker process
+   CALCULATOR_TIMEOUT = 2.0  # Seconds before the worker process is killed
+   CALCULATOR_WORKERS = int(os.getenv("CALCULATOR_WORKERS", 2))  # Worker processes evaluating at once
+
    CALCULATOR_CONTEXT = """### **CALCULATOR OUTPUT FORMATTING INSTRUCTIONS:**  
 
 1. **Mathematical Expressions:**  
@@ -114,6 +228,14 @@ Ensure that:
    # Web search evaluation configuration
    WEB_SEARCH_EVALUATION_ENABLED = True
    WEB_SEARCH_EVALUATION_MODEL = "qwen2.5"  # Model to use for evaluation
+   EVALUATION_MAX_WORKERS = int(os.getenv("EVALUATION_MAX_WORKERS", 4))  # Concurrent evaluation batches
+   EVALUATION_NUM_CTX = 8192  # Context window for each evaluation call
+   EVALUATION_MAX_BATCH_SIZE = 8  # Upper bound on statements per evaluation call
+   EVALUATION_TOKENS_PER_STATEMENT = 60  # Output tokens reserved per evaluated statement
+   EVALUATION_PREFILTER_ENABLED = True  # Accept near-verbatim statements by embedding similarity
+   EVALUATION_SUPPORT_THRESHOLD = float(os.getenv("EVALUATION_SUPPORT_THRESHOLD", 0.9))  # Cosine similarity treated as supported
+   EVALUATION_EVIDENCE_CHUNKS = 3  # Top-matching search chunks sent per statement
+   EVALUATION_PREFILTER_AUDIT = os.getenv("EVALUATION_PREFILTER_AUDIT", "false").lower() == "true"  # Also run the LLM-only baseline and log agreement
 
    # Evaluation prompts
    EVALUATION_PROMPT_TEMPLATE = """
@@ -0,0 +1,181 @@
+# backend/utils/admission.py
+import time
+import uuid
+import logging
+import redis
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+from backend.config import Config
+
+# Priority classes: lower is served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_TOOL_SELECTION = 1
+PRIORITY_EVALUATION = 2
+PRIORITY_BACKGROUND = 3
+
+class AdmissionTimeout(Exception):
+    """Raised when no model slot frees up within ADMISSION_MAX_WAIT seconds"""
+
+# Give the ticket a fair-queuing score: priority class first, then the user's virtual
+# finish time, so a user with many queued calls is interleaved with everyone else
+ENQUEUE_SCRIPT = """
+local now = tonumber(ARGV[4])
+local last = tonumber(redis.call('HGET', KEYS[2], ARGV[2]) or '0')
+local finish = math.max(now, last) + tonumber(ARGV[5])
+redis.call('HSET', KEYS[2], ARGV[2], finish)
+redis.call('EXPIRE', KEYS[2], tonumber(ARGV[6]))
+redis.call('ZADD', KEYS[1], tonumber(ARGV[3]) * 1e13 + finish, ARGV[1])
+redis.call('ZADD', KEYS[3], now, ARGV[1])
+return finish
+"""
+
+# Admit the ticket if it is within the free slots at the head of the queue.
+# Returns 0 when admitted, the 1-based queue position otherwise, -1 if the ticket was dropped
+ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+local stale = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', now - tonumber(ARGV[5]))
+for _, ticket in ipairs(stale) do
+    redis.call('ZREM', KEYS[1], ticket)
+    redis.call('ZREM', KEYS[3], ticket)
+end
+local rank = redis.call('ZRANK', KEYS[1], ARGV[1])
+if not rank then
+    return -1
+end
+redis.call('ZADD', KEYS[3], now, ARGV[1])
+local free = tonumber(ARGV[4]) - redis.call('ZCARD', KEYS[2])
+if rank < free then
+    redis.call('ZREM', KEYS[1], ARGV[1])
+    redis.call('ZREM', KEYS[3], ARGV[1])
+    redis.call('ZADD', KEYS[2], now + tonumber(ARGV[3]), ARGV[1])
+    return 0
+end
+return rank + 1
+"""
+
+class AdmissionController:
+    """
+    Redis-backed admission in front of Ollama: per-user fair queuing, priority
+    classes and a global concurrency cap per model shared by every app process.
+    Slots are leases, so a crashed process cannot hold one forever.
+    """
+    _client = None
+    _enqueue = None
+    _acquire = None
+
+    @classmethod
+    def get_client(cls):
+        if cls._client is None:
+            cls._client = redis.Redis(host=Config.REDIS_HOST, port=Config.REDIS_PORT, db=0)
+            cls._enqueue = cls._client.register_script(ENQUEUE_SCRIPT)
+            cls._acquire = cls._client.register_script(ACQUIRE_SCRIPT)
+        return cls._client
+
+    @staticmethod
+    def _keys(model: str):
+        return (f"llm:queue:{model}", f"llm:active:{model}", f"llm:heartbeat:{model}", f"llm:vtime:{model}")
+
+    @staticmethod
+    def capacity(model: str) -> int:
+        return Config.ADMISSION_MODEL_CONCURRENCY.get(model, Config.ADMISSION_DEFAULT_CONCURRENCY)
+
+    @classmethod
+    def _enqueue_ticket(cls, model: str, ticket: str, user_id, priority: int):
+        queue, _, heartbeat, vtime = cls._keys(model)
+        cls._enqueue(
+            keys=[queue, vtime, heartbeat],
+            args=[ticket, str(user_id), priority, int(time.time() * 1000), Config.ADMISSION_REQUEST_COST_MS, 3600]
+        )
+
+    @classmethod
+    def _try_acquire(cls, model: str, ticket: str) -> int:
+        queue, active, heartbeat, _ = cls._keys(model)
+        return int(cls._acquire(
+            keys=[queue, active, heartbeat],
+            args=[ticket, int(time.time() * 1000), int(Config.ADMISSION_LEASE_SECONDS * 1000),
+                  cls.capacity(model), int(Config.ADMISSION_STALE_SECONDS * 1000)]
+        ))
+
+    @classmethod
+    def renew(cls, model: str, ticket: str):
+        """Extend the lease of a running call (long streams)"""
+        _, active, _, _ = cls._keys(model)
+        expiry = int((time.time() + Config.ADMISSION_LEASE_SECONDS) * 1000)
+        cls.get_client().zadd(active, {ticket: expiry}, xx=True)
+
+    @classmethod
+    def release(cls, model: str, ticket: str):
+        queue, active, heartbeat, _ = cls._keys(model)
+        with cls.get_client().pipeline() as pipe:
+            pipe.zrem(active, ticket)
+            pipe.zrem(queue, ticket)
+            pipe.zrem(heartbeat, ticket)
+            pipe.execute()
+
+    @classmethod
+    @contextmanager
+    def admit(cls, model: str, user_id=None, priority: int = PRIORITY_INTERACTIVE, on_wait: Optional[Callable[[int], None]] = None) -> Iterator[Optional[str]]:
+        """
+        Block until a slot for `model` is free, then hold it for the with-block.
+        on_wait(position) is called whenever the queue position changes and with 0 once admitted.
+        Fails open (no admission control) if Redis is unavailable.
+        """
+        if not Config.ADMISSION_ENABLED:
+            yield None
+            return
+
+        ticket = uuid.uuid4().hex
+        try:
+            cls.get_client()
+            cls._enqueue_ticket(model, ticket, user_id if user_id is not None else "anonymous", priority)
+            deadline = time.monotonic() + Config.ADMISSION_MAX_WAIT
+            delay = Config.ADMISSION_POLL_INTERVAL
+            last_position = None
+            while True:
+                position = cls._try_acquire(model, ticket)
+                if position == 0:
+                    break
+                if position == -1:
+                    # Ticket was dropped as stale (e.g. a long GC pause): queue again
+                    cls._enqueue_ticket(model, ticket, user_id if user_id is not None else "anonymous", priority)
+                    continue
+                if position != last_position and on_wait:
+                    on_wait(position)
+                last_position = position
+                if time.monotonic() > deadline:
+                    cls.release(model, ticket)
+                    raise AdmissionTimeout(f"{model} is busy, please try again shortly")
+                time.sleep(delay)
+                delay = min(delay * 1.5, Config.ADMISSION_POLL_INTERVAL * 5)
+            if last_position is not None and on_wait:
+                on_wait(0)
+        except redis.RedisError as e:
+            logging.warning(f"Admission control unavailable, continuing without it: {e}")
+            yield None
+            return
+
+        try:
+            yield ticket
+        finally:
+            try:
+                cls.release(model, ticket)
+            except redis.RedisError as e:
+                logging.warning(f"Could not release slot {ticket}; its lease will expire: {e}")
+
+    @classmethod
+    def admitted_stream(cls, stream_factory: Callable[[], Iterator], model: str, user_id=None, priority: int = PRIORITY_INTERACTIVE, on_wait: Optional[Callable[[int], None]] = None) -> Iterator:
+        """
+        Lazily admit a streaming call: the slot is taken when iteration starts and
+        released when the stream is exhausted or closed.
+        """
+        with cls.admit(model, user_id, priority, on_wait) as ticket:
+            last_renewal = time.monotonic()
+            for chunk in stream_factory():
+                if ticket and time.monotonic() - last_renewal > Config.ADMISSION_LEASE_SECONDS / 3:
+                    try:
+                        cls.renew(model, ticket)
+                    except redis.RedisError:
+                        pass
+                    last_renewal = time.monotonic()
+                yield chunk
@@ -0,0 +1,275 @@
+# backend/utils/calculator.py
+import ast
+import math
+import operator
+import threading
+import multiprocessing
+from functools import lru_cache
+from typing import Union
+from backend.config import Config
+
+Number = Union[int, float]
+
+class CalculatorError(ValueError):
+    """Raised when an expression is invalid or exceeds the evaluation limits"""
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+
+UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+CONSTANTS = {
+    "pi": math.pi,
+    "e": math.e,
+    "tau": math.tau,
+}
+
+FUNCTIONS = {
+    "sqrt": math.sqrt,
+    "cbrt": lambda x: math.copysign(abs(x) ** (1 / 3), x),
+    "exp": math.exp,
+    "log": math.log,
+    "ln": math.log,
+    "log10": math.log10,
+    "log2": math.log2,
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "asin": math.asin,
+    "acos": math.acos,
+    "atan": math.atan,
+    "atan2": math.atan2,
+    "sinh": math.sinh,
+    "cosh": math.cosh,
+    "tanh": math.tanh,
+    "degrees": math.degrees,
+    "radians": math.radians,
+    "hypot": math.hypot,
+    "floor": math.floor,
+    "ceil": math.ceil,
+    "abs": abs,
+    "round": round,
+    "min": min,
+    "max": max,
+    "factorial": math.factorial,
+    "comb": math.comb,
+    "perm": math.perm,
+    "gcd": math.gcd,
+}
+
+# Characters users type that Python does not understand
+REPLACEMENTS = {
+    "^": "**",
+    "×": "*",
+    "÷": "/",
+    "−": "-",
+    "π": "pi",
+}
+
+def normalize_expression(expression: str) -> str:
+    """Canonical form used for parsing and as the memoization key"""
+    normalized = expression.strip().rstrip("=").strip()
+    for old, new in REPLACEMENTS.items():
+        normalized = normalized.replace(old, new)
+    # Thousands separators: 10,000 -> 10000 (function arguments keep their commas)
+    normalized = _strip_thousands_separators(normalized)
+    return " ".join(normalized.split())
+
+def _strip_thousands_separators(expression: str) -> str:
+    """Remove commas that sit between a digit and exactly three digits"""
+    out = []
+    length = len(expression)
+    for i, char in enumerate(expression):
+        if (
+            char == ","
+            and 0 < i < length - 3
+            and expression[i - 1].isdigit()
+            and expression[i + 1:i + 4].isdigit()
+            and (i + 4 == length or not expression[i + 4].isdigit())
+        ):
+            continue
+        out.append(char)
+    return "".join(out)
+
+class _Evaluator:
+    """Walks a parsed expression, counting steps and checking operand sizes"""
+
+    def __init__(self):
+        self.steps = 0
+        self.max_digits = Config.CALCULATOR_MAX_DIGITS
+        self.max_exponent = Config.CALCULATOR_MAX_EXPONENT
+        self.max_steps = Config.CALCULATOR_MAX_STEPS
+
+    def evaluate(self, node) -> Number:
+        self.steps += 1
+        if self.steps > self.max_steps:
+            raise CalculatorError("Expression is too long to evaluate")
+
+        if isinstance(node, ast.Expression):
+            return self.evaluate(node.body)
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                raise CalculatorError(f"Unsupported value: {node.value!r}")
+            return self._check(node.value)
+        if isinstance(node, ast.Name):
+            if node.id not in CONSTANTS:
+                raise CalculatorError(f"Unknown name: {node.id}")
+            return CONSTANTS[node.id]
+        if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+            return UNARY_OPERATORS[type(node.op)](self.evaluate(node.operand))
+        if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+            left = self.evaluate(node.left)
+            right = self.evaluate(node.right)
+            return self._binary(type(node.op), left, right)
+        if isinstance(node, ast.Call):
+            return self._call(node)
+
+        raise CalculatorError(f"Unsupported syntax: {type(node).__name__}")
+
+    def _check(self, value: Number) -> Number:
+        """Reject integers with too many digits and non-finite floats"""
+        if isinstance(value, int):
+            if value.bit_length() * 0.30103 > self.max_digits:
+                raise CalculatorError(f"Number exceeds {self.max_digits} digits")
+        elif isinstance(value, float) and not math.isfinite(value):
+            raise CalculatorError("Result is not a finite number")
+        return value
+
+    def _digits(self, value: Number) -> float:
+        """Approximate number of decimal digits in the integer part"""
+        if isinstance(value, int):
+            return value.bit_length() * 0.30103
+        return math.log10(abs(value)) if abs(value) >= 1 else 0
+
+    def _binary(self, op, left: Number, right: Number) -> Number:
+        if op is ast.Pow:
+            if abs(right) > self.max_exponent:
+                raise CalculatorError(f"Exponent exceeds {self.max_exponent}")
+            if abs(left) > 1 and self._digits(left) * abs(right) > self.max_digits:
+                raise CalculatorError(f"Result would exceed {self.max_digits} digits")
+        elif op is ast.Mult and isinstance(left, int) and isinstance(right, int):
+            if self._digits(left) + self._digits(right) > self.max_digits:
+                raise CalculatorError(f"Result would exceed {self.max_digits} digits")
+        try:
+            result = BINARY_OPERATORS[op](left, right)
+        except ZeroDivisionError:
+            raise CalculatorError("Division by zero")
+        except OverflowError:
+            raise CalculatorError("Result is too large")
+        if isinstance(result, complex):
+            raise CalculatorError("Result is a complex number")
+        return self._check(result)
+
+    def _call(self, node: ast.Call) -> Number:
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+            name = getattr(node.func, "id", type(node.func).__name__)
+            raise CalculatorError(f"Unknown function: {name}")
+        if node.keywords:
+            raise CalculatorError("Keyword arguments are not supported")
+
+        name = node.func.id
+        args = [self.evaluate(arg) for arg in node.args]
+        if name in ("factorial", "comb", "perm") and any(
+            not isinstance(arg, int) or abs(arg) > Config.CALCULATOR_MAX_FACTORIAL for arg in args
+        ):
+            raise CalculatorError(f"{name} is limited to integers up to {Config.CALCULATOR_MAX_FACTORIAL}")
+        try:
+            result = FUNCTIONS[name](*args)
+        except (ValueError, TypeError) as e:
+            raise CalculatorError(f"{name}: {e}")
+        except OverflowError:
+            raise CalculatorError("Result is too large")
+        return self._check(result)
+
+def _evaluate_normalized(normalized: str) -> Number:
+    if not normalized:
+        raise CalculatorError("Invalid mathematical expression")
+    if len(normalized) > Config.CALCULATOR_MAX_LENGTH:
+        raise CalculatorError("Expression is too long to evaluate")
+    try:
+        tree = ast.parse(normalized, mode="eval")
+    except SyntaxError:
+        raise CalculatorError("Invalid mathematical expression")
+    return _Evaluator().evaluate(tree)
+
+def _evaluate_in_worker(normalized: str):
+    """Worker-process entry point; returns (ok, value_or_message) so errors pickle cleanly"""
+    try:
+        return True, _evaluate_normalized(normalized)
+    except CalculatorError as e:
+        return False, str(e)
+
+class _WorkerPool:
+    """
+    Up to CALCULATOR_WORKERS single-process pools, checked out one per evaluation.
+    The lock only guards checkout and return; a worker that times out is killed and replaced.
+    """
+    _idle = []
+    _lock = threading.Lock()
+    _slots = threading.BoundedSemaphore(Config.CALCULATOR_WORKERS)
+
+    @classmethod
+    def _checkout(cls):
+        cls._slots.acquire()
+        with cls._lock:
+            if cls._idle:
+                return cls._idle.pop()
+        try:
+            return multiprocessing.get_context("spawn").Pool(processes=1)
+        except Exception:
+            cls._slots.release()
+            raise
+
+    @classmethod
+    def _checkin(cls, worker):
+        if worker is not None:
+            with cls._lock:
+                cls._idle.append(worker)
+        cls._slots.release()
+
+    @classmethod
+    def run(cls, normalized: str, timeout: float):
+        worker = cls._checkout()
+        try:
+            return worker.apply_async(_evaluate_in_worker, (normalized,)).get(timeout=timeout)
+        except multiprocessing.TimeoutError:
+            worker.terminate()
+            worker = None
+            return False, f"Evaluation timed out after {timeout} seconds"
+        except Exception:
+            worker.terminate()
+            worker = None
+            raise
+        finally:
+            cls._checkin(worker)
+
+@lru_cache(maxsize=1024)
+def _cached_evaluate(normalized: str, use_process: bool) -> Number:
+    # Errors raise instead of returning, so lru_cache keeps only successful results
+    if use_process:
+        ok, value = _WorkerPool.run(normalized, Config.CALCULATOR_TIMEOUT)
+    else:
+        ok, value = _evaluate_in_worker(normalized)
+    if not ok:
+        raise CalculatorError(value)
+    return value
+
+def calculate(expression: str, use_process: bool = None) -> Number:
+    """
+    Evaluate a math expression with bounded cost.
+    Successful results are memoized by normalized expression; errors and timeouts are not.
+    Raises CalculatorError for invalid input or when a limit is hit.
+    """
+    if use_process is None:
+        use_process = Config.CALCULATOR_USE_PROCESS
+    return _cached_evaluate(normalize_expression(expression), use_process)
@@ -0,0 +1,78 @@
+# backend/utils/chat_client.py
+import json
+import httpx
+from typing import Dict, Iterator, Optional
+from backend.config import Config
+from backend.utils.chat_pipeline import run_turn, run_evaluation, run_ingest, save_response, stream_events
+from backend.utils.telemetry import LLMTelemetry
+from backend.utils.embedding_cache import EmbeddingCache
+
+class ChatClient:
+    """
+    Event source for the Streamlit UI. Streams from the chat API over SSE when
+    CHAT_API_URL is set, otherwise runs the same pipeline in-process.
+    """
+
+    @staticmethod
+    def _sse(path: str, payload: Dict) -> Iterator[Dict]:
+        timeout = httpx.Timeout(Config.CHAT_API_TIMEOUT, connect=5.0)
+        try:
+            with httpx.stream("POST", f"{Config.CHAT_API_URL}{path}", json=payload, timeout=timeout) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if line.startswith("data:"):
+                        yield json.loads(line[5:].strip())
+        except httpx.HTTPError as e:
+            yield {"type": "error", "message": f"Chat service error: {str(e)}"}
+
+    @classmethod
+    def stream_turn(cls, user_id, session_id, model: str, prompt: str, image: Optional[Dict] = None) -> Iterator[Dict]:
+        if Config.CHAT_API_URL:
+            return cls._sse("/chat", {
+                "user_id": str(user_id), "session_id": str(session_id) if session_id else None,
+                "model": model, "prompt": prompt, "image": image
+            })
+        return stream_events(run_turn, user_id=user_id, session_id=session_id, model=model, prompt=prompt, image=image)
+
+    @classmethod
+    def stream_evaluation(cls, user_id, session_id, model: str, response: str, search_results: Optional[str]) -> Iterator[Dict]:
+        if Config.CHAT_API_URL:
+            return cls._sse("/chat/evaluate", {
+                "user_id": str(user_id), "session_id": str(session_id),
+                "model": model, "response": response, "search_results": search_results
+            })
+        return stream_events(run_evaluation, user_id=user_id, session_id=session_id, model=model,
+                             response=response, search_results=search_results)
+
+    @classmethod
+    def stream_ingest(cls, user_id, session_id, model: str, document_id: str, file_name: str, file_type: str) -> Iterator[Dict]:
+        """Index a document saved with document_ingest.save_upload"""
+        if Config.CHAT_API_URL:
+            return cls._sse("/documents/ingest", {
+                "user_id": str(user_id), "session_id": str(session_id) if session_id else None, "model": model,
+                "document_id": document_id, "file_name": file_name, "file_type": file_type
+            })
+        return stream_events(run_ingest, user_id=user_id, session_id=session_id, model=model,
+                             document_id=document_id, file_name=file_name, file_type=file_type)
+
+    @classmethod
+    def telemetry_summary(cls) -> Dict:
+        """Aggregated LLM call and embedding cache stats of whichever process runs the pipeline"""
+        if Config.CHAT_API_URL:
+            try:
+                response = httpx.get(f"{Config.CHAT_API_URL}/metrics/summary", timeout=5.0)
+                response.raise_for_status()
+                return response.json()
+            except httpx.HTTPError:
+                return {"llm": [], "embedding_cache": {}}
+        return {"llm": LLMTelemetry.summary(), "embedding_cache": EmbeddingCache.stats()}
+
+    @classmethod
+    def save_response(cls, session_id, response: str):
+        """Keep an answer without evaluating it"""
+        if Config.CHAT_API_URL:
+            httpx.post(f"{Config.CHAT_API_URL}/chat/save",
+                       json={"session_id": str(session_id), "response": response},
+                       timeout=Config.CHAT_API_TIMEOUT).raise_for_status()
+        else:
+            save_response(session_id, response)
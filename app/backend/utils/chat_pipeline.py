@@ -0,0 +1,246 @@
+# backend/utils/chat_pipeline.py
+import hashlib
+import logging
+import queue
+import threading
+import ollama
+from typing import Callable, Dict, Iterator, Optional
+from backend.config import Config
+from backend.utils.llm_helper import select_tool, execute_tool, generate_response, stream_parser, keep_alive_for
+from backend.utils.postgres_manager import PostgresManager
+from backend.utils.redis_manager import RedisManager
+from backend.utils.conversation_memory import ConversationMemory
+from backend.utils.admission import AdmissionTimeout, PRIORITY_INTERACTIVE
+from backend.utils.telemetry import LLMTelemetry
+from backend.utils.evaluation import evaluate_statements
+from backend.utils.segmenter import segment_statements, apply_highlighting
+from backend.utils.reasoning_parser import parse_reasoning_stream, REASONING, ANSWER
+from backend.utils.image_pipeline import vision_cache_key
+from backend.utils.document_ingest import DocumentIngestor, document_path, is_document_id, is_supported
+
+# Events are plain JSON-serializable dicts so they can go over SSE unchanged:
+#   {"type": "session", "session_id"}              new session created for this turn
+#   {"type": "status", "label"?, "state"?, "text"?} progress of tool/evaluation steps
+#   {"type": "queue", "position"}                  waiting for a model slot (0 once admitted)
+#   {"type": "reasoning", "text"} / {"type": "token", "text"}
+#   {"type": "stats", "model", "call", "ttft", "tokens_per_second", ...}  one per LLM call
+#   {"type": "progress", "pages", "total_pages", "chunks", "pages_per_second"}  document ingestion
+#   {"type": "error", "message"}
+#   {"type": "done", "session_id", "response", "evaluation_pending", "search_results"}
+#   {"type": "done", "session_id", "document_id", "pages", "chunks", "seconds", "pages_per_second"}  ingestion
+Emit = Callable[[Dict], None]
+
+def _status(emit: Emit, text: Optional[str] = None, label: Optional[str] = None, state: Optional[str] = None):
+    event = {"type": "status"}
+    if text is not None:
+        event["text"] = text
+    if label is not None:
+        event["label"] = label
+    if state is not None:
+        event["state"] = state
+    emit(event)
+
+def save_response(session_id, response: str):
+    """Persist an assistant message and schedule the rolling summary update"""
+    PostgresManager.add_message(session_id, "assistant", response)
+    ConversationMemory.schedule_update(session_id)
+
+def run_turn(user_id, session_id, model: str, prompt: str, image: Optional[Dict] = None, emit: Emit = lambda event: None) -> Dict:
+    """
+    One chat turn: tool selection, web search/RAG, generation and persistence.
+    `image` is the output of image_pipeline.prepare_image (vision model only). Returns the done event.
+    Independent of Streamlit, so it runs the same in the UI process and in the chat API.
+    """
+    if model != "granite3.2-vision":
+        image = None
+
+    if not session_id:
+        session_id = PostgresManager.create_chat_session(
+            user_id,
+            model,
+            title=prompt[:50] + "..." if len(prompt) > 50 else prompt
+        )
+        emit({"type": "session", "session_id": str(session_id)})
+
+    # add_message also pushes the message to the recent Redis context
+    message_id = PostgresManager.add_message(session_id, "user", prompt)
+    if image and message_id:
+        PostgresManager.add_message_attachments(message_id, image["attachments"])
+
+    if image:
+        cache_key = vision_cache_key(model, image["hash"], prompt)
+        cache_ttl = Config.VISION_CACHE_TTL
+    else:
+        cache_key = f"chat:{model}:{hashlib.md5(prompt.encode()).hexdigest()}"
+        cache_ttl = 3600
+    cached_response = RedisManager.get_cached_response(cache_key)
+    if cached_response:
+        emit({"type": "token", "text": cached_response})
+        save_response(session_id, cached_response)
+        done = {"type": "done", "session_id": str(session_id), "response": cached_response,
+                "evaluation_pending": False, "search_results": None}
+        emit(done)
+        return done
+
+    messages = RedisManager.get_recent_context(session_id)
+    on_wait = lambda position: emit({"type": "queue", "position": position})
+    on_stats = lambda stats: emit({"type": "stats", **stats})
+    is_web_search = False
+    search_results = None
+
+    if model == "granite3.2-vision":
+        _status(emit, label="🛠️ Processing Image...", state="running")
+        vision_messages = ConversationMemory.build_context(session_id, messages, prompt)
+        if image:
+            vision_messages[-1]["images"] = [image["payload"]]
+        stream = LLMTelemetry.instrumented_stream(
+            lambda: ollama.chat(model=model, messages=vision_messages, stream=True, keep_alive=keep_alive_for(model)),
+            model,
+            "vision",
+            user_id,
+            PRIORITY_INTERACTIVE,
+            on_wait,
+            on_stats
+        )
+        _status(emit, label="✅ Image processing complete!", state="complete")
+
+    # Qwen - Function Calling
+    elif model == "qwen2.5":
+        _status(emit, label="🛠️ Processing tools...", state="running")
+        _status(emit, text="🔍 Analyzing query for tool requirements...")
+        tool_selection = select_tool(model, prompt, user_id, on_wait, on_stats)
+        tool_name = tool_selection.get("tool", "none")
+        tool_results = ""
+        tool_context = None
+
+        if tool_name != "none":
+            _status(emit, text=f"🛠️ Selected tool: {tool_name.replace('_', ' ')}")
+            parameters = tool_selection.get("parameters", {})
+            tool_results = execute_tool(tool_name, parameters, session_id, lambda message: _status(emit, text=message), user_id)
+
+            is_web_search = (tool_name == "web_search")
+            if is_web_search:
+                search_results = tool_results
+
+            if tool_name == "calculator":
+                tool_context = Config.CALCULATOR_CONTEXT
+            elif tool_name == "web_search":
+                tool_context = Config.WEB_SEARCH_CONTEXT
+            else:
+                tool_context = Config.SYSTEM_PROMPT
+
+        context = ConversationMemory.build_context(
+            session_id,
+            messages,
+            prompt,
+            f"""**TOOL RESULTS FROM {tool_name.upper()}:**\n{tool_results}\n{tool_context}\n**USER QUERY:**\n{prompt}"""
+        )
+        stream = generate_response(model, context, user_id, on_wait, on_stats)
+        _status(emit, label="✅ Tool processing complete!", state="complete")
+
+    else:
+        context = ConversationMemory.build_context(session_id, messages, prompt)
+        stream = generate_response(model, context, user_id, on_wait, on_stats)
+
+    # Split the stream into reasoning and answer events in a single pass
+    tokens = stream_parser(stream)
+    if model in Config.REASONING_MODELS:
+        events = ((event.kind, event.text) for event in parse_reasoning_stream(tokens))
+    else:
+        events = ((ANSWER, token) for token in tokens)
+
+    output = []
+    for kind, text in events:
+        if kind == REASONING:
+            emit({"type": "reasoning", "text": text})
+        else:
+            output.append(text)
+            emit({"type": "token", "text": text})
+    response = "".join(output)
+
+    RedisManager.cache_response(cache_key, response, expiration=cache_ttl)
+
+    # Web search answers wait for the client to choose whether to evaluate them
+    if not is_web_search:
+        save_response(session_id, response)
+
+    done = {"type": "done", "session_id": str(session_id), "response": response,
+            "evaluation_pending": is_web_search, "search_results": search_results}
+    emit(done)
+    return done
+
+def run_evaluation(user_id, session_id, model: str, response: str, search_results: Optional[str], emit: Emit = lambda event: None) -> Dict:
+    """Fact-check a web search answer, highlight unsupported statements and save it"""
+    _status(emit, label="Evaluating response accuracy...", state="running")
+    spans = segment_statements(response)
+    _status(emit, text="Analyzing statements for factual accuracy...")
+
+    evaluation_results = evaluate_statements(
+        model,
+        [span.text for span in spans],
+        search_results,
+        status_callback=lambda message: _status(emit, text=message),
+        user_id=user_id
+    )
+    highlighted = apply_highlighting(response, spans, evaluation_results)
+    _status(emit, label="Evaluation complete", state="complete")
+
+    save_response(session_id, highlighted)
+    done = {"type": "done", "session_id": str(session_id), "response": highlighted,
+            "evaluation_pending": False, "search_results": None}
+    emit(done)
+    return done
+
+def run_ingest(user_id, session_id, model: str, document_id: str, file_name: str, file_type: str,
+               emit: Emit = lambda event: None) -> Dict:
+    """Index an upload saved by document_ingest.save_upload and record it as an attachment of the session"""
+    if not is_document_id(document_id) or not is_supported(file_name):
+        raise ValueError(f"Unsupported document: {file_name}")
+
+    if not session_id:
+        session_id = PostgresManager.create_chat_session(user_id, model, title=f"📎 {file_name}"[:50])
+        emit({"type": "session", "session_id": str(session_id)})
+
+    _status(emit, label=f"📄 Reading {file_name}...", state="running")
+    stats = DocumentIngestor.ingest(session_id, document_id, file_name, user_id,
+                                    progress_callback=lambda progress: emit({"type": "progress", **progress}))
+    if Config.INGEST_RAPTOR_ENABLED:
+        DocumentIngestor.build_summary_tree(session_id, document_id, file_name, lambda message: _status(emit, text=message))
+
+    message_id = PostgresManager.add_message(session_id, "user", f"📎 Uploaded {file_name} ({stats['total_pages']} pages)")
+    if message_id:
+        PostgresManager.add_message_attachments(message_id, [
+            {"file_name": file_name, "file_type": file_type, "file_path": document_path(document_id, file_name)}
+        ])
+    _status(emit, label=f"✅ {file_name}: {stats['total_pages']} pages at {stats['pages_per_second']:.1f} pages/s", state="complete")
+
+    done = {"type": "done", "session_id": str(session_id), "document_id": document_id,
+            "pages": stats["total_pages"], "chunks": stats["chunks"], "seconds": stats["seconds"],
+            "pages_per_second": stats["pages_per_second"]}
+    emit(done)
+    return done
+
+def run_with_emit(target: Callable[..., Dict], emit: Emit, **kwargs):
+    """Run a pipeline function, turning failures into error events; always ends with None"""
+    try:
+        target(emit=emit, **kwargs)
+    except AdmissionTimeout as e:
+        emit({"type": "error", "message": str(e)})
+    except Exception as e:
+        logging.exception(f"Chat pipeline error: {e}")
+        emit({"type": "error", "message": f"Error: {str(e)}"})
+    finally:
+        emit(None)
+
+def stream_events(target: Callable[..., Dict], **kwargs) -> Iterator[Dict]:
+    """
+    Run a pipeline function on a worker thread and yield its events as they happen,
+    including queue positions reported while blocked on admission.
+    """
+    events = queue.Queue()
+    threading.Thread(target=run_with_emit, args=(target, events.put), kwargs=kwargs, daemon=True).start()
+    while True:
+        event = events.get()
+        if event is None:
+            return
+        yield event
@@ -0,0 +1,111 @@
+# backend/utils/context_selection.py
+import re
+import hashlib
+import numpy as np
+from typing import Callable, Dict, List, Optional
+from backend.config import Config
+
+SHINGLE_WORDS = 3
+MIN_MERGE_OVERLAP = 40  # Characters two chunks must share before they are merged
+
+def simhash(text: str) -> int:
+    """64-bit simhash of word 3-gram shingles; near-identical texts differ in few bits"""
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return 0
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little") for shingle in shingles],
+        dtype=np.uint64
+    )
+    bits = (hashes[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(hashes)
+    return sum(1 << int(i) for i in np.flatnonzero(votes > 0))
+
+def is_near_duplicate(fingerprint: int, seen: List[int]) -> bool:
+    return any(bin(fingerprint ^ other).count("1") <= Config.RAG_SIMHASH_DISTANCE for other in seen)
+
+def dedupe_pages(documents: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Drop pages that repeat an earlier page's text (syndicated copies, mirrors); keeps search order"""
+    kept, seen = [], []
+    for doc in documents:
+        fingerprint = simhash(doc.get("text", ""))
+        if doc.get("text") and is_near_duplicate(fingerprint, seen):
+            continue
+        seen.append(fingerprint)
+        kept.append(doc)
+    return kept
+
+def mmr(query_vector: np.ndarray, vectors: np.ndarray, k: int, relevance_weight: float) -> List[int]:
+    """Maximal marginal relevance order of the first k rows (vectors L2-normalised)"""
+    relevance = vectors @ query_vector
+    redundancy = np.zeros(len(vectors), dtype=np.float32)
+    available = np.ones(len(vectors), dtype=bool)
+    order = []
+    for _ in range(min(k, len(vectors))):
+        scores = np.where(available, relevance_weight * relevance - (1 - relevance_weight) * redundancy, -np.inf)
+        best = int(np.argmax(scores))
+        order.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, vectors @ vectors[best])
+    return order
+
+def _merge(first: str, second: str) -> Optional[str]:
+    """first + second with the text they share written once, or None if they do not overlap"""
+    head = second[:MIN_MERGE_OVERLAP]
+    start = first.find(head)
+    while start != -1:
+        if second.startswith(first[start:]):
+            return first + second[len(first) - start:]
+        start = first.find(head, start + 1)
+    return None
+
+def select_context(query_vector: np.ndarray, candidates: List[Dict], count_tokens: Callable[[str], int],
+                   top_k: Optional[int] = None, token_budget: Optional[int] = None) -> List[Dict[str, str]]:
+    """
+    Turn ranked candidates (title, text, source, vector) into prompt context: drop
+    near-duplicate chunks, order the rest by MMR, merge overlapping chunks of the
+    same page and stop at top_k results or the token budget.
+    """
+    top_k = top_k or Config.RAG_MAX_RESULTS
+    token_budget = token_budget or Config.RAG_CONTEXT_TOKENS
+    unique, seen = [], []
+    for candidate in candidates:
+        fingerprint = simhash(candidate["text"])
+        if is_near_duplicate(fingerprint, seen):
+            continue
+        seen.append(fingerprint)
+        unique.append(candidate)
+    if not unique:
+        return []
+
+    vectors = np.stack([np.asarray(candidate["vector"], dtype=np.float32) for candidate in unique])
+    results, used = [], 0
+    for index in mmr(np.asarray(query_vector, dtype=np.float32), vectors, len(unique), Config.RAG_MMR_LAMBDA):
+        candidate = unique[index]
+        # A neighbouring chunk of a page already selected shares its overlap: extend that result instead
+        neighbour, combined = _find_neighbour(results, candidate)
+        if neighbour is not None:
+            extra = count_tokens(combined) - count_tokens(neighbour["text"])
+            if used + extra <= token_budget:
+                neighbour["text"] = combined
+                used += extra
+            continue
+        if len(results) >= top_k:
+            continue
+        tokens = count_tokens(candidate["text"])
+        if used + tokens > token_budget:
+            continue  # A shorter chunk further down may still fit
+        used += tokens
+        results.append({"title": candidate["title"], "text": candidate["text"], "source": candidate["source"]})
+    return results
+
+def _find_neighbour(results: List[Dict], candidate: Dict):
+    """(result, merged text) for a selected chunk of the same page that overlaps the candidate"""
+    for result in results:
+        if result["source"] != candidate["source"]:
+            continue
+        combined = _merge(result["text"], candidate["text"]) or _merge(candidate["text"], result["text"])
+        if combined is not None:
+            return result, combined
+    return None, None
@@ -0,0 +1,101 @@
+# backend/utils/conversation_memory.py
+import ollama
+import logging
+import threading
+from typing import Dict, List, Optional
+from backend.config import Config
+from backend.utils.postgres_manager import PostgresManager
+from backend.utils.redis_manager import RedisManager
+from backend.utils.admission import AdmissionController, PRIORITY_BACKGROUND
+
+def summary_prompt(previous_summary: str, transcript: str) -> str:
+    return f"""Update the running summary of a conversation between a user and an AI assistant.
+
+Keep facts, names, numbers, decisions, user preferences and open questions. Drop greetings and filler.
+Write at most {Config.SUMMARY_MAX_WORDS} words of plain prose. Reply with the summary only.
+
+CURRENT SUMMARY:
+{previous_summary or "(empty)"}
+
+NEW MESSAGES:
+{transcript}
+"""
+
+class ConversationMemory:
+    """
+    Rolling per-session summary of the messages that have fallen out of the
+    recent Redis window. Updated in the background every SUMMARY_EVERY_N_TURNS
+    turns and prepended to the model context.
+    """
+
+    @classmethod
+    def get_summary(cls, session_id) -> Dict:
+        """Summary from Redis, falling back to Postgres (and re-populating Redis)"""
+        cached = RedisManager.get_session_summary(session_id)
+        if cached is not None:
+            return cached
+        stored = PostgresManager.get_session_summary(session_id) or {"summary": "", "message_count": 0}
+        RedisManager.set_session_summary(session_id, stored["summary"], stored["message_count"])
+        return stored
+
+    @classmethod
+    def build_context(cls, session_id, recent_messages: List[Dict], user_prompt: Optional[str] = None, user_content: Optional[str] = None) -> List[Dict]:
+        """
+        Summary (as a system message) + recent turns + the current user message.
+        user_content replaces the prompt text sent to the model (e.g. with tool results added).
+        """
+        history = list(recent_messages)
+        if user_prompt is not None:
+            # The current prompt is already pushed to the recent context; avoid sending it twice
+            while history and history[-1]["role"] == "user" and history[-1]["content"] == user_prompt:
+                history.pop()
+
+        context = []
+        summary = cls.get_summary(session_id).get("summary")
+        if summary:
+            context.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+        context.extend(history)
+        if user_prompt is not None:
+            context.append({"role": "user", "content": user_content or user_prompt})
+        return context
+
+    @classmethod
+    def schedule_update(cls, session_id):
+        """Refresh the summary in a background thread after an assistant message"""
+        if not session_id:
+            return
+        threading.Thread(target=cls.update_summary, args=(session_id,), daemon=True).start()
+
+    @classmethod
+    def update_summary(cls, session_id):
+        """Fold messages that left the recent window into the summary, every K turns"""
+        lock_name = f"chat_summary:{session_id}"
+        if not RedisManager.acquire_lock(lock_name):
+            return
+        try:
+            messages = PostgresManager.get_session_messages(session_id)
+            current = cls.get_summary(session_id)
+            covered = current["message_count"]
+            # Messages still in the recent window are sent verbatim, so they are not summarized yet
+            foldable = len(messages) - Config.RECENT_CONTEXT_MESSAGES
+            if foldable - covered < 2 * Config.SUMMARY_EVERY_N_TURNS:
+                return
+
+            transcript = "\n".join(
+                f"{msg['role'].upper()}: {msg['content']}" for msg in messages[covered:foldable]
+            )
+            with AdmissionController.admit(Config.SUMMARY_MODEL, f"session:{session_id}", PRIORITY_BACKGROUND):
+                response = ollama.chat(
+                    model=Config.SUMMARY_MODEL,
+                    messages=[{"role": "user", "content": summary_prompt(current["summary"], transcript)}],
+                    stream=False,
+                    options={"num_predict": Config.SUMMARY_MAX_TOKENS, "temperature": 0}
+                )
+            summary = response["message"]["content"].strip()
+            if summary:
+                PostgresManager.update_session_summary(session_id, summary, foldable)
+                RedisManager.set_session_summary(session_id, summary, foldable)
+        except Exception as e:
+            logging.error(f"Summary update error for session {session_id}: {str(e)}")
+        finally:
+            RedisManager.release_lock(lock_name)
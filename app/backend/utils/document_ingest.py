@@ -0,0 +1,290 @@
+# backend/utils/document_ingest.py
+import os
+import re
+import time
+import uuid
+import hashlib
+import logging
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+from qdrant_client import models
+from backend.config import Config
+from backend.utils.vector_store import VectorStoreManager
+from backend.utils.raptor import RaptorIndex
+
+COPY_BLOCK_SIZE = 1 << 20
+DOCX_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+def document_path(digest: str, file_name: str) -> str:
+    """Content-addressed location of an uploaded document (same layout as image attachments)"""
+    extension = os.path.splitext(file_name)[1].lower()
+    return os.path.join(Config.ATTACHMENT_DIR, digest[:2], f"{digest}{extension}")
+
+def is_document_id(value: str) -> bool:
+    return bool(re.fullmatch(r"[0-9a-f]{64}", value or ""))
+
+def is_supported(file_name: str) -> bool:
+    return os.path.splitext(file_name)[1].lower().lstrip(".") in Config.DOCUMENT_TYPES
+
+def save_upload(stream: BinaryIO, file_name: str) -> str:
+    """
+    Copy an upload to disk in fixed-size blocks, hashing it on the way.
+    Returns the document id (sha256); identical uploads share one file.
+    """
+    os.makedirs(Config.ATTACHMENT_DIR, exist_ok=True)
+    tmp_path = os.path.join(Config.ATTACHMENT_DIR, f".upload.{os.getpid()}.{threading.get_ident()}")
+    digest = hashlib.sha256()
+    with open(tmp_path, "wb") as f:
+        while True:
+            block = stream.read(COPY_BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+            f.write(block)
+    document_id = digest.hexdigest()
+    path = document_path(document_id, file_name)
+    if os.path.exists(path):
+        os.remove(tmp_path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+    return document_id
+
+def _pdf_pages(path: str) -> Tuple[Iterator[str], Optional[int]]:
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(path)
+    def pages():
+        try:
+            for index in range(len(pdf)):
+                # Each page and its text layer are freed before the next one is opened
+                page = pdf[index]
+                text_page = page.get_textpage()
+                try:
+                    yield text_page.get_text_range()
+                finally:
+                    text_page.close()
+                    page.close()
+        finally:
+            pdf.close()
+    return pages(), len(pdf)
+
+def _text_pages(path: str) -> Tuple[Iterator[str], Optional[int]]:
+    def pages():
+        buffer, size = [], 0
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                buffer.append(line)
+                size += len(line)
+                if size >= Config.INGEST_TEXT_PAGE_CHARS:
+                    yield "".join(buffer)
+                    buffer, size = [], 0
+        if buffer:
+            yield "".join(buffer)
+    # Bytes approximate characters closely enough for a progress bar
+    return pages(), max(1, -(-os.path.getsize(path) // Config.INGEST_TEXT_PAGE_CHARS))
+
+def _docx_pages(path: str) -> Tuple[Iterator[str], Optional[int]]:
+    def pages():
+        buffer, size = [], 0
+        # Parse word/document.xml incrementally instead of loading the whole tree
+        with zipfile.ZipFile(path) as archive, archive.open("word/document.xml") as xml:
+            for _, element in ET.iterparse(xml, events=("end",)):
+                if element.tag != f"{DOCX_NAMESPACE}p":
+                    continue
+                text = "".join(node.text or "" for node in element.iter(f"{DOCX_NAMESPACE}t"))
+                page_break = any(
+                    node.get(f"{DOCX_NAMESPACE}type") == "page" for node in element.iter(f"{DOCX_NAMESPACE}br")
+                )
+                element.clear()
+                if text:
+                    buffer.append(text + "\n")
+                    size += len(text) + 1
+                if buffer and (page_break or size >= Config.INGEST_TEXT_PAGE_CHARS):
+                    yield "".join(buffer)
+                    buffer, size = [], 0
+        if buffer:
+            yield "".join(buffer)
+    return pages(), None
+
+PAGE_READERS = {
+    ".pdf": _pdf_pages,
+    ".txt": _text_pages,
+    ".md": _text_pages,
+    ".docx": _docx_pages,
+}
+
+def iter_pages(path: str) -> Tuple[Iterator[str], Optional[int]]:
+    """Lazy page texts of a document and the page count when it is known up front"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in PAGE_READERS:
+        raise ValueError(f"Unsupported document type: {extension}")
+    return PAGE_READERS[extension](path)
+
+def iter_chunks(pages: Iterator[str]) -> Iterator[Tuple[int, int, str]]:
+    """(page number, chunk index within the page, chunk text), one page in memory at a time"""
+    splitter = VectorStoreManager.get_instance().text_splitter
+    for page_number, text in enumerate(pages, 1):
+        for index, chunk in enumerate(splitter.iter_split(text)):
+            yield page_number, index, chunk
+
+class DocumentIngestor:
+    """
+    Streams uploaded documents into Qdrant: pages are extracted and chunked lazily,
+    and fixed-size batches are embedded and upserted on a shared worker pool with a
+    bounded number of batches in flight, so memory stays flat whatever the file size.
+    """
+    _executor = None
+    _executor_lock = threading.Lock()
+
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        if cls._executor is None:
+            with cls._executor_lock:
+                if cls._executor is None:
+                    cls._executor = ThreadPoolExecutor(max_workers=Config.INGEST_WORKERS, thread_name_prefix="ingest")
+        return cls._executor
+
+    @classmethod
+    def _client(cls):
+        store = VectorStoreManager.get_instance()
+        store.ensure_collection(Config.DOCUMENT_COLLECTION)
+        return store.qdrant_client
+
+    @staticmethod
+    def _point_id(session_id: str, document_id: str, page: int, index: int) -> str:
+        # Deterministic, so ingesting the same file again in a session overwrites it in place
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"upload:{session_id}:{document_id}:{page}:{index}"))
+
+    @classmethod
+    def _store_batch(cls, batch: List[Tuple[int, int, str]], session_id: str, document_id: str, file_name: str,
+                     user_id: Optional[str]):
+        store = VectorStoreManager.get_instance()
+        texts = [chunk for _, _, chunk in batch]
+        client = cls._client()
+        vectors = store.point_vectors(Config.DOCUMENT_COLLECTION, texts, store.embed_texts(texts))
+        client.upsert(
+            collection_name=Config.DOCUMENT_COLLECTION,
+            points=[
+                models.PointStruct(
+                    id=cls._point_id(session_id, document_id, page, index),
+                    vector=vector,
+                    payload={
+                        "document": chunk,
+                        "title": file_name,
+                        "source": f"{file_name}, p. {page}",
+                        "page": page,
+                        "document_id": document_id,
+                        "session_id": session_id,
+                        "user_id": user_id,
+                    }
+                )
+                for (page, index, chunk), vector in zip(batch, vectors)
+            ],
+            wait=True  # Backpressure and progress count chunks Qdrant has applied, not just accepted
+        )
+
+    @classmethod
+    def ingest(cls, session_id: str, document_id: str, file_name: str, user_id: Optional[str] = None,
+               progress_callback: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        Index a saved upload for a session. progress_callback receives
+        {pages, total_pages, chunks, pages_per_second} after each batch.
+        Returns the same fields plus the elapsed seconds.
+        """
+        session_id = str(session_id)
+        pages, total_pages = iter_pages(document_path(document_id, file_name))
+        executor = cls._get_executor()
+        slots = threading.BoundedSemaphore(Config.INGEST_MAX_PENDING_BATCHES)
+        pending = deque()
+        progress = {"pages": 0, "total_pages": total_pages, "chunks": 0, "pages_per_second": 0.0}
+        started = time.perf_counter()
+
+        def report(pages_done: int):
+            elapsed = time.perf_counter() - started
+            progress.update(pages=pages_done, pages_per_second=round(pages_done / elapsed, 2) if elapsed else 0.0)
+            if progress_callback:
+                progress_callback(dict(progress))
+
+        def submit(batch):
+            # Blocks extraction while the workers are INGEST_MAX_PENDING_BATCHES behind
+            slots.acquire()
+            future = executor.submit(cls._store_batch, batch, session_id, document_id, file_name,
+                                     str(user_id) if user_id else None)
+            future.add_done_callback(lambda _: slots.release())
+            pending.append((future, batch[-1][0]))
+            progress["chunks"] += len(batch)
+            # Progress counts pages whose chunks are stored; failures surface here
+            pages_done = progress["pages"]
+            while pending and pending[0][0].done():
+                done_future, last_page = pending.popleft()
+                done_future.result()
+                pages_done = last_page
+            report(pages_done)
+
+        batch = []
+        for item in iter_chunks(pages):
+            batch.append(item)
+            if len(batch) >= Config.INGEST_BATCH_SIZE:
+                submit(batch)
+                batch = []
+        if batch:
+            submit(batch)
+        last_page = progress["pages"]
+        while pending:
+            future, last_page = pending.popleft()
+            future.result()
+        # The page count of text formats is an estimate; the real one is known now
+        progress["total_pages"] = max(last_page, progress["pages"])
+        report(progress["total_pages"])
+
+        result = {**progress, "seconds": round(time.perf_counter() - started, 2)}
+        logging.info(f"Ingested {file_name} ({document_id[:12]}): {result}")
+        return result
+
+    @classmethod
+    def build_summary_tree(cls, session_id: str, document_id: str, file_name: str,
+                           status_callback: Optional[Callable[[str], None]] = None):
+        """Add a document to the session's RAPTOR tree, a bounded group of pages at a time"""
+        index = RaptorIndex(f"session:{session_id}")
+        pages, _ = iter_pages(document_path(document_id, file_name))
+        group, first_page = [], 1
+        for page_number, text in enumerate(pages, 1):
+            group.append({"title": file_name, "text": text, "source": f"{file_name}, p. {page_number}"})
+            if len(group) >= Config.INGEST_RAPTOR_PAGES:
+                if status_callback:
+                    status_callback(f"🌳 Summarizing pages {first_page}-{page_number}...")
+                index.add_documents(group)
+                group, first_page = [], page_number + 1
+        if group:
+            if status_callback:
+                status_callback(f"🌳 Summarizing pages {first_page}-{first_page + len(group) - 1}...")
+            index.add_documents(group)
+
+    @classmethod
+    def search(cls, query: str, session_id: str, top_k: Optional[int] = None) -> List[Dict[str, str]]:
+        """Chunks of the session's uploaded documents closest to the query"""
+        if Config.INGEST_RAPTOR_ENABLED:
+            return RaptorIndex(f"session:{session_id}").search(query)
+        try:
+            store = VectorStoreManager.get_instance()
+            query_vector = store.embed_texts([query])[0]
+            cls._client()  # Ensures the collection, so query_collection knows whether it is hybrid
+            results = store.query_collection(
+                Config.DOCUMENT_COLLECTION,
+                query,
+                query_vector,
+                models.Filter(must=[
+                    models.FieldCondition(key="session_id", match=models.MatchValue(value=str(session_id)))
+                ]),
+                Config.RAG_CANDIDATES,
+                with_vectors=[store.VECTOR_NAME]
+            )
+            return store.select_results(query_vector, results, top_k)
+        except Exception as e:
+            logging.error(f"Document search error: {str(e)}")
+            return []
@@ -0,0 +1,130 @@
+# backend/utils/embedding_cache.py
+import time
+import hashlib
+import logging
+import threading
+import numpy as np
+import redis
+from typing import Callable, Dict, List, Tuple
+from backend.config import Config
+
+SparseVector = Tuple[np.ndarray, np.ndarray]  # (token indices, weights)
+
+class EmbeddingCache:
+    """
+    Redis cache of chunk embeddings keyed by (model_name, sha1(text)), stored as
+    raw bytes (dense float32, or sparse indices and weights). Only misses are
+    embedded. Keeps hit and CPU-time counters.
+    """
+    _client = None
+    _lock = threading.Lock()
+    _hits = 0
+    _misses = 0
+    _embed_cpu_seconds = 0.0  # CPU time spent embedding misses
+
+    @classmethod
+    def get_client(cls):
+        if cls._client is None:
+            cls._client = redis.Redis(host=Config.REDIS_HOST, port=Config.REDIS_PORT, db=0)
+        return cls._client
+
+    @staticmethod
+    def _key(model_name: str, text: str) -> str:
+        return f"emb:{model_name}:{hashlib.sha1(text.encode('utf-8')).hexdigest()}"
+
+    @classmethod
+    def embed(cls, model_name: str, texts: List[str], embed_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Vectors for texts (one row each), calling embed_fn only for texts not in the cache"""
+        if not Config.EMBEDDING_CACHE_ENABLED:
+            return embed_fn(texts)
+        vectors = cls._cached(
+            model_name, texts, embed_fn,
+            encode=lambda vector: np.asarray(vector, dtype=np.float32).tobytes(),
+            decode=lambda value: np.frombuffer(value, dtype=np.float32)
+        )
+        return np.stack(vectors).astype(np.float32, copy=False)
+
+    @classmethod
+    def embed_sparse(cls, model_name: str, texts: List[str],
+                     embed_fn: Callable[[List[str]], List[SparseVector]]) -> List[SparseVector]:
+        """(indices, values) per text, cached like dense vectors: uint32 indices then float32 values"""
+        if not Config.EMBEDDING_CACHE_ENABLED:
+            return embed_fn(texts)
+        def decode(value: bytes) -> SparseVector:
+            count = len(value) // 8
+            return np.frombuffer(value[:count * 4], dtype=np.uint32), np.frombuffer(value[count * 4:], dtype=np.float32)
+        return cls._cached(
+            model_name, texts, embed_fn,
+            encode=lambda vector: np.asarray(vector[0], dtype=np.uint32).tobytes() + np.asarray(vector[1], dtype=np.float32).tobytes(),
+            decode=decode
+        )
+
+    @classmethod
+    def _cached(cls, model_name: str, texts: List[str], embed_fn: Callable, encode: Callable, decode: Callable) -> List:
+        # Duplicate chunks within a batch (overlaps, repeated boilerplate) are looked up and embedded once
+        keys = [cls._key(model_name, text) for text in texts]
+        unique_keys = list(dict.fromkeys(keys))
+        found = {}
+        try:
+            for key, value in zip(unique_keys, cls.get_client().mget(unique_keys)):
+                if value is not None:
+                    found[key] = decode(value)
+        except redis.RedisError as e:
+            logging.warning(f"Embedding cache unavailable, embedding everything: {e}")
+
+        missing_keys = [key for key in unique_keys if key not in found]
+        if missing_keys:
+            text_by_key = dict(zip(keys, texts))
+            started = time.process_time()
+            vectors = embed_fn([text_by_key[key] for key in missing_keys])
+            cpu_seconds = time.process_time() - started
+            try:
+                with cls.get_client().pipeline(transaction=False) as pipe:
+                    for key, vector in zip(missing_keys, vectors):
+                        pipe.setex(key, Config.EMBEDDING_CACHE_TTL, encode(vector))
+                    pipe.execute()
+            except redis.RedisError as e:
+                logging.warning(f"Could not store embeddings: {e}")
+            for key, vector in zip(missing_keys, vectors):
+                found[key] = vector
+        else:
+            cpu_seconds = 0.0
+
+        with cls._lock:
+            cls._hits += len(texts) - len(missing_keys)
+            cls._misses += len(missing_keys)
+            cls._embed_cpu_seconds += cpu_seconds
+        return [found[key] for key in keys]
+
+    @classmethod
+    def stats(cls) -> Dict:
+        """Hit ratio and the embedding CPU time the hits saved (at the average cost per miss)"""
+        with cls._lock:
+            hits, misses, cpu = cls._hits, cls._misses, cls._embed_cpu_seconds
+        lookups = hits + misses
+        cost_per_text = cpu / misses if misses else 0.0
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / lookups, 3) if lookups else None,
+            "embed_cpu_seconds": round(cpu, 3),
+            "cpu_seconds_saved": round(hits * cost_per_text, 3),
+        }
+
+    @classmethod
+    def prometheus(cls) -> str:
+        stats = cls.stats()
+        return "\n".join([
+            "# HELP embedding_cache_hits_total Texts served from the embedding cache",
+            "# TYPE embedding_cache_hits_total counter",
+            f"embedding_cache_hits_total {stats['hits']}",
+            "# HELP embedding_cache_misses_total Texts that had to be embedded",
+            "# TYPE embedding_cache_misses_total counter",
+            f"embedding_cache_misses_total {stats['misses']}",
+            "# HELP embedding_cpu_seconds_total CPU time spent embedding cache misses",
+            "# TYPE embedding_cpu_seconds_total counter",
+            f"embedding_cpu_seconds_total {stats['embed_cpu_seconds']}",
+            "# HELP embedding_cpu_seconds_saved_total Estimated CPU time saved by cache hits",
+            "# TYPE embedding_cpu_seconds_saved_total counter",
+            f"embedding_cpu_seconds_saved_total {stats['cpu_seconds_saved']}",
+        ]) + "\n"
@@ -0,0 +1,315 @@
+# backend/utils/evaluation.py
+import ollama
+import json
+import re
+import logging
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Optional, Tuple
+from backend.config import Config
+from backend.utils.vector_store import VectorStoreManager
+from backend.utils.admission import AdmissionController, PRIORITY_EVALUATION
+
+RESULT_HEADER = re.compile(r"^Result \d+:\s*$")
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+# JSON schema passed to Ollama's structured output `format` parameter
+EVALUATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "evaluations": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "statement_number": {"type": "integer"},
+                    "is_accurate": {"type": "boolean"},
+                    "confidence": {"type": "string", "enum": ["high", "medium", "low"]},
+                    "explanation": {"type": "string"}
+                },
+                "required": ["statement_number", "is_accurate"]
+            }
+        }
+    },
+    "required": ["evaluations"]
+}
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token) used for batch sizing"""
+    return len(text) // 4 + 1
+
+def create_json_evaluation_prompt(statements, statement_numbers, search_results):
+    """Create a prompt for the LLM to evaluate statements with JSON output"""
+    numbered_statements = [f"{i}. {statement}" for i, statement in zip(statement_numbers, statements)]
+    statements_text = "\n".join(numbered_statements)
+
+    return f"""You are a factual accuracy evaluator.
+Evaluate each statement below against the provided search results to determine if it's accurate.
+
+SEARCH RESULTS:
+{search_results}
+
+STATEMENTS TO EVALUATE:
+{statements_text}
+
+Provide your evaluation as a JSON object with the following structure:
+{{
+  "evaluations": [
+    {{
+      "statement_number": 1,
+      "is_accurate": true/false,
+      "confidence": "high/medium/low",
+      "explanation": "Brief explanation"
+    }},
+    ...
+  ]
+}}
+
+Only include the JSON object in your response, nothing else.
+"""
+
+def parse_json_evaluation(evaluation_response):
+    """
+    Parse the LLM's JSON evaluation response
+    Returns a dictionary mapping statement numbers to accuracy evaluations
+    """
+    # Extract JSON from response (in case there's other text)
+    try:
+        # Find JSON content (anything between braces)
+        json_start = evaluation_response.find('{')
+        json_end = evaluation_response.rfind('}') + 1
+
+        if json_start >= 0 and json_end > 0:
+            json_content = evaluation_response[json_start:json_end]
+            data = json.loads(json_content)
+
+            # Build the results dictionary
+            results = {}
+            if "evaluations" in data:
+                for eval_item in data["evaluations"]:
+                    statement_num = eval_item.get("statement_number")
+                    is_accurate = eval_item.get("is_accurate", True)
+
+                    if statement_num is not None:
+                        try:
+                            results[int(statement_num)] = is_accurate
+                        except (TypeError, ValueError):
+                            continue
+
+            return results
+        else:
+            # Fallback if no JSON brackets found
+            return {}
+
+    except json.JSONDecodeError:
+        # Fallback with manual parsing in case JSON is malformed
+        results = {}
+        if "statement_number" in evaluation_response and "is_accurate" in evaluation_response:
+            lines = evaluation_response.split("\n")
+            for line in lines:
+                if "statement_number" in line and "is_accurate" in line:
+                    try:
+                        num_part = line.split("statement_number")[1].split(",")[0]
+                        num = int(''.join(filter(str.isdigit, num_part)))
+
+                        is_accurate = "true" in line.lower() and "false" not in line.lower()
+                        results[num] = is_accurate
+                    except:
+                        continue
+        return results
+
+def split_search_chunks(search_results: str, window: int = 2) -> List[str]:
+    """
+    Split the formatted search results into short overlapping sentence windows.
+    Result headers and source lines are dropped, only the text is compared.
+    """
+    if not search_results:
+        return []
+
+    chunks = []
+    for block in re.split(r"\n\s*\n", search_results):
+        lines = [
+            line.strip() for line in block.splitlines()
+            if line.strip() and not RESULT_HEADER.match(line.strip()) and not line.startswith("Source:")
+        ]
+        sentences = [s for s in SENTENCE_BOUNDARY.split(" ".join(lines)) if s.strip()]
+        for i in range(max(1, len(sentences) - window + 1)):
+            chunk = " ".join(sentences[i:i+window]).strip()
+            if chunk:
+                chunks.append(chunk)
+    return chunks
+
+def prefilter_statements(statements: List[str], search_results: str, threshold: Optional[float] = None, top_k: Optional[int] = None) -> Optional[Tuple[Dict[int, bool], Dict[int, List[str]]]]:
+    """
+    Embed statements and search chunks in one batch and compare them.
+    Returns (supported, evidence): statements whose best chunk similarity reaches the
+    threshold are marked accurate, and every statement gets its top-k chunks as
+    evidence for the LLM prompt. Returns None when nothing can be compared.
+    """
+    threshold = Config.EVALUATION_SUPPORT_THRESHOLD if threshold is None else threshold
+    top_k = top_k or Config.EVALUATION_EVIDENCE_CHUNKS
+
+    chunks = split_search_chunks(search_results)
+    if not statements or not chunks:
+        return None
+
+    try:
+        vectors = VectorStoreManager.embed_texts(list(statements) + chunks)
+    except Exception as e:
+        logging.error(f"Pre-filter embedding error: {str(e)}")
+        return None
+
+    statement_vectors = vectors[:len(statements)]
+    chunk_vectors = vectors[len(statements):]
+    similarities = statement_vectors @ chunk_vectors.T  # Vectors are normalised: dot product == cosine
+
+    k = min(top_k, len(chunks))
+    top_indices = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+
+    supported = {}
+    evidence = {}
+    for row, indices in enumerate(top_indices):
+        ranked = indices[np.argsort(-similarities[row, indices])]
+        evidence[row + 1] = [chunks[j] for j in ranked]
+        if similarities[row, ranked[0]] >= threshold:
+            supported[row + 1] = True
+
+    return supported, evidence
+
+def compute_batch_size(statements: List[str], search_results: str, num_ctx: int = None, max_batch_size: int = None, evidence_tokens_per_statement: int = 0) -> int:
+    """
+    Pick how many statements fit in one evaluation call.
+    The search results are repeated in every prompt, so the space left for
+    statements (their evidence and JSON verdicts) is whatever remains of the context window.
+    """
+    num_ctx = num_ctx or Config.EVALUATION_NUM_CTX
+    max_batch_size = max_batch_size or Config.EVALUATION_MAX_BATCH_SIZE
+    if not statements:
+        return 1
+
+    fixed_tokens = estimate_tokens(create_json_evaluation_prompt([], [], search_results or ""))
+    available = num_ctx - fixed_tokens
+    avg_statement_tokens = sum(estimate_tokens(s) for s in statements) / len(statements)
+    per_statement = avg_statement_tokens + evidence_tokens_per_statement + Config.EVALUATION_TOKENS_PER_STATEMENT
+
+    return max(1, min(max_batch_size, int(available // per_statement)))
+
+def _batch_evidence(batch_nums: List[int], evidence: Dict[int, List[str]]) -> str:
+    """Join the top chunks of every statement in the batch, without repeats"""
+    seen = {}
+    for num in batch_nums:
+        for chunk in evidence.get(num, []):
+            seen.setdefault(chunk, None)
+    return "\n\n".join(seen)
+
+def _evaluate_batch(model: str, batch: List[str], batch_nums: List[int], search_results: str, user_id=None) -> Dict[int, bool]:
+    """Evaluate one batch with a single non-streaming, schema-constrained call"""
+    evaluation_prompt = create_json_evaluation_prompt(batch, batch_nums, search_results)
+    with AdmissionController.admit(model, user_id, PRIORITY_EVALUATION):
+        response = ollama.chat(
+            model=model,
+            messages=[{"role": "user", "content": evaluation_prompt}],
+            stream=False,
+            format=EVALUATION_SCHEMA,
+            options={
+                "num_ctx": Config.EVALUATION_NUM_CTX,
+                "temperature": 0
+            }
+        )
+    batch_results = parse_json_evaluation(response["message"]["content"])
+    # Ignore verdicts for statements that were not part of this batch
+    return {num: batch_results[num] for num in batch_nums if num in batch_results}
+
+def _evaluate_with_llm(model: str, statements: List[str], statement_nums: List[int], search_results: str, evidence: Optional[Dict[int, List[str]]], status_callback, max_workers: Optional[int], user_id=None) -> Dict[int, bool]:
+    """Send the given statements to the LLM evaluator in concurrent batches"""
+    pending = [statements[num - 1] for num in statement_nums]
+    if evidence:
+        evidence_tokens = max(
+            (sum(estimate_tokens(chunk) for chunk in evidence.get(num, [])) for num in statement_nums),
+            default=0
+        )
+        batch_size = compute_batch_size(pending, "", evidence_tokens_per_statement=evidence_tokens)
+    else:
+        batch_size = compute_batch_size(pending, search_results)
+
+    batches = []
+    for i in range(0, len(statement_nums), batch_size):
+        batch_nums = statement_nums[i:i+batch_size]
+        batch_context = _batch_evidence(batch_nums, evidence) if evidence else search_results
+        batches.append(([statements[num - 1] for num in batch_nums], batch_nums, batch_context))
+
+    max_workers = min(max_workers or Config.EVALUATION_MAX_WORKERS, len(batches))
+    status_callback(f"Evaluating {len(statement_nums)} statements in {len(batches)} batches...")
+
+    evaluation_results = {}
+    # status_callback is only invoked from this thread: Streamlit widgets
+    # cannot be written from the worker threads
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_evaluate_batch, model, batch, batch_nums, batch_context, user_id): batch_nums
+            for batch, batch_nums, batch_context in batches
+        }
+        for future in as_completed(futures):
+            batch_nums = futures[future]
+            try:
+                evaluation_results.update(future.result())
+                status_callback(f"Evaluated statements {', '.join(map(str, batch_nums))}")
+            except Exception as e:
+                logging.error(f"Evaluation error for statements {batch_nums}: {str(e)}")
+                status_callback(f"Could not evaluate statements {', '.join(map(str, batch_nums))}")
+
+    return evaluation_results
+
+def agreement_stats(candidate: Dict[int, bool], baseline: Dict[int, bool], prefiltered: Optional[List[int]] = None) -> Dict[str, float]:
+    """Compare verdicts of two evaluation runs on the statements both of them judged"""
+    common = [num for num in candidate if num in baseline]
+    agreed = sum(1 for num in common if candidate[num] == baseline[num])
+    prefiltered = [num for num in (prefiltered or []) if num in baseline]
+    prefilter_agreed = sum(1 for num in prefiltered if baseline[num] == candidate.get(num))
+    return {
+        "compared": len(common),
+        "agreement": agreed / len(common) if common else 1.0,
+        "prefiltered": len(prefiltered),
+        "prefilter_agreement": prefilter_agreed / len(prefiltered) if prefiltered else 1.0
+    }
+
+def evaluate_statements(model: str, statements: List[str], search_results: str, status_callback=None, max_workers: Optional[int] = None, use_prefilter: Optional[bool] = None, user_id=None) -> Dict[int, bool]:
+    """
+    Fact-check statements against search results.
+    Near-verbatim statements are accepted by the embedding pre-filter; the rest are
+    sent concurrently on a bounded worker pool with only their best-matching chunks,
+    and verdicts are merged by statement number (1-based), which is the format
+    apply_highlighting consumes.
+    """
+    if status_callback is None:
+        def status_callback(message):
+            pass
+    if use_prefilter is None:
+        use_prefilter = Config.EVALUATION_PREFILTER_ENABLED
+
+    if not statements:
+        return {}
+
+    evaluation_results = {}
+    evidence = None
+    pending = list(range(1, len(statements) + 1))
+
+    if use_prefilter:
+        prefilter = prefilter_statements(statements, search_results)
+        if prefilter:
+            supported, evidence = prefilter
+            evaluation_results.update(supported)
+            pending = [num for num in pending if num not in supported]
+            status_callback(f"{len(supported)} statements matched the search results directly")
+
+    if pending:
+        evaluation_results.update(
+            _evaluate_with_llm(model, statements, pending, search_results, evidence, status_callback, max_workers, user_id)
+        )
+
+    if use_prefilter and Config.EVALUATION_PREFILTER_AUDIT:
+        baseline = evaluate_statements(model, statements, search_results, max_workers=max_workers, use_prefilter=False, user_id=user_id)
+        stats = agreement_stats(evaluation_results, baseline, [num for num in evaluation_results if num not in pending])
+        logging.info(f"Pre-filter agreement with LLM-only baseline: {stats}")
+
+    return evaluation_results
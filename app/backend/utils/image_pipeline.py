@@ -0,0 +1,91 @@
+# backend/utils/image_pipeline.py
+import io
+import os
+import base64
+import hashlib
+import logging
+from typing import Dict, List, Optional
+from PIL import Image, ImageOps
+from backend.config import Config
+from backend.utils.redis_manager import RedisManager
+
+def image_hash(data: bytes) -> str:
+    """Content address of the uploaded file"""
+    return hashlib.sha256(data).hexdigest()
+
+def _to_rgb(image: Image.Image) -> Image.Image:
+    """Flatten transparency onto white; JPEG has no alpha channel"""
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+def _encode(image: Image.Image, max_side: int, quality: int) -> bytes:
+    resized = image.copy()
+    # Only ever shrinks; small images are sent as they are
+    resized.thumbnail((max_side, max_side), Image.LANCZOS)
+    buffer = io.BytesIO()
+    resized.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
+
+def _attachment_path(digest: str, suffix: str) -> str:
+    # Content-addressed layout: identical uploads share one file
+    return os.path.join(Config.ATTACHMENT_DIR, digest[:2], f"{digest}{suffix}")
+
+def _write_once(path: str, data: bytes):
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def prepare_image(data: bytes, file_name: str = "image", file_type: str = "image/png") -> Dict:
+    """
+    Downsize an upload to the vision model's input resolution, re-encode it as JPEG
+    and store the original and a thumbnail. Returns a JSON-serializable dict:
+    hash, payload (base64 for Ollama) and the attachments to record with the message.
+    """
+    digest = image_hash(data)
+    payload_key = f"vision:image:{digest}"
+    payload = RedisManager.get_cached_response(payload_key)
+
+    original_ext = os.path.splitext(file_name)[1].lower() or ".img"
+    original_path = _attachment_path(digest, original_ext)
+    thumbnail_path = _attachment_path(digest, ".thumb.jpg")
+
+    if payload is None or not os.path.exists(thumbnail_path):
+        image = _to_rgb(ImageOps.exif_transpose(Image.open(io.BytesIO(data))))
+        encoded = _encode(image, Config.VISION_MAX_SIDE, Config.VISION_JPEG_QUALITY)
+        payload = base64.b64encode(encoded).decode("utf-8")
+        RedisManager.cache_response(payload_key, payload, expiration=Config.VISION_CACHE_TTL)
+        try:
+            _write_once(original_path, data)
+            _write_once(thumbnail_path, _encode(image, Config.VISION_THUMBNAIL_SIDE, Config.VISION_JPEG_QUALITY))
+        except OSError as e:
+            logging.error(f"Could not store attachment {digest}: {e}")
+        logging.info(f"Prepared image {digest[:12]}: {len(data)} -> {len(encoded)} bytes")
+
+    return {
+        "hash": digest,
+        "payload": payload,
+        "attachments": [
+            {"file_name": file_name, "file_type": file_type, "file_path": original_path},
+            {"file_name": f"{os.path.splitext(file_name)[0]}.thumb.jpg", "file_type": "image/jpeg", "file_path": thumbnail_path},
+        ],
+    }
+
+def vision_cache_key(model: str, digest: str, prompt: str) -> str:
+    """Answers are cached per (image, prompt): the prompt alone does not identify the question"""
+    return f"vision:answer:{model}:{digest}:{hashlib.md5(prompt.encode()).hexdigest()}"
+
+def load_thumbnail(attachments: List[Dict]) -> Optional[bytes]:
+    """Bytes of the stored thumbnail among a message's attachments, if any"""
+    for attachment in attachments:
+        if attachment["file_path"].endswith(".thumb.jpg") and os.path.exists(attachment["file_path"]):
+            with open(attachment["file_path"], "rb") as f:
+                return f.read()
+    return None
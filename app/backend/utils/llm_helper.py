@@ -1,28 +1,122 @@
 import ollama
 import json
-import re
+import time
+import logging
 from typing import List, Dict, Any, Optional, Union
 from backend.config import Config
 from backend.utils.redis_manager import RedisManager
 from backend.utils.vector_store import VectorStoreManager
 from backend.utils.web_search import WebSearchAgent
+from backend.utils.web_corpus import WebCorpus
+from backend.utils.document_ingest import DocumentIngestor
+from backend.utils.context_selection import dedupe_pages
+from backend.utils.calculator import calculate, CalculatorError
+from backend.utils.admission import AdmissionController, PRIORITY_INTERACTIVE, PRIORITY_TOOL_SELECTION
+from backend.utils.telemetry import LLMTelemetry, build_stats
 
 system_prompt = Config.SYSTEM_PROMPT
 # Set Ollama host to connect to Kubernetes service via NodePort
 ollama.host = f"http://{Config.OLLAMA_HOST}:{Config.OLLAMA_PORT}"
 
+def keep_alive_for(model: str):
+    return Config.MODEL_KEEP_ALIVE.get(model, Config.OLLAMA_KEEP_ALIVE)
+
+def warm_up_models(models=None):
+    """Load each model into Ollama ahead of the first request (an empty prompt only loads it)"""
+    for model in models or Config.OLLAMA_WARMUP_MODELS:
+        started = time.perf_counter()
+        try:
+            response = ollama.generate(model=model, prompt="", keep_alive=keep_alive_for(model))
+            load_time = (response.get("load_duration") or 0) / 1e9
+            logging.info(f"Warmed up {model} in {time.perf_counter() - started:.1f}s (load {load_time:.1f}s)")
+        except Exception as e:
+            logging.warning(f"Warm-up failed for {model}: {e}")
+
+# Tool registry: one JSON schema per tool for the "parameters" object
+TOOL_REGISTRY = {
+    "calculator": {
+        "description": "Any mathematical question, including word problems. Pass a Python math expression, not words (math functions like sqrt, log, sin and constants pi, e are available).",
+        "parameters": {
+            "type": "object",
+            "properties": {"query": {"type": "string"}},
+            "required": ["query"]
+        }
+    },
+    "web_search": {
+        "description": "Factual or current information needs. Pass a concise search-engine query.",
+        "parameters": {
+            "type": "object",
+            "properties": {"query": {"type": "string"}},
+            "required": ["query"]
+        }
+    },
+    "document_search": {
+        "description": "Questions about a document the user uploaded in this chat. Pass what to look for in it.",
+        "parameters": {
+            "type": "object",
+            "properties": {"query": {"type": "string"}},
+            "required": ["query"]
+        }
+    },
+    "none": {
+        "description": "General knowledge, opinion or conversation that needs no calculation or current information.",
+        "parameters": {
+            "type": "object",
+            "properties": {"query": {"type": "string"}},
+            "required": []
+        }
+    }
+}
+
+# Schema passed to Ollama's structured output `format` parameter
+TOOL_SELECTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "tool": {"type": "string", "enum": list(TOOL_REGISTRY)},
+        "parameters": {
+            "type": "object",
+            "properties": {"query": {"type": "string"}},
+            "required": ["query"]
+        }
+    },
+    "required": ["tool", "parameters"]
+}
+
+def short_tool_selection_prompt(user_query: str) -> str:
+    """Compact selection prompt for schema-constrained output (no format examples needed)"""
+    tools = "\n".join(f"- {name}: {spec['description']}" for name, spec in TOOL_REGISTRY.items())
+    return f"""Choose exactly one tool for the user query and the query to pass to it.
+
+Tools:
+{tools}
+
+Always use calculator for any calculation, however simple. Prefer web_search over none for facts that may change over time.
+
+User query: "{user_query}"
+"""
+
+def tool_repair_prompt(user_query: str, error: str) -> str:
+    """Shorter prompt for the single retry after an invalid selection"""
+    return f"""Your previous tool selection was invalid: {error}.
+Reply with JSON only: {{"tool": "{' | '.join(TOOL_REGISTRY)}", "parameters": {{"query": "..."}}}}
+
+User query: "{user_query}"
+"""
+
 def tool_selection_prompt(user_query: str) -> str:
     """Create a prompt to ask the LLM which tool to use"""
     return f"""# Tool Selection Agent
 
-You are an advanced tool selection agent. You will analyze the user query and select the most appropriate tool to handle it. You must choose exactly one of the three available tools for each query. This is mission critical. Think thoroughly about the tool you will be choosing and the query value you will be passing to it. The query you will be passing is as important as tool selection as it decides your answer.
+You are an advanced tool selection agent. You will analyze the user query and select the most appropriate tool to handle it. You must choose exactly one of the four available tools for each query. This is mission critical. Think thoroughly about the tool you will be choosing and the query value you will be passing to it. The query you will be passing is as important as tool selection as it decides your answer.
 
 ## Tools
 1. **calculator**: Use for any mathematical question (simple or complex), including word problems that require calculation. Always use this for calculations even if they seem trivial. This is based on Python shell execution so provide equations, not words.
 
 2. **web_search**: Use for factual or current information needs (e.g., "Latest SpaceX rocket launch", "Population of France").
 
-3. **none**: Use to directly answer simple questions based on general knowledge or conversation history that don't require calculations or searching for current information.
+3. **document_search**: Use for questions about documents the user uploaded in this chat (e.g., "Summarize the conclusion of the report I uploaded").
+
+4. **none**: Use to directly answer simple questions based on general knowledge or conversation history that don't require calculations or searching for current information.
 
 ## Response Format
 For every user query, respond in this format:
@@ -130,7 +224,7 @@ User Query: "What is the meaning of life?"
 ## Important Notes
 - ALWAYS use the calculator tool for ANY mathematical question, no matter how simple it may seem.
 - For word problems, extract the mathematical operation needed and format it as an equation.
-- The calculator uses Python syntax, so ensure expressions are properly formatted.
+- The calculator uses Python syntax, so ensure expressions are properly formatted. Math functions (sqrt, log, sin, cos, factorial, ...) and the constants pi and e are available.
 - When in doubt between web_search and none, choose web_search for specific factual information that might change over time.
 
 # Current Query
@@ -140,19 +234,12 @@ User Query: "What is the meaning of life?"
 def evaluate_expression(expression: str) -> str:
     """Safely evaluate a math expression"""
     try:
-        # Clean the expression to only allow safe operations
-        # Only allow digits, basic operators, parentheses, and whitespace
-        cleaned_expr = re.sub(r'[^0-9+\-*/().%\s]', '', expression)
-        if not cleaned_expr:
-            return "Invalid mathematical expression"
-            
-        # Evaluate the expression
-        result = eval(cleaned_expr)
+        result = calculate(expression)
         return f"Expression: {expression}\nResult: {result}"
-    except Exception as e:
+    except CalculatorError as e:
         return f"Error evaluating expression: {str(e)}"
 
-def execute_tool(tool_name: str, parameters: Dict[str, Any], session_id: str, status_callback=None) -> str:
+def execute_tool(tool_name: str, parameters: Dict[str, Any], session_id: str, status_callback=None, user_id=None) -> str:
     """Execute tool with session context and provide status updates"""
     # Default status callback if none provided
     if status_callback is None:
@@ -177,14 +264,22 @@ def execute_tool(tool_name: str, parameters: Dict[str, Any], session_id: str, st
         status_callback("🌐 Launching web search operation...")
         
         web_agent = WebSearchAgent()
-        vector_store = VectorStoreManager()
+        vector_store = VectorStoreManager.get_instance()
         query = parameters["query"]
         
         # First, perform the web search
-        web_results = web_agent.search(query)
+        if Config.WEB_CORPUS_ENABLED:
+            # Pages cached by earlier turns (any user) are not scraped or embedded again
+            sources, web_results, reused = web_agent.search_with_corpus(query)
+            # Syndicated copies of one article are neither embedded nor stored twice
+            web_results = dedupe_pages(web_results)
+            if reused:
+                status_callback(f"♻️ Reusing {len(reused)} cached pages")
+        else:
+            web_results = dedupe_pages(web_agent.search(query))
+            # Extract sources for status message
+            sources = [result["source"] for result in web_results]
         
-        # Extract sources for status message
-        sources = [result["source"] for result in web_results]
         if sources:
             source_list = ", ".join(sources[:3])
             if len(sources) > 3:
@@ -193,15 +288,23 @@ def execute_tool(tool_name: str, parameters: Dict[str, Any], session_id: str, st
         else:
             status_callback(f"📑 No sources found. Generating answer from LLM without context...")
     
-        # Store in vector DB with session_id for filtering
-        if sources:
-            vector_store.store_documents(web_results, session_id=session_id)
-        
-        # Retrieve relevant chunks - filtered by session ID
-        rag_results = vector_store.search(query, session_id=session_id)
+        if Config.WEB_CORPUS_ENABLED:
+            # Embed only new or changed pages, then rank cached and fresh chunks together
+            WebCorpus.store_documents(web_results)
+            rag_results = WebCorpus.search(query, sources)
+        elif Config.WEB_SEARCH_RETRIEVAL == "ephemeral":
+            # Rank this turn's chunks in memory; no Qdrant writes, so concurrent turns cannot see each other's chunks
+            rag_results = vector_store.rank_documents(query, web_results if sources else [])
+        else:
+            # Store in vector DB with session_id for filtering
+            if sources:
+                vector_store.store_documents(web_results, session_id=session_id, user_id=str(user_id) if user_id else None)
+            
+            # Retrieve relevant chunks - filtered by session ID
+            rag_results = vector_store.search(query, session_id=session_id)
 
-        # Clean up the documents immediately after search
-        vector_store.delete_session_embeddings(session_id)
+            # Clean up the documents immediately after search
+            vector_store.delete_session_embeddings(session_id)
         
         status_callback("✅ Information processing complete!")
         
@@ -214,6 +317,19 @@ def execute_tool(tool_name: str, parameters: Dict[str, Any], session_id: str, st
         
         return formatted_results
     
+    elif tool_name == "document_search":
+        status_callback("📄 Searching uploaded documents...")
+        doc_results = DocumentIngestor.search(parameters.get("query", ""), session_id)
+        status_callback("✅ Document search complete!")
+
+        if not doc_results:
+            return "No relevant information found in the uploaded documents."
+
+        formatted_results = ""
+        for i, result in enumerate(doc_results, 1):
+            formatted_results += f"Result {i}:\n{result['text']}\nSource: {result['source']}\n\n"
+        return formatted_results
+
     else:
         return "No tool executed."
 
@@ -249,39 +365,106 @@ def parse_tool_selection(response: str) -> Dict:
         if tool == "calculator":
             if "query" not in params:
                 params["query"] = params.get("query", "")
-        elif tool == "web_search":
+        elif tool in ("web_search", "document_search"):
             # Ensure 'query' is present
             params.setdefault("query", "")
 
         return parsed
     except Exception as e:
-        print(f"Error parsing tool selection: {e}")
+        logging.warning(f"Error parsing tool selection: {e}")
         return {"tool": "none", "parameters": {"query": ""}}
 
-def select_tool(model: str, user_query: str):
+def validate_tool_selection(selection: Any) -> Optional[str]:
+    """Check a selection against the tool registry; returns an error message or None"""
+    if not isinstance(selection, dict):
+        return "response is not a JSON object"
+    tool = selection.get("tool")
+    if tool not in TOOL_REGISTRY:
+        return f"unknown tool {tool!r}"
+    params = selection.get("parameters")
+    if not isinstance(params, dict):
+        return "parameters must be an object"
+    schema = TOOL_REGISTRY[tool]["parameters"]
+    for name, spec in schema["properties"].items():
+        if name in params and spec.get("type") == "string" and not isinstance(params[name], str):
+            return f"parameter {name!r} must be a string"
+    for name in schema["required"]:
+        if not str(params.get(name, "")).strip():
+            return f"{tool} requires a non-empty {name!r}"
+    return None
+
+def _request_tool_selection(model: str, messages: List[Dict[str, str]], user_id=None, on_wait=None, on_stats=None) -> Any:
+    """One schema-constrained, non-streaming selection call"""
+    started = time.perf_counter()
+    with AdmissionController.admit(model, user_id, PRIORITY_TOOL_SELECTION, on_wait):
+        admitted = time.perf_counter()
+        tool_response = ollama.chat(
+            model=model,
+            messages=messages,
+            stream=False,
+            format=TOOL_SELECTION_SCHEMA,
+            options={
+                "temperature": 0,
+                "num_predict": Config.TOOL_SELECTION_MAX_TOKENS
+            },
+            keep_alive=keep_alive_for(model)
+        )
+    stats = build_stats(model, "tool_selection", tool_response, started, admitted)
+    LLMTelemetry.record(stats)
+    if on_stats:
+        on_stats(stats)
+    try:
+        return json.loads(tool_response["message"]["content"])
+    except json.JSONDecodeError:
+        # Should not happen with structured output, but older servers may ignore the schema
+        return parse_tool_selection(tool_response["message"]["content"])
+
+def select_tool(model: str, user_query: str, user_id=None, on_wait=None, on_stats=None):
     """Ask the LLM which tool to use for a given query"""
-    tool_prompt = tool_selection_prompt(user_query)
-    tool_messages = [{"role": "system", "content": system_prompt}]
-    tool_messages.append({"role": "user", "content": tool_prompt})
-    
-    tool_response = ollama.chat(
-        model=model,
-        messages=tool_messages,
-        stream=False,
-    )
-    
-    return parse_tool_selection(tool_response["message"]["content"])
+    if Config.TOOL_SELECTION_PROMPT == "full":
+        tool_messages = [{"role": "system", "content": system_prompt}]
+        tool_messages.append({"role": "user", "content": tool_selection_prompt(user_query)})
+    else:
+        tool_messages = [{"role": "user", "content": short_tool_selection_prompt(user_query)}]
+
+    try:
+        selection = _request_tool_selection(model, tool_messages, user_id, on_wait, on_stats)
+        error = validate_tool_selection(selection)
+        if error:
+            # Retry once with a short repair prompt instead of silently dropping to "none"
+            logging.warning(f"Invalid tool selection ({error}), retrying")
+            selection = _request_tool_selection(
+                model, [{"role": "user", "content": tool_repair_prompt(user_query, error)}], user_id, on_wait, on_stats
+            )
+            error = validate_tool_selection(selection)
+        if error:
+            raise ValueError(error)
+    except Exception as e:
+        logging.error(f"Error selecting tool: {e}")
+        return {"tool": "none", "parameters": {"query": ""}}
+
+    selection["parameters"].setdefault("query", "")
+    return selection
 
-def generate_response(model: str, tool_context: Optional[str] = None):
+def generate_response(model: str, tool_context: Optional[str] = None, user_id=None, on_wait=None, on_stats=None):
     """Generate final response with optional tool context"""    
-    # Get the response stream
-    stream = ollama.chat(
-        model=model,
-        messages=tool_context,
-        stream=True,
-        options={
-            "num_ctx": 8192
-        } 
+    # Get the response stream; the model slot is taken when iteration starts
+    stream = LLMTelemetry.instrumented_stream(
+        lambda: ollama.chat(
+            model=model,
+            messages=tool_context,
+            stream=True,
+            options={
+                "num_ctx": 8192
+            },
+            keep_alive=keep_alive_for(model)
+        ),
+        model,
+        "generate",
+        user_id,
+        PRIORITY_INTERACTIVE,
+        on_wait,
+        on_stats
     )
     
     return stream
@@ -1,19 +1,20 @@
+import os
 import psycopg2
 import psycopg2.extras
-from psycopg2.pool import SimpleConnectionPool
+from psycopg2.pool import ThreadedConnectionPool
 from datetime import datetime
 import streamlit as st
 from backend.config import Config
 from backend.utils.redis_manager import RedisManager
 
 class PostgresManager:
-    _pool = None  # Connection pool
+    _pool = None  # Connection pool (thread-safe: turns and summaries run on worker threads)
     
     @classmethod
     def initialize_pool(cls, minconn=5, maxconn=20):
         """Initialize the PostgreSQL connection pool."""
         if cls._pool is None:
-            cls._pool = SimpleConnectionPool(
+            cls._pool = ThreadedConnectionPool(
                 minconn, maxconn,
                 host=Config.POSTGRES_HOST,
                 port=Config.POSTGRES_PORT,
@@ -95,6 +96,70 @@ class PostgresManager:
         finally:
             cls.release_connection(conn)
 
+    @staticmethod
+    def is_attachment_path(path):
+        """Whether a path points inside the attachment store (no other server files can be registered)."""
+        if not path:
+            return False
+        # realpath resolves ".." and symlinks before the prefix check
+        return os.path.realpath(path).startswith(os.path.realpath(Config.ATTACHMENT_DIR) + os.sep)
+
+    @classmethod
+    def add_message_attachments(cls, message_id, attachments):
+        """Record files stored for a message (dicts with file_name, file_type, file_path)."""
+        attachments = attachments or []
+        rejected = [a.get("file_path") for a in attachments if not cls.is_attachment_path(a.get("file_path"))]
+        if rejected:
+            st.error(f"Rejected attachment paths outside {Config.ATTACHMENT_DIR}: {rejected}")
+            attachments = [a for a in attachments if a.get("file_path") not in rejected]
+        if not attachments:
+            return False
+        conn = cls.get_connection()
+        if not conn:
+            return False
+        
+        try:
+            with conn.cursor() as cur:
+                psycopg2.extras.execute_values(cur, """
+                    INSERT INTO message_attachments (message_id, file_name, file_type, file_path) VALUES %s
+                """, [(message_id, a["file_name"], a["file_type"], a["file_path"]) for a in attachments])
+                cur.execute("""
+                    UPDATE messages SET has_attachments = TRUE WHERE message_id = %s
+                """, (message_id,))
+                conn.commit()
+                return True
+        except Exception as e:
+            st.error(f"Error adding message attachments: {e}")
+            return False
+        finally:
+            cls.release_connection(conn)
+
+    @classmethod
+    def get_message_attachments(cls, message_ids):
+        """Attachments for several messages, keyed by message_id."""
+        if not message_ids:
+            return {}
+        conn = cls.get_connection()
+        if not conn:
+            return {}
+        
+        try:
+            with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+                cur.execute("""
+                    SELECT message_id, file_name, file_type, file_path
+                    FROM message_attachments WHERE message_id = ANY(%s)
+                    ORDER BY attachment_id ASC
+                """, (list(message_ids),))
+                attachments = {}
+                for row in cur.fetchall():
+                    attachments.setdefault(row['message_id'], []).append(dict(row))
+                return attachments
+        except Exception as e:
+            st.error(f"Error retrieving message attachments: {e}")
+            return {}
+        finally:
+            cls.release_connection(conn)
+
     @classmethod
     def get_user_chat_sessions(cls, user_id, limit=20):
         """Retrieve chat sessions for a user."""
@@ -126,7 +191,7 @@ class PostgresManager:
         try:
             with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
                 cur.execute("""
-                    SELECT message_id, role, content, created_at
+                    SELECT message_id, role, content, created_at, has_attachments
                     FROM messages WHERE session_id = %s
                     ORDER BY created_at ASC
                 """, (session_id,))
@@ -195,3 +260,48 @@ class PostgresManager:
             return False
         finally:
             cls.release_connection(conn)
+
+    @classmethod
+    def get_session_summary(cls, session_id):
+        """Get the rolling summary of a session and how many messages it covers."""
+        conn = cls.get_connection()
+        if not conn:
+            return None
+        
+        try:
+            with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+                cur.execute("""
+                    SELECT summary, summary_message_count FROM chat_sessions WHERE session_id = %s
+                """, (session_id,))
+                row = cur.fetchone()
+                if not row:
+                    return None
+                return {
+                    'summary': row['summary'] or "",
+                    'message_count': row['summary_message_count'] or 0
+                }
+        except Exception as e:
+            st.error(f"Error retrieving session summary: {e}")
+            return None
+        finally:
+            cls.release_connection(conn)
+
+    @classmethod
+    def update_session_summary(cls, session_id, summary, message_count):
+        """Store the rolling summary of a session."""
+        conn = cls.get_connection()
+        if not conn:
+            return False
+        
+        try:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    UPDATE chat_sessions SET summary = %s, summary_message_count = %s WHERE session_id = %s
+                """, (summary, message_count, session_id))
+                conn.commit()
+                return cur.rowcount > 0
+        except Exception as e:
+            st.error(f"Error updating session summary: {e}")
+            return False
+        finally:
+            cls.release_connection(conn)
@@ -0,0 +1,300 @@
+# backend/utils/raptor.py
+import math
+import uuid
+import hashlib
+import logging
+import numpy as np
+import ollama
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from qdrant_client import models
+from backend.config import Config
+from backend.utils.vector_store import VectorStoreManager
+from backend.utils.redis_manager import RedisManager
+from backend.utils.admission import AdmissionController, PRIORITY_BACKGROUND
+
+def cluster_summary_prompt(texts: List[str]) -> str:
+    passages = "\n\n".join(f"[{i}] {text}" for i, text in enumerate(texts, 1))
+    return f"""Summarize the following related passages into one dense paragraph.
+
+Keep every concrete fact: names, numbers, dates, definitions and conclusions. Do not add information.
+Write at most {Config.RAPTOR_SUMMARY_MAX_TOKENS * 3 // 4} words. Reply with the summary only.
+
+PASSAGES:
+{passages}
+"""
+
+def spherical_kmeans(vectors: np.ndarray, k: int, iterations: int = 25, seed: int = 0) -> np.ndarray:
+    """
+    Cluster L2-normalised vectors by cosine similarity (k-means++ seeding).
+    Fully vectorized: one matrix product per iteration. Returns a label per row.
+    """
+    n = len(vectors)
+    if k >= n:
+        return np.arange(n)
+    rng = np.random.default_rng(seed)
+
+    # k-means++: pick seeds far (in cosine distance) from the ones already chosen
+    centroids = np.empty((k, vectors.shape[1]), dtype=np.float32)
+    centroids[0] = vectors[rng.integers(n)]
+    distance = 1.0 - vectors @ centroids[0]
+    for i in range(1, k):
+        weights = np.maximum(distance, 0.0).astype(np.float64) ** 2
+        total = weights.sum()
+        index = rng.choice(n, p=weights / total) if total > 0 else rng.integers(n)
+        centroids[i] = vectors[index]
+        distance = np.minimum(distance, 1.0 - vectors @ centroids[i])
+
+    labels = None
+    for _ in range(iterations):
+        new_labels = np.argmax(vectors @ centroids.T, axis=1)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        # Empty clusters keep their previous centroid
+        centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+    return labels
+
+class RaptorIndex:
+    """
+    RAPTOR-style summary tree over a corpus. Level 0 holds the chunks; each level
+    above holds LLM summaries of clusters of the level below. All levels live in
+    one Qdrant collection and are searched together (collapsed tree) under a
+    token budget. Adding documents only re-summarizes the branches they join.
+    """
+    def __init__(self, corpus_id: str):
+        self.corpus_id = str(corpus_id)
+        self.store = VectorStoreManager.get_instance()
+        self.client = self.store.qdrant_client
+        self.store.ensure_collection(Config.RAPTOR_COLLECTION)
+
+    def _corpus_filter(self) -> models.Filter:
+        return models.Filter(must=[models.FieldCondition(key="corpus_id", match=models.MatchValue(value=self.corpus_id))])
+
+    def _node_id(self, level: int, key: str) -> str:
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"raptor:{self.corpus_id}:{level}:{key}"))
+
+    def _load_nodes(self) -> Dict[str, Dict]:
+        """Every node of the corpus, with vectors"""
+        nodes = {}
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=Config.RAPTOR_COLLECTION,
+                scroll_filter=self._corpus_filter(),
+                limit=512,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True
+            )
+            for point in points:
+                node = dict(point.payload)
+                node["id"] = str(point.id)
+                node["vector"] = np.asarray(point.vector[self.store.VECTOR_NAME], dtype=np.float32)
+                nodes[node["id"]] = node
+            if offset is None:
+                return nodes
+
+    def _summarize(self, texts: List[str]) -> str:
+        # Keep the prompt within the summary model's budget
+        selected, used = [], 0
+        per_text = max(64, Config.RAPTOR_SUMMARY_INPUT_TOKENS // max(len(texts), 1))
+        for text in texts:
+            text = text[:per_text * 4]  # Coarse cut before counting; about 4 characters per token
+            used += self.store.text_splitter.count_tokens(text)
+            if used > Config.RAPTOR_SUMMARY_INPUT_TOKENS:
+                break
+            selected.append(text)
+        with AdmissionController.admit(Config.RAPTOR_SUMMARY_MODEL, f"raptor:{self.corpus_id}", PRIORITY_BACKGROUND):
+            response = ollama.chat(
+                model=Config.RAPTOR_SUMMARY_MODEL,
+                messages=[{"role": "user", "content": cluster_summary_prompt(selected)}],
+                stream=False,
+                options={"num_predict": Config.RAPTOR_SUMMARY_MAX_TOKENS, "temperature": 0}
+            )
+        return response["message"]["content"].strip()
+
+    def _resummarize(self, parents: List[Dict], nodes: Dict[str, Dict]):
+        """Summarize each parent's children in parallel, then embed the summaries in one batch"""
+        if not parents:
+            return
+        with ThreadPoolExecutor(max_workers=Config.RAPTOR_SUMMARY_WORKERS) as executor:
+            summaries = list(executor.map(
+                lambda parent: self._summarize([nodes[child]["document"] for child in parent["children"]]),
+                parents
+            ))
+        vectors = self.store.embed_texts(summaries)
+        for parent, summary, vector in zip(parents, summaries, vectors):
+            children = [nodes[child] for child in parent["children"]]
+            parent.update({
+                "document": summary,
+                "vector": vector,
+                "token_count": self.store.text_splitter.count_tokens(summary),
+                "source": ", ".join(sorted({child.get("source", "") for child in children if child.get("source")}))[:500],
+                "title": f"Summary of {len(children)} passages",
+            })
+
+    def _attach(self, level: int, nodes: Dict[str, Dict], dirty: set, changed: set):
+        """
+        Give parentless nodes of `level` a parent: join the closest existing cluster,
+        or cluster the rest into new parents. Recurses up the tree.
+        """
+        level_nodes = [node for node in nodes.values() if node["level"] == level]
+        parents = [node for node in nodes.values() if node["level"] == level + 1]
+        if level + 1 > Config.RAPTOR_MAX_LEVELS or len(level_nodes) <= 1:
+            return
+        # Every parentless node, including ones left over by earlier batches, so batches join one tree
+        orphans = [node for node in level_nodes if not node.get("parent_id")]
+
+        remaining = orphans
+        if parents and orphans:
+            # Incremental path: join the most similar existing branch if it is close and not full
+            similarity = np.stack([node["vector"] for node in orphans]) @ np.stack([p["vector"] for p in parents]).T
+            remaining = []
+            for orphan, row in zip(orphans, similarity):
+                best = int(np.argmax(row))
+                parent = parents[best]
+                if row[best] >= Config.RAPTOR_ASSIGN_THRESHOLD and len(parent["children"]) < Config.RAPTOR_MAX_CHILDREN:
+                    parent["children"].append(orphan["id"])
+                    orphan["parent_id"] = parent["id"]
+                    dirty.add(parent["id"])
+                    changed.add(orphan["id"])
+                else:
+                    remaining.append(orphan)
+
+        if len(remaining) >= Config.RAPTOR_MIN_CLUSTER_INPUT or (remaining and parents):
+            k = max(1, math.ceil(len(remaining) / Config.RAPTOR_CLUSTER_SIZE))
+            labels = spherical_kmeans(np.stack([node["vector"] for node in remaining]), k)
+            for label in np.unique(labels):
+                members = [node for node, node_label in zip(remaining, labels) if node_label == label]
+                key = hashlib.sha1("".join(sorted(node["id"] for node in members)).encode()).hexdigest()
+                parent = {
+                    "id": self._node_id(level + 1, key),
+                    "corpus_id": self.corpus_id,
+                    "level": level + 1,
+                    "children": [node["id"] for node in members],
+                    "parent_id": None,
+                }
+                nodes[parent["id"]] = parent
+                dirty.add(parent["id"])
+                for node in members:
+                    node["parent_id"] = parent["id"]
+                    changed.add(node["id"])
+
+        level_dirty = [nodes[node_id] for node_id in dirty if nodes[node_id]["level"] == level + 1]
+        if level_dirty:
+            self._resummarize(level_dirty, nodes)
+            changed.update(node["id"] for node in level_dirty)
+            # A changed summary changes its own parent's summary too
+            for node in level_dirty:
+                if node.get("parent_id"):
+                    dirty.add(node["parent_id"])
+        # Continue even without changes here: older parentless nodes above may still need a parent
+        self._attach(level + 1, nodes, dirty, changed)
+
+    def _upsert(self, nodes: List[Dict]):
+        for start in range(0, len(nodes), 256):
+            batch = nodes[start:start + 256]
+            self.client.upsert(
+                collection_name=Config.RAPTOR_COLLECTION,
+                points=[
+                    models.PointStruct(
+                        id=node["id"],
+                        vector=vector,
+                        payload={key: value for key, value in node.items() if key not in ("id", "vector")}
+                    )
+                    for node, vector in zip(batch, self.store.point_vectors(
+                        Config.RAPTOR_COLLECTION,
+                        [node["document"] for node in batch],
+                        [node["vector"] for node in batch]
+                    ))
+                ]
+            )
+
+    def add_documents(self, documents: List[Dict[str, str]], status_callback: Optional[Callable[[str], None]] = None) -> Dict:
+        """Add documents (title, text, source) as leaves and update the affected branches"""
+        if status_callback is None:
+            status_callback = lambda message: None
+
+        lock_name = f"raptor:{self.corpus_id}"
+        if not RedisManager.acquire_lock(lock_name, timeout=Config.RAPTOR_LOCK_SECONDS):
+            raise RuntimeError(f"RAPTOR index {self.corpus_id} is being updated by another worker")
+        try:
+            nodes = self._load_nodes()
+            chunks, metadata = self.store.chunk_documents(documents)
+            new_leaves = []
+            for chunk, meta in zip(chunks, metadata):
+                node_id = self._node_id(0, hashlib.sha1(chunk.encode("utf-8")).hexdigest())
+                if node_id in nodes:
+                    continue  # Same chunk already indexed
+                new_leaves.append({
+                    "id": node_id,
+                    "corpus_id": self.corpus_id,
+                    "level": 0,
+                    "document": chunk,
+                    "title": meta["title"],
+                    "source": meta["source"],
+                    "token_count": self.store.text_splitter.count_tokens(chunk),
+                    "children": [],
+                    "parent_id": None,
+                })
+            if not new_leaves:
+                return {"leaves": 0, "summaries": 0}
+
+            status_callback(f"🧮 Embedding {len(new_leaves)} chunks...")
+            for leaf, vector in zip(new_leaves, self.store.embed_texts([leaf["document"] for leaf in new_leaves])):
+                leaf["vector"] = vector
+                nodes[leaf["id"]] = leaf
+
+            status_callback("🌳 Clustering and summarizing...")
+            dirty, changed = set(), {leaf["id"] for leaf in new_leaves}
+            self._attach(0, nodes, dirty, changed)
+            self._upsert([nodes[node_id] for node_id in changed])
+
+            summaries = sum(1 for node_id in changed if nodes[node_id]["level"] > 0)
+            logging.info(f"RAPTOR {self.corpus_id}: {len(new_leaves)} leaves, {summaries} summaries updated")
+            return {"leaves": len(new_leaves), "summaries": summaries}
+        finally:
+            RedisManager.release_lock(lock_name)
+
+    def search(self, query: str, token_budget: Optional[int] = None) -> List[Dict[str, str]]:
+        """
+        Collapsed-tree retrieval: rank nodes of every level together and take the
+        best ones until the token budget is spent. Same format as VectorStoreManager.search.
+        """
+        token_budget = token_budget or Config.RAPTOR_TOKEN_BUDGET
+        try:
+            points = self.store.query_collection(
+                Config.RAPTOR_COLLECTION,
+                query,
+                self.store.embed_texts([query])[0],
+                self._corpus_filter(),
+                Config.RAPTOR_CANDIDATES
+            )
+        except Exception as e:
+            logging.error(f"RAPTOR search error: {str(e)}")
+            return []
+
+        results, used = [], 0
+        for point in points:
+            tokens = point.payload.get("token_count", 0)
+            if used + tokens > token_budget:
+                continue  # A smaller node further down may still fit
+            used += tokens
+            results.append({
+                "title": point.payload.get("title", ""),
+                "text": point.payload.get("document", ""),
+                "source": point.payload.get("source", ""),
+                "level": point.payload.get("level", 0),
+            })
+        return results
+
+    def delete(self):
+        """Remove the whole tree of this corpus"""
+        self.client.delete(
+            collection_name=Config.RAPTOR_COLLECTION,
+            points_selector=models.FilterSelector(filter=self._corpus_filter())
+        )
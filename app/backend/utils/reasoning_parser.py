@@ -0,0 +1,80 @@
+# backend/utils/reasoning_parser.py
+from typing import Iterable, Iterator, List, NamedTuple
+
+REASONING = "reasoning"
+ANSWER = "answer"
+
+class StreamEvent(NamedTuple):
+    kind: str  # REASONING or ANSWER
+    text: str
+
+class ReasoningStreamParser:
+    """
+    Incremental state machine that splits a token stream into reasoning and
+    answer text. Tags may be split across chunks: at most len(tag) - 1
+    characters are held back between chunks, and each character is scanned once.
+    """
+
+    def __init__(self, open_tag: str = "<think>", close_tag: str = "</think>", start_in_reasoning: bool = False):
+        self.open_tag = open_tag
+        self.close_tag = close_tag
+        self.in_reasoning = start_in_reasoning
+        self._carry = ""
+
+    @property
+    def _tag(self) -> str:
+        """The tag that would change the current state"""
+        return self.close_tag if self.in_reasoning else self.open_tag
+
+    @property
+    def _kind(self) -> str:
+        return REASONING if self.in_reasoning else ANSWER
+
+    def feed(self, chunk: str) -> List[StreamEvent]:
+        """Consume one chunk and return the events it completes"""
+        if not chunk:
+            return []
+        # Fast path: no tag can start or complete inside this chunk
+        if not self._carry and self._tag[0] not in chunk:
+            return [StreamEvent(self._kind, chunk)]
+        text = self._carry + chunk if self._carry else chunk
+        self._carry = ""
+        events = []
+        pos = 0
+
+        while True:
+            tag = self._tag
+            idx = text.find(tag, pos)
+            if idx == -1:
+                break
+            if idx > pos:
+                events.append(StreamEvent(self._kind, text[pos:idx]))
+            self.in_reasoning = not self.in_reasoning
+            pos = idx + len(tag)
+
+        # Hold back a trailing partial tag; it is resolved by the next chunk
+        tag = self._tag
+        end = len(text)
+        for size in range(min(len(tag) - 1, end - pos), 0, -1):
+            if text.endswith(tag[:size]):
+                self._carry = text[end - size:]
+                end -= size
+                break
+
+        if end > pos:
+            events.append(StreamEvent(self._kind, text[pos:end]))
+        return events
+
+    def close(self) -> List[StreamEvent]:
+        """Flush any held-back text at the end of the stream"""
+        carry, self._carry = self._carry, ""
+        return [StreamEvent(self._kind, carry)] if carry else []
+
+def parse_reasoning_stream(tokens: Iterable[str], open_tag: str = "<think>", close_tag: str = "</think>", start_in_reasoning: bool = False) -> Iterator[StreamEvent]:
+    """Turn a stream of text chunks into typed reasoning/answer events in one pass"""
+    parser = ReasoningStreamParser(open_tag, close_tag, start_in_reasoning)
+    feed = parser.feed
+    for token in tokens:
+        for event in feed(token):
+            yield event
+    yield from parser.close()
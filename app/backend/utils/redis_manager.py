@@ -122,7 +122,7 @@ class RedisManager:
             message = json.dumps({"role": role, "content": content})
             with redis_client.pipeline() as pipe:
                 pipe.lpush(f"chat_history:{session_id}", message)
-                pipe.ltrim(f"chat_history:{session_id}", 0, 7)  # Keep 3 latest, 7 because it is 4 user and 3 assistant messages
+                pipe.ltrim(f"chat_history:{session_id}", 0, Config.RECENT_CONTEXT_MESSAGES - 1)  # Older messages live in the rolling summary
                 pipe.expire(f"chat_history:{session_id}", 86400)  # Auto-cleanup
                 pipe.execute()
             return True
@@ -138,10 +138,70 @@ class RedisManager:
         if not redis_client:
             return []
         try:
-            history = redis_client.lrange(f"chat_history:{session_id}", 0, 7)
+            history = redis_client.lrange(f"chat_history:{session_id}", 0, Config.RECENT_CONTEXT_MESSAGES - 1)
             return [json.loads(msg) for msg in reversed(history)] if history else []
         except Exception as e:
             st.error(f"Redis context fetch error: {e}")
             return []
         finally:
-            redis_client.close()
\ No newline at end of file
+            redis_client.close()
+
+    @classmethod
+    def set_session_summary(cls, session_id, summary, message_count, expiration=86400):
+        redis_client = cls.get_connection()
+        if not redis_client:
+            return False
+        try:
+            redis_client.setex(
+                f"chat_summary:{session_id}",
+                expiration,
+                json.dumps({"summary": summary, "message_count": message_count})
+            )
+            return True
+        except Exception as e:
+            st.error(f"Redis summary update error: {e}")
+            return False
+        finally:
+            redis_client.close()
+
+    @classmethod
+    def get_session_summary(cls, session_id):
+        redis_client = cls.get_connection()
+        if not redis_client:
+            return None
+        try:
+            cached = redis_client.get(f"chat_summary:{session_id}")
+            return json.loads(cached) if cached else None
+        except Exception as e:
+            st.error(f"Redis summary fetch error: {e}")
+            return None
+        finally:
+            redis_client.close()
+
+    @classmethod
+    def acquire_lock(cls, name, timeout=120):
+        """Best-effort lock so only one worker updates a shared value at a time"""
+        redis_client = cls.get_connection()
+        if not redis_client:
+            return False
+        try:
+            return bool(redis_client.set(f"lock:{name}", 1, nx=True, ex=timeout))
+        except Exception as e:
+            st.error(f"Redis lock error: {e}")
+            return False
+        finally:
+            redis_client.close()
+
+    @classmethod
+    def release_lock(cls, name):
+        redis_client = cls.get_connection()
+        if not redis_client:
+            return False
+        try:
+            redis_client.delete(f"lock:{name}")
+            return True
+        except Exception as e:
+            st.error(f"Redis unlock error: {e}")
+            return False
+        finally:
+            redis_client.close()
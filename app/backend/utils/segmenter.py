@@ -0,0 +1,145 @@
+# backend/utils/segmenter.py
+import re
+from typing import Dict, List, NamedTuple
+
+class StatementSpan(NamedTuple):
+    start: int  # Offset of the first character in the source text
+    end: int    # Offset one past the last character
+    text: str
+
+# Words that end with a period without ending the sentence (lower-case, without the final period)
+ABBREVIATIONS = {
+    "e.g", "i.e", "vs", "cf", "al", "approx", "fig", "vol", "pp",
+    "mr", "mrs", "ms", "dr", "prof", "jr", "sr", "inc", "ltd", "corp",
+    "u.s", "u.k", "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec",
+}
+
+LINE = re.compile(r"[^\n]*\n?")
+# Leading markdown that stays outside the highlighted span: indentation, quotes, bullets, numbering
+LINE_PREFIX = re.compile(r"[ \t]*(?:>[ \t]*)*(?:(?:[-*+]|\d{1,3}[.)])[ \t]+)?")
+CANDIDATE = re.compile(r"[.!?`$]")
+CLOSERS = "\"')]*_"
+MIN_WORDS = 4
+
+def _is_sentence_end(line: str, i: int) -> bool:
+    """Decide whether the terminator at line[i] ends a sentence"""
+    char = line[i]
+    if char == ".":
+        # Decimals and version numbers: 3.14, v1.2
+        if i + 1 < len(line) and line[i + 1].isdigit():
+            return False
+        # Abbreviations: look back to the start of the word
+        j = i
+        while j > 0 and (line[j - 1].isalpha() or line[j - 1] == "."):
+            j -= 1
+        word = line[j:i].lower()
+        if word in ABBREVIATIONS:
+            return False
+    # Terminator (plus closing quotes/emphasis) must be followed by whitespace or the end of the line
+    k = i + 1
+    while k < len(line) and line[k] in CLOSERS:
+        k += 1
+    return k == len(line) or line[k].isspace()
+
+def _math_end(line: str, i: int, length: int) -> int:
+    """Index of the $ closing inline math opened at line[i], or -1 if it is a literal dollar"""
+    # "$5", "$ 20" and an unmatched "$" are currency, not math
+    if i + 1 >= length or line[i + 1].isdigit() or line[i + 1].isspace():
+        return -1
+    j = line.find("$", i + 1, length)
+    while j != -1:
+        if line[j - 1] != "\\" and not line[j - 1].isspace() and not (j + 1 < length and line[j + 1].isdigit()):
+            return j
+        j = line.find("$", j + 1, length)
+    return -1
+
+def _split_line(line: str, offset: int, spans: List[StatementSpan]):
+    """Scan one prose line once, appending sentence spans"""
+    start = LINE_PREFIX.match(line).end()
+    length = len(line.rstrip("\n"))
+    in_code = False
+    math_end = -1  # Index of the $ closing the inline math being skipped
+
+    # Only terminators and code/math delimiters need a decision
+    for match in CANDIDATE.finditer(line, start, length):
+        i = match.start()
+        if i < start or i <= math_end:
+            continue
+        char = line[i]
+        if char == "`":
+            in_code = not in_code
+        elif char == "$":
+            if not in_code and (i == 0 or line[i - 1] != "\\"):
+                math_end = _math_end(line, i, length)
+        elif not in_code and _is_sentence_end(line, i):
+            end = i + 1
+            # Keep closing quotes, brackets and emphasis markers with the sentence
+            while end < length and line[end] in CLOSERS:
+                end += 1
+            _append(line, offset, start, end, spans)
+            start = end
+            while start < length and line[start] in " \t":
+                start += 1
+
+    _append(line, offset, start, length, spans)
+
+def _append(line: str, offset: int, start: int, end: int, spans: List[StatementSpan]):
+    while end > start and line[end - 1].isspace():
+        end -= 1
+    text = line[start:end]
+    if len(text.split()) >= MIN_WORDS:
+        spans.append(StatementSpan(offset + start, offset + end, text))
+
+def segment_statements(text: str) -> List[StatementSpan]:
+    """
+    Split an answer into factual statements with character offsets.
+    Fenced code blocks, $$ math blocks, headings, tables and short fragments are skipped,
+    and no statement crosses a line break, so markdown structure survives highlighting.
+    """
+    spans = []
+    in_fence = False
+    in_math_block = False
+
+    for match in LINE.finditer(text):
+        line = match.group()
+        if not line:
+            break
+        stripped = line.strip()
+
+        if stripped.startswith("```") or stripped.startswith("~~~"):
+            in_fence = not in_fence
+            continue
+        if in_fence:
+            continue
+        if stripped.startswith("$$"):
+            # A block that opens and closes on the same line does not change state
+            if not (len(stripped) > 2 and stripped.endswith("$$")):
+                in_math_block = not in_math_block
+            continue
+        if in_math_block or not stripped or stripped.startswith(("#", "|")):
+            continue
+
+        _split_line(line, match.start(), spans)
+
+    return spans
+
+def break_into_statements(text: str) -> List[str]:
+    """Statement texts only, for prompts that do not need offsets"""
+    return [span.text for span in segment_statements(text)]
+
+def apply_highlighting(text: str, spans: List[StatementSpan], evaluation_results: Dict[int, bool]) -> str:
+    """
+    Highlight statements marked inaccurate in a single linear pass.
+    Spans are numbered from 1 in the order segment_statements returned them.
+    """
+    pieces = []
+    cursor = 0
+    for i, span in enumerate(spans, 1):
+        if evaluation_results.get(i, True):
+            continue
+        pieces.append(text[cursor:span.start])
+        # Mark false statements with red highlighting (using Streamlit markdown syntax)
+        pieces.append(f":red[:red-background[{text[span.start:span.end]}]]")
+        cursor = span.end
+    pieces.append(text[cursor:])
+    return "".join(pieces)
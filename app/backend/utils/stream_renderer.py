@@ -0,0 +1,75 @@
+# backend/utils/stream_renderer.py
+import time
+import logging
+from typing import Dict, Optional
+from backend.config import Config
+
+class StreamRenderer:
+    """
+    Coalesces streamed tokens and re-renders a Streamlit placeholder on a time
+    or size cadence instead of on every token.
+    """
+
+    def __init__(self, placeholder, interval: Optional[float] = None, max_tokens: Optional[int] = None, name: str = "stream"):
+        self.placeholder = placeholder
+        self.interval = Config.STREAM_FLUSH_INTERVAL if interval is None else interval
+        self.max_tokens = Config.STREAM_FLUSH_TOKENS if max_tokens is None else max_tokens
+        self.name = name
+
+        self.text = ""
+        self._pending = []
+        self.tokens = 0
+        self.flushes = 0
+        self.render_time = 0.0
+        self.started_at = None
+        self.finished_at = None
+        self._last_flush = 0.0
+
+    def write(self, token: str):
+        """Buffer a token and flush if the cadence is due"""
+        if not token:
+            return
+        now = time.perf_counter()
+        if self.started_at is None:
+            self.started_at = now
+            self._last_flush = now
+
+        self._pending.append(token)
+        self.tokens += 1
+        if len(self._pending) >= self.max_tokens or now - self._last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        """Render everything received so far"""
+        if not self._pending:
+            return
+        self.text += "".join(self._pending)
+        self._pending = []
+
+        render_start = time.perf_counter()
+        self.placeholder.markdown(self.text)
+        self._last_flush = time.perf_counter()
+        self.render_time += self._last_flush - render_start
+        self.flushes += 1
+
+    def close(self) -> str:
+        """Final flush; returns the full text"""
+        self.flush()
+        self.finished_at = time.perf_counter()
+        if self.tokens:
+            logging.info(f"{self.name} render stats: {self.stats}")
+        return self.text
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """Tokens per second and the share of wall time spent rendering"""
+        if self.started_at is None:
+            return {"tokens": 0, "flushes": 0, "tokens_per_second": 0.0, "render_time": 0.0, "render_overhead": 0.0}
+        elapsed = (self.finished_at or time.perf_counter()) - self.started_at
+        return {
+            "tokens": self.tokens,
+            "flushes": self.flushes,
+            "tokens_per_second": self.tokens / elapsed if elapsed > 0 else 0.0,
+            "render_time": self.render_time,
+            "render_overhead": self.render_time / elapsed if elapsed > 0 else 0.0
+        }
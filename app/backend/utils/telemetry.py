@@ -0,0 +1,145 @@
+# backend/utils/telemetry.py
+import time
+import logging
+import threading
+from collections import deque
+from typing import Callable, Dict, Iterator, List, Optional
+from backend.config import Config
+from backend.utils.admission import AdmissionController, PRIORITY_INTERACTIVE
+
+NS_PER_SECOND = 1e9
+
+# Per-call fields summed into the exported totals
+SUMMED_FIELDS = ("queue_time", "ttft", "total_time", "load_time", "prompt_tokens", "eval_tokens", "eval_time")
+
+def _value(response, key: str, default=0):
+    """Read a field from an Ollama response object or dict"""
+    if response is None:
+        return default
+    try:
+        value = response[key]
+    except (KeyError, TypeError):
+        return default
+    return default if value is None else value
+
+def build_stats(model: str, call: str, response, started: float, admitted: float, first_token: Optional[float] = None) -> Dict:
+    """
+    Per-call stats from wall-clock timestamps and Ollama's response counters.
+    ttft is measured from the request (queue time included); for non-streaming
+    calls it is the time to the full response.
+    """
+    finished = time.perf_counter()
+    eval_tokens = _value(response, "eval_count")
+    eval_time = _value(response, "eval_duration") / NS_PER_SECOND
+    prompt_tokens = _value(response, "prompt_eval_count")
+    prompt_time = _value(response, "prompt_eval_duration") / NS_PER_SECOND
+    return {
+        "model": model,
+        "call": call,
+        "queue_time": round(admitted - started, 4),
+        "ttft": round((first_token or finished) - started, 4),
+        "total_time": round(finished - started, 4),
+        "load_time": round(_value(response, "load_duration") / NS_PER_SECOND, 4),
+        "prompt_tokens": prompt_tokens,
+        "eval_tokens": eval_tokens,
+        "eval_time": round(eval_time, 4),
+        "prompt_tokens_per_second": round(prompt_tokens / prompt_time, 1) if prompt_time else None,
+        "tokens_per_second": round(eval_tokens / eval_time, 1) if eval_time else None,
+    }
+
+class LLMTelemetry:
+    """
+    In-process aggregation of per-call LLM stats: running totals per (model, call)
+    for metric export, plus a window of recent calls for percentiles.
+    """
+    _lock = threading.Lock()
+    _totals = {}
+    _recent = deque(maxlen=Config.TELEMETRY_RECENT_CALLS)
+
+    @classmethod
+    def record(cls, stats: Dict):
+        with cls._lock:
+            totals = cls._totals.setdefault((stats["model"], stats["call"]), dict.fromkeys(("calls",) + SUMMED_FIELDS, 0))
+            totals["calls"] += 1
+            for field in SUMMED_FIELDS:
+                totals[field] += stats[field]
+            cls._recent.append(stats)
+        if Config.TELEMETRY_LOG_CALLS:
+            logging.info(f"LLM call {stats}")
+
+    @classmethod
+    def instrumented_stream(cls, stream_factory: Callable[[], Iterator], model: str, call: str, user_id=None,
+                            priority: int = PRIORITY_INTERACTIVE, on_wait=None, on_stats: Optional[Callable[[Dict], None]] = None) -> Iterator:
+        """Admitted stream that records queue time, TTFT and the final chunk's counters"""
+        started = time.perf_counter()
+        timing = {}
+
+        def factory():
+            timing["admitted"] = time.perf_counter()
+            return stream_factory()
+
+        first_token = None
+        final_chunk = None
+        try:
+            for chunk in AdmissionController.admitted_stream(factory, model, user_id, priority, on_wait):
+                if first_token is None and chunk["message"]["content"]:
+                    first_token = time.perf_counter()
+                if _value(chunk, "done", False):
+                    final_chunk = chunk
+                yield chunk
+        finally:
+            if "admitted" in timing:
+                stats = build_stats(model, call, final_chunk, started, timing["admitted"], first_token)
+                cls.record(stats)
+                if on_stats:
+                    on_stats(stats)
+
+    @classmethod
+    def summary(cls) -> List[Dict]:
+        """Averages and recent p50/p95 TTFT per (model, call)"""
+        with cls._lock:
+            totals = {key: dict(value) for key, value in cls._totals.items()}
+            recent = list(cls._recent)
+
+        rows = []
+        for (model, call), total in sorted(totals.items()):
+            calls = total["calls"]
+            ttfts = sorted(s["ttft"] for s in recent if s["model"] == model and s["call"] == call)
+            rows.append({
+                "model": model,
+                "call": call,
+                "calls": calls,
+                "avg_queue_time": round(total["queue_time"] / calls, 3),
+                "avg_ttft": round(total["ttft"] / calls, 3),
+                "p50_ttft": ttfts[len(ttfts) // 2] if ttfts else None,
+                "p95_ttft": ttfts[min(len(ttfts) - 1, int(len(ttfts) * 0.95))] if ttfts else None,
+                "avg_load_time": round(total["load_time"] / calls, 3),
+                "tokens_per_second": round(total["eval_tokens"] / total["eval_time"], 1) if total["eval_time"] else None,
+                "prompt_tokens": total["prompt_tokens"],
+                "eval_tokens": total["eval_tokens"],
+            })
+        return rows
+
+    @classmethod
+    def prometheus(cls) -> str:
+        """Totals in the Prometheus text exposition format"""
+        with cls._lock:
+            totals = {key: dict(value) for key, value in cls._totals.items()}
+
+        metrics = [
+            ("llm_calls_total", "counter", "LLM calls", "calls"),
+            ("llm_queue_seconds_total", "counter", "Time spent waiting for a model slot", "queue_time"),
+            ("llm_ttft_seconds_total", "counter", "Time to first token, queue time included", "ttft"),
+            ("llm_call_seconds_total", "counter", "Wall-clock time of LLM calls", "total_time"),
+            ("llm_load_seconds_total", "counter", "Model load time reported by Ollama", "load_time"),
+            ("llm_prompt_tokens_total", "counter", "Prompt tokens evaluated", "prompt_tokens"),
+            ("llm_eval_tokens_total", "counter", "Tokens generated", "eval_tokens"),
+            ("llm_eval_seconds_total", "counter", "Generation time reported by Ollama", "eval_time"),
+        ]
+        lines = []
+        for name, kind, help_text, field in metrics:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (model, call), total in sorted(totals.items()):
+                lines.append(f'{name}{{model="{model}",call="{call}"}} {total[field]}')
+        return "\n".join(lines) + "\n"
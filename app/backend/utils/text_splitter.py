@@ -0,0 +1,137 @@
+# backend/utils/text_splitter.py
+import re
+import logging
+import threading
+from collections import deque
+from typing import Callable, Iterator, List, Optional, Tuple
+
+# Unit boundaries: paragraph breaks, sentence ends and line breaks (trailing whitespace stays with the unit)
+BOUNDARY = re.compile(r"\n\s*\n\s*|[.!?]+[\"')\]]*\s+|\n\s*")
+CHARS_PER_TOKEN = 4  # Estimate used when the tokenizer cannot be loaded
+ENCODE_WINDOW = 256  # Units tokenized per encode_batch call
+
+class TokenTextSplitter:
+    """
+    Splits text into chunks of at most chunk_tokens tokens of the embedding model's
+    tokenizer, with about overlap_tokens of overlap. Chunks end at sentence or line
+    boundaries, preferably paragraph breaks, and are sliced from the original text.
+    Drop-in for RecursiveCharacterTextSplitter.split_text.
+    """
+
+    def __init__(self, chunk_tokens: int, overlap_tokens: int, tokenizer_factory: Optional[Callable] = None):
+        if overlap_tokens >= chunk_tokens:
+            raise ValueError("overlap_tokens must be smaller than chunk_tokens")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self._tokenizer_factory = tokenizer_factory
+        self._tokenizer = None
+        self._tokenizer_loaded = tokenizer_factory is None
+        self._lock = threading.Lock()
+
+    def _get_tokenizer(self):
+        """A `tokenizers.Tokenizer` without truncation, or None to estimate from characters"""
+        if not self._tokenizer_loaded:
+            with self._lock:
+                if not self._tokenizer_loaded:
+                    try:
+                        self._tokenizer = self._tokenizer_factory()
+                    except Exception as e:
+                        logging.warning(f"Tokenizer unavailable, sizing chunks by characters: {e}")
+                    self._tokenizer_loaded = True
+        return self._tokenizer
+
+    def _units(self, text: str) -> Iterator[Tuple[int, int, bool]]:
+        """(start, end, ends a paragraph) of each sentence or line"""
+        start = 0
+        for match in BOUNDARY.finditer(text):
+            end = match.end()
+            if end > start:
+                yield start, end, match.group().count("\n") >= 2
+            start = end
+        if start < len(text):
+            yield start, len(text), True
+
+    def _measured_units(self, text: str) -> Iterator[Tuple[int, int, int, bool]]:
+        """Units with their token counts; units longer than a chunk are cut at token boundaries"""
+        tokenizer = self._get_tokenizer()
+        window = []
+        for unit in self._units(text):
+            window.append(unit)
+            if len(window) >= ENCODE_WINDOW:
+                yield from self._measure(text, window, tokenizer)
+                window = []
+        if window:
+            yield from self._measure(text, window, tokenizer)
+
+    def _measure(self, text: str, units: List[Tuple[int, int, bool]], tokenizer) -> Iterator[Tuple[int, int, int, bool]]:
+        if tokenizer is None:
+            for start, end, paragraph_end in units:
+                step = self.chunk_tokens * CHARS_PER_TOKEN
+                for piece_start in range(start, end, step):
+                    piece_end = min(piece_start + step, end)
+                    tokens = -(-(piece_end - piece_start) // CHARS_PER_TOKEN)
+                    yield piece_start, piece_end, tokens, paragraph_end and piece_end == end
+            return
+
+        # WordPiece splits on whitespace first, so unit token counts add up to the chunk's count
+        encodings = tokenizer.encode_batch([text[start:end] for start, end, _ in units], add_special_tokens=False)
+        for (start, end, paragraph_end), encoding in zip(units, encodings):
+            tokens = len(encoding.ids)
+            if tokens <= self.chunk_tokens:
+                yield start, end, tokens, paragraph_end
+                continue
+            offsets = encoding.offsets
+            for first in range(0, tokens, self.chunk_tokens):
+                last = min(first + self.chunk_tokens, tokens)
+                piece_start = start if first == 0 else start + offsets[first][0]
+                piece_end = end if last == tokens else start + offsets[last][0]
+                yield piece_start, piece_end, last - first, paragraph_end and last == tokens
+
+    def iter_split(self, text: str) -> Iterator[str]:
+        """Yield chunks lazily; each unit is tokenized once and each chunk is a single slice"""
+        pending = deque()  # (start, end, tokens, ends a paragraph) of the chunk being built
+        total = 0
+        carried = 0  # Leading units of pending that are overlap from the previous chunk
+        for unit in self._measured_units(text):
+            tokens = unit[2]
+            while pending and total + tokens > self.chunk_tokens:
+                if carried == len(pending):
+                    # Only overlap so far: give some of it up rather than cut the new unit short
+                    total -= pending.popleft()[2]
+                    carried -= 1
+                    continue
+                # Cut at the last paragraph break if that keeps at least half a chunk of new content
+                cut, running = len(pending), 0
+                for i, (_, _, unit_tokens, paragraph_end) in enumerate(pending):
+                    running += unit_tokens
+                    if paragraph_end and running >= self.chunk_tokens // 2 and carried < i + 1 < len(pending):
+                        cut = i + 1
+                chunk = text[pending[0][0]:pending[cut - 1][1]].strip()
+                if chunk:
+                    yield chunk
+
+                emitted = [pending.popleft() for _ in range(cut)]
+                # Carry the tail of the emitted chunk over as overlap
+                carried = overlap = 0
+                for previous in reversed(emitted):
+                    if overlap + previous[2] > self.overlap_tokens:
+                        break
+                    pending.appendleft(previous)
+                    overlap += previous[2]
+                    carried += 1
+                total = sum(item[2] for item in pending)
+            pending.append(unit)
+            total += tokens
+        if pending:
+            chunk = text[pending[0][0]:pending[-1][1]].strip()
+            if chunk:
+                yield chunk
+
+    def split_text(self, text: str) -> List[str]:
+        return list(self.iter_split(text))
+
+    def count_tokens(self, text: str) -> int:
+        tokenizer = self._get_tokenizer()
+        if tokenizer is None:
+            return -(-len(text) // CHARS_PER_TOKEN)
+        return len(tokenizer.encode(text, add_special_tokens=False).ids)
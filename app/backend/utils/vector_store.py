@@ -1,68 +1,375 @@
 from qdrant_client import QdrantClient, models
 from typing import List, Optional, Dict
+import uuid
+import time
 import logging
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import threading
+import numpy as np
+from fastembed import TextEmbedding, SparseTextEmbedding
 from backend.config import Config
+from backend.utils.embedding_cache import EmbeddingCache, SparseVector
+from backend.utils.text_splitter import TokenTextSplitter
+from backend.utils.context_selection import select_context
+
+# Payload layout per collection: the tenant field every query filters on (its own HNSW
+# graph per value instead of one global graph) and the other indexed fields
+COLLECTION_LAYOUTS = {
+    "document": {
+        "tenant": Config.QDRANT_TENANT_KEY,
+        "keyword": [key for key in ("session_id", "user_id") if key != Config.QDRANT_TENANT_KEY],
+    },
+    Config.DOCUMENT_COLLECTION: {
+        "tenant": Config.QDRANT_TENANT_KEY,
+        "keyword": [key for key in ("session_id", "user_id") if key != Config.QDRANT_TENANT_KEY] + ["document_id"],
+    },
+    Config.RAPTOR_COLLECTION: {"tenant": "corpus_id"},
+    # Shared by all users and queried by URL lists, so it keeps the global graph
+    Config.WEB_CORPUS_COLLECTION: {"keyword": ["url"], "float": ["fetched_at"], "integer": ["chunk_index"]},
+}
 
 class VectorStoreManager:
+    """
+    Process-wide Qdrant access and embedding. Use get_instance(); the FastEmbed
+    model is loaded once (warm_up() at startup) and shared by every session thread.
+    """
     DENSE_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
     SPARSE_MODEL = "prithivida/Splade_PP_en_v1"
+    # Named vector and size that Qdrant's FastEmbed integration used for this model, kept for existing collections
+    VECTOR_NAME = "fast-all-minilm-l6-v2"
+    VECTOR_SIZE = 384
+    SPARSE_VECTOR_NAME = "fast-sparse-splade_pp_en_v1"
+    _embedding_model = None  # Shared FastEmbed model for in-process embedding
+    _sparse_model = None  # SPLADE model, loaded on first use in hybrid mode
+    _tokenizer = None
+    _model_lock = threading.Lock()
+    _ready = threading.Event()
+    _instance = None
+    _instance_lock = threading.Lock()
+    _ready_collections = set()
+    _sparse_collections = set()  # Collections created with the sparse vector
+
     def __init__(self):
         self.collection_name = "document"
-        # initialize Qdrant client
+        # initialize Qdrant client (HTTP, safe to share between threads)
         self.qdrant_client = QdrantClient(f"http://{Config.QDRANT_HOST}:{Config.QDRANT_PORT}")
-        self.qdrant_client.set_model(self.DENSE_MODEL)
-        # comment this line to use dense vectors only
-        # self.qdrant_client.set_sparse_model(self.SPARSE_MODEL)
-        # Initialize text splitter
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=750,
-            chunk_overlap=200,
-            length_function=len,
-            is_separator_regex=False,
+        # Chunks sized in the embedding model's tokens; the tokenizer is loaded on first use
+        self.text_splitter = TokenTextSplitter(
+            Config.SPLITTER_CHUNK_TOKENS,
+            Config.SPLITTER_OVERLAP_TOKENS,
+            tokenizer_factory=self.get_tokenizer,
         )
-        if not self.qdrant_client.collection_exists(self.collection_name):
+        self.ensure_collection(self.collection_name)
+
+    @staticmethod
+    def _quantization_config():
+        if not Config.QDRANT_QUANTIZATION:
+            return None
+        # int8 copies stay in RAM for the search itself; the float32 originals live on disk for rescoring
+        return models.ScalarQuantization(scalar=models.ScalarQuantizationConfig(
+            type=models.ScalarType.INT8,
+            quantile=Config.QDRANT_QUANTILE,
+            always_ram=True
+        ))
+
+    @staticmethod
+    def search_params() -> Optional[models.SearchParams]:
+        """Search the quantized vectors, then rescore the oversampled candidates with the originals"""
+        if not Config.QDRANT_QUANTIZATION:
+            return None
+        return models.SearchParams(quantization=models.QuantizationSearchParams(
+            rescore=True,
+            oversampling=Config.QDRANT_OVERSAMPLING
+        ))
+
+    def ensure_collection(self, name: str):
+        """
+        Create a collection with the current layout (on-disk vectors, int8 quantization,
+        tenant partitioning, payload indexes), or migrate an existing one to it in place.
+        Idempotent; checked once per process and collection.
+        """
+        if name in self._ready_collections:
+            return
+        layout = COLLECTION_LAYOUTS.get(name, {})
+        quantization = self._quantization_config()
+        # m=0 drops the global graph; payload_m builds one per tenant value instead
+        hnsw = models.HnswConfigDiff(m=0, payload_m=Config.QDRANT_PAYLOAD_M) if layout.get("tenant") else None
+
+        if not self.qdrant_client.collection_exists(name):
             self.qdrant_client.create_collection(
-                collection_name=self.collection_name,
-                vectors_config=self.qdrant_client.get_fastembed_vector_params(),
-                # comment this line to use dense vectors only
-                # sparse_vectors_config=self.qdrant_client.get_fastembed_sparse_vector_params(),  
+                collection_name=name,
+                vectors_config={
+                    self.VECTOR_NAME: models.VectorParams(size=self.VECTOR_SIZE, distance=models.Distance.COSINE, on_disk=True)
+                },
+                sparse_vectors_config={
+                    self.SPARSE_VECTOR_NAME: models.SparseVectorParams(index=models.SparseIndexParams(on_disk=True))
+                } if Config.HYBRID_SEARCH_ENABLED else None,
+                quantization_config=quantization,
+                hnsw_config=hnsw,
             )
+        else:
+            self._migrate_collection(name, quantization, hnsw)
+        info = self.qdrant_client.get_collection(name)
+        if self.SPARSE_VECTOR_NAME in (info.config.params.sparse_vectors or {}):
+            self._sparse_collections.add(name)
+        elif Config.HYBRID_SEARCH_ENABLED:
+            # Named vectors cannot be added to an existing collection
+            logging.warning(f"Qdrant collection {name} has no sparse vectors; it stays dense-only until it is recreated")
+        self._ensure_payload_indexes(name, layout, info.payload_schema)
+        self._ready_collections.add(name)
+
+    def uses_sparse(self, name: str) -> bool:
+        return Config.HYBRID_SEARCH_ENABLED and name in self._sparse_collections
+
+    def point_vectors(self, name: str, texts: List[str], dense_vectors) -> List[Dict]:
+        """Named vectors for upserting texts into a collection: dense, plus SPLADE in hybrid collections"""
+        vectors = [{self.VECTOR_NAME: np.asarray(vector, dtype=np.float32).tolist()} for vector in dense_vectors]
+        if self.uses_sparse(name):
+            for vector, (indices, values) in zip(vectors, self.embed_sparse(texts)):
+                vector[self.SPARSE_VECTOR_NAME] = models.SparseVector(indices=indices.tolist(), values=values.tolist())
+        return vectors
+
+    def query_collection(self, name: str, query: str, query_vector: np.ndarray, query_filter: Optional[models.Filter],
+                         limit: int, with_vectors=False):
+        """
+        Dense search, or in hybrid collections a dense and a sparse prefetch fused
+        with reciprocal rank fusion in one Qdrant query. Returns the scored points.
+        """
+        if not self.uses_sparse(name):
+            return self.qdrant_client.query_points(
+                collection_name=name,
+                query=query_vector.tolist(),
+                using=self.VECTOR_NAME,
+                query_filter=query_filter,
+                limit=limit,
+                search_params=self.search_params(),
+                with_payload=True,
+                with_vectors=with_vectors
+            ).points
+        indices, values = self.embed_sparse([query])[0]
+        return self.qdrant_client.query_points(
+            collection_name=name,
+            prefetch=[
+                models.Prefetch(query=query_vector.tolist(), using=self.VECTOR_NAME, filter=query_filter,
+                                limit=Config.HYBRID_PREFETCH_LIMIT, params=self.search_params()),
+                models.Prefetch(query=models.SparseVector(indices=indices.tolist(), values=values.tolist()),
+                                using=self.SPARSE_VECTOR_NAME, filter=query_filter, limit=Config.HYBRID_PREFETCH_LIMIT),
+            ],
+            query=models.FusionQuery(fusion=models.Fusion.RRF),
+            limit=limit,
+            with_payload=True,
+            with_vectors=with_vectors
+        ).points
+
+    def _migrate_collection(self, name: str, quantization, hnsw):
+        """Apply the layout to a collection created by an older version; Qdrant re-optimizes in the background"""
+        config = self.qdrant_client.get_collection(name).config
+        changes = {}
+        vector_params = config.params.vectors.get(self.VECTOR_NAME) if isinstance(config.params.vectors, dict) else None
+        if vector_params is not None and not vector_params.on_disk:
+            changes["vectors_config"] = {self.VECTOR_NAME: models.VectorParamsDiff(on_disk=True)}
+        if quantization is not None and config.quantization_config is None:
+            changes["quantization_config"] = quantization
+        if hnsw is not None and (config.hnsw_config.m != hnsw.m or config.hnsw_config.payload_m != hnsw.payload_m):
+            changes["hnsw_config"] = hnsw
+        if changes:
+            logging.info(f"Migrating Qdrant collection {name}: {', '.join(changes)}")
+            self.qdrant_client.update_collection(collection_name=name, **changes)
+
+    def _ensure_payload_indexes(self, name: str, layout: Dict, schema: Dict):
+        tenant = layout.get("tenant")
+        if tenant:
+            current = schema.get(tenant)
+            if current is not None and not getattr(current.params, "is_tenant", False):
+                # A plain keyword index cannot be switched to a tenant index in place
+                self.qdrant_client.delete_payload_index(name, tenant, wait=True)
+                current = None
+            if current is None:
+                self.qdrant_client.create_payload_index(
+                    name, tenant, models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD, is_tenant=True)
+                )
+        for field_type, schema_type in (
+            ("keyword", models.PayloadSchemaType.KEYWORD),
+            ("float", models.PayloadSchemaType.FLOAT),
+            ("integer", models.PayloadSchemaType.INTEGER),
+        ):
+            for field in layout.get(field_type, []):
+                if field not in schema:
+                    self.qdrant_client.create_payload_index(name, field, schema_type)
+
+    @classmethod
+    def get_instance(cls) -> "VectorStoreManager":
+        """The shared manager, created on first use"""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    @classmethod
+    def _get_embedding_model(cls) -> TextEmbedding:
+        if cls._embedding_model is None:
+            # Concurrent first callers wait for a single load instead of each loading the model
+            with cls._model_lock:
+                if cls._embedding_model is None:
+                    cls._embedding_model = TextEmbedding(model_name=cls.DENSE_MODEL)
+        return cls._embedding_model
+
+    @classmethod
+    def _get_sparse_model(cls) -> SparseTextEmbedding:
+        if cls._sparse_model is None:
+            with cls._model_lock:
+                if cls._sparse_model is None:
+                    cls._sparse_model = SparseTextEmbedding(model_name=cls.SPARSE_MODEL)
+        return cls._sparse_model
+
+    @classmethod
+    def embed_sparse(cls, texts: List[str], batch_size: int = 32) -> List[SparseVector]:
+        """SPLADE (indices, weights) per text, batched and cached like the dense vectors"""
+        return EmbeddingCache.embed_sparse(
+            cls.SPARSE_MODEL, texts,
+            lambda misses: [(embedding.indices, embedding.values)
+                            for embedding in cls._get_sparse_model().embed(misses, batch_size=batch_size)]
+        )
+
+    @classmethod
+    def get_tokenizer(cls):
+        """The embedding model's own tokenizer, copied without its truncation and padding"""
+        if cls._tokenizer is None:
+            from tokenizers import Tokenizer
+            tokenizer = Tokenizer.from_str(cls._get_embedding_model().model.tokenizer.to_str())
+            tokenizer.no_truncation()
+            tokenizer.no_padding()
+            cls._tokenizer = tokenizer
+        return cls._tokenizer
+
+    @classmethod
+    def warm_up(cls):
+        """Load the embedding model and run one inference; call in a background thread at startup"""
+        try:
+            started = time.perf_counter()
+            list(cls._get_embedding_model().embed(["warm up"]))
+            if Config.HYBRID_SEARCH_ENABLED:
+                list(cls._get_sparse_model().embed(["warm up"]))
+            cls._ready.set()
+            logging.info(f"Embedding model ready in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            logging.error(f"Embedding model warm-up failed: {str(e)}")
+
+    @classmethod
+    def is_ready(cls) -> bool:
+        """True once the embedding model is loaded"""
+        return cls._ready.is_set()
+
+    @classmethod
+    def embed_texts(cls, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        """Embed texts in one batch and return L2-normalised float32 vectors (one row per text)"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        # Only texts missing from the embedding cache reach the model
+        return EmbeddingCache.embed(cls.DENSE_MODEL, texts, lambda misses: cls._embed_uncached(misses, batch_size))
+
+    @classmethod
+    def _embed_uncached(cls, texts: List[str], batch_size: int) -> np.ndarray:
+        vectors = np.asarray(list(cls._get_embedding_model().embed(texts, batch_size=batch_size)), dtype=np.float32)
+        cls._ready.set()
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
 
     def _generate_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Use Qdrant's FastEmbed integration"""
-        return self.client.encode_text(texts)
+        """Embed with the shared in-process FastEmbed model"""
+        return self.embed_texts(texts).tolist()
 
-    def store_documents(self, documents: List[Dict[str, str]], session_id: Optional[str] = None):
+    def chunk_documents(self, documents: List[Dict[str, str]], session_id: Optional[str] = None, user_id: Optional[str] = None):
+        """Split documents into chunks; returns (chunk texts, per-chunk metadata)"""
+        processed_docs = []
+        metadata = []
+        for doc in documents:
+            # Split text into chunks
+            chunks = self.text_splitter.split_text(doc["text"])
+            for chunk in chunks:
+                processed_docs.append(chunk)
+                metadata.append({
+                    "title": doc.get("title", "No Title"),
+                    "source": doc.get("source", ""),
+                    "session_id": session_id,
+                    "user_id": user_id
+                })
+        return processed_docs, metadata
+
+    def select_results(self, query_vector: np.ndarray, points, top_k: Optional[int] = None) -> List[Dict[str, str]]:
+        """Deduplicate and diversify Qdrant points (fetched with vectors) into context results"""
+        candidates = [
+            {
+                "title": point.payload.get("title", ""),
+                "text": point.payload.get("document", ""),
+                "source": point.payload.get("source", ""),
+                "vector": point.vector[self.VECTOR_NAME]
+            }
+            for point in points
+        ]
+        return select_context(query_vector, candidates, self.text_splitter.count_tokens, top_k)
+
+    def rank_documents(self, query: str, documents: List[Dict[str, str]], top_k: Optional[int] = None) -> List[Dict[str, str]]:
+        """
+        Ephemeral retrieval: chunk, embed chunks and query in one batch and rank in memory.
+        Same output format as search(); nothing is written to Qdrant.
+        """
+        if not documents:
+            return []
+        
+        try:
+            chunks, metadata = self.chunk_documents(documents)
+            if not chunks:
+                return []
+            vectors = self.embed_texts([query] + chunks)
+            # Vectors are normalised, so the dot product is the cosine similarity
+            scores = vectors[1:] @ vectors[0]
+            k = min(Config.RAG_CANDIDATES, len(chunks))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            candidates = [
+                {
+                    "title": metadata[i]["title"],
+                    "text": chunks[i],
+                    "source": metadata[i]["source"],
+                    "vector": vectors[i + 1]
+                }
+                for i in top
+            ]
+            return select_context(vectors[0], candidates, self.text_splitter.count_tokens, top_k)
+        except Exception as e:
+            logging.error(f"Ranking error: {str(e)}")
+            return []
+
+    def store_documents(self, documents: List[Dict[str, str]], session_id: Optional[str] = None, user_id: Optional[str] = None):
         """Store documents with metadata in batches"""
         if not documents:
             return
         
         try:
             # Process documents with chunking
-            processed_docs = []
-            metadata = []
-            for doc in documents:
-                # Split text into chunks
-                chunks = self.text_splitter.split_text(doc["text"])
-                for chunk in chunks:
-                    processed_docs.append(chunk)
-                    metadata.append({
-                        "title": doc.get("title", "No Title"),
-                        "source": doc.get("source", ""),
-                        "session_id": session_id
-                    })
-
-            self.qdrant_client.add(
+            processed_docs, metadata = self.chunk_documents(documents, session_id, user_id)
+
+            if not processed_docs:
+                return
+            vectors = self.point_vectors(self.collection_name, processed_docs, self.embed_texts(processed_docs))
+            self.qdrant_client.upsert(
                 collection_name=self.collection_name,
-                documents=processed_docs,
-                metadata=metadata
+                points=[
+                    models.PointStruct(
+                        id=uuid.uuid4().hex,
+                        vector=vector,
+                        # Same payload layout as QdrantClient.add: the chunk under "document" plus metadata
+                        payload={"document": text, **meta}
+                    )
+                    for text, vector, meta in zip(processed_docs, vectors, metadata)
+                ]
             )
         except Exception as e:
             logging.error(f"Storing error: {str(e)}")
 
 
-    def search(self, query: str, session_id: Optional[str] = None, top_k: int = 3) -> List[Dict[str, str]]:
+    def search(self, query: str, session_id: Optional[str] = None, top_k: Optional[int] = None) -> List[Dict[str, str]]:
         """Search with source metadata and optional session filtering"""
         try:
             filter_condition = None
@@ -76,23 +383,12 @@ class VectorStoreManager:
                     ]
                 )
             
-            results = self.qdrant_client.query(
-                collection_name=self.collection_name,
-                query_text=query,
-                limit=top_k,
-                query_filter=filter_condition
-            )
-            
-            search_results = [
-                {
-                    "title": result.metadata.get("title", ""),  # Title from metadata
-                    "text": result.document,                        # Text from the main document field
-                    "source": result.metadata.get("source", "")     # Source from metadata
-                }
-                for result in results  # Iterate over each QueryResponse
-            ]
+            query_vector = self.embed_texts([query])[0]
+            # Over-fetch with vectors so duplicates can be dropped and the rest diversified
+            results = self.query_collection(self.collection_name, query, query_vector, filter_condition,
+                                            Config.RAG_CANDIDATES, with_vectors=[self.VECTOR_NAME])
             
-            return search_results
+            return self.select_results(query_vector, results, top_k)
         except Exception as e:
             logging.error(f"Search error: {str(e)}")
             return []
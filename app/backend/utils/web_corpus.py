@@ -0,0 +1,186 @@
+# backend/utils/web_corpus.py
+import time
+import uuid
+import hashlib
+import logging
+from typing import Dict, List, Optional, Set
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from qdrant_client import models
+from backend.config import Config
+from backend.utils.vector_store import VectorStoreManager
+from backend.utils.embedding_cache import EmbeddingCache
+
+# Query parameters that do not change the page content
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "ref", "ref_src"}
+
+class WebCorpus:
+    """
+    Persistent, cross-user cache of scraped pages in Qdrant: one point per chunk,
+    keyed by canonical URL and chunk index, with the content hash and fetch time.
+    Pages fetched within WEB_CORPUS_TTL are reused instead of being scraped again;
+    older chunks are deleted by a sweep on write, at most every WEB_CORPUS_EXPIRY_INTERVAL.
+    """
+    _last_expiry = 0.0
+    @staticmethod
+    def canonical_url(url: str) -> str:
+        """Normalise a URL so trivially different links share one cache entry"""
+        parts = urlsplit(url.strip())
+        scheme = parts.scheme.lower() or "https"
+        host = (parts.hostname or "").lower()
+        if parts.port and not ((scheme == "http" and parts.port == 80) or (scheme == "https" and parts.port == 443)):
+            host = f"{host}:{parts.port}"
+        path = parts.path.rstrip("/") or "/"
+        query = urlencode(sorted(
+            (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+            if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+        ))
+        return urlunsplit((scheme, host, path, query, ""))
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _point_id(url: str, chunk_index: int) -> str:
+        # Deterministic, so re-fetching a page overwrites its chunks in place
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{url}#{chunk_index}"))
+
+    @classmethod
+    def _client(cls):
+        store = VectorStoreManager.get_instance()
+        store.ensure_collection(Config.WEB_CORPUS_COLLECTION)
+        return store.qdrant_client
+
+    @classmethod
+    def _page_heads(cls, canonical_urls: List[str]) -> Dict[str, Dict]:
+        """Payload of chunk 0 of each cached page (url, content_hash, fetched_at, chunk_count)"""
+        if not canonical_urls:
+            return {}
+        points, _ = cls._client().scroll(
+            collection_name=Config.WEB_CORPUS_COLLECTION,
+            scroll_filter=models.Filter(must=[
+                models.FieldCondition(key="url", match=models.MatchAny(any=canonical_urls)),
+                models.FieldCondition(key="chunk_index", match=models.MatchValue(value=0)),
+            ]),
+            limit=len(canonical_urls),
+            with_payload=True,
+            with_vectors=False
+        )
+        return {point.payload["url"]: point.payload for point in points}
+
+    @classmethod
+    def fresh_urls(cls, urls: List[str]) -> Set[str]:
+        """Canonical URLs that have a copy younger than the TTL"""
+        if not Config.WEB_CORPUS_ENABLED:
+            return set()
+        try:
+            cutoff = time.time() - Config.WEB_CORPUS_TTL
+            heads = cls._page_heads([cls.canonical_url(url) for url in urls])
+            return {url for url, head in heads.items() if head.get("fetched_at", 0) >= cutoff}
+        except Exception as e:
+            logging.error(f"Web corpus lookup error: {str(e)}")
+            return set()
+
+    @classmethod
+    def expire(cls):
+        """Delete chunks of pages not fetched within the TTL, so pages nobody asks for again do not pile up"""
+        cutoff = time.time() - Config.WEB_CORPUS_TTL
+        cls._client().delete(
+            Config.WEB_CORPUS_COLLECTION,
+            points_selector=models.FilterSelector(filter=models.Filter(must=[
+                models.FieldCondition(key="fetched_at", range=models.Range(lt=cutoff))
+            ])),
+            wait=False
+        )
+        logging.info(f"Web corpus: expired chunks fetched before {time.strftime('%Y-%m-%d %H:%M', time.localtime(cutoff))}")
+
+    @classmethod
+    def store_documents(cls, documents: List[Dict[str, str]]):
+        """
+        Add scraped pages. Pages whose content is unchanged only get a new fetch
+        time; changed or new pages are chunked and embedded once.
+        """
+        if not Config.WEB_CORPUS_ENABLED or not documents:
+            return
+        try:
+            store = VectorStoreManager.get_instance()
+            client = cls._client()
+            now = time.time()
+            pages = {cls.canonical_url(doc["source"]): doc for doc in documents if doc.get("text")}
+            heads = cls._page_heads(list(pages))
+
+            texts, payloads, stale = [], [], []
+            for url, doc in pages.items():
+                digest = cls.content_hash(doc["text"])
+                head = heads.get(url)
+                if head and head.get("content_hash") == digest:
+                    # Same content: refresh the timestamp without re-embedding
+                    client.set_payload(
+                        collection_name=Config.WEB_CORPUS_COLLECTION,
+                        payload={"fetched_at": now},
+                        points=models.Filter(must=[models.FieldCondition(key="url", match=models.MatchValue(value=url))])
+                    )
+                    continue
+                chunks = store.text_splitter.split_text(doc["text"])
+                for i, chunk in enumerate(chunks):
+                    texts.append(chunk)
+                    payloads.append({
+                        "url": url,
+                        "source": doc.get("source", url),
+                        "title": doc.get("title", "No Title"),
+                        "document": chunk,
+                        "chunk_index": i,
+                        "chunk_count": len(chunks),
+                        "content_hash": digest,
+                        "fetched_at": now,
+                    })
+                if head and head.get("chunk_count", 0) > len(chunks):
+                    # The page shrank: drop chunks the overwrite does not reach
+                    stale.extend(cls._point_id(url, i) for i in range(len(chunks), head["chunk_count"]))
+
+            if texts:
+                vectors = store.point_vectors(Config.WEB_CORPUS_COLLECTION, texts, store.embed_texts(texts))
+                client.upsert(
+                    collection_name=Config.WEB_CORPUS_COLLECTION,
+                    points=[
+                        models.PointStruct(
+                            id=cls._point_id(payload["url"], payload["chunk_index"]),
+                            vector=vector,
+                            payload=payload
+                        )
+                        for payload, vector in zip(payloads, vectors)
+                    ],
+                    wait=True  # Searched right after in the same turn
+                )
+            if stale:
+                client.delete(Config.WEB_CORPUS_COLLECTION, points_selector=models.PointIdsList(points=stale), wait=False)
+            if now - cls._last_expiry >= Config.WEB_CORPUS_EXPIRY_INTERVAL:
+                cls._last_expiry = now
+                cls.expire()
+            logging.info(f"Web corpus: stored {len(texts)} chunks from {len(pages)} pages, embedding cache {EmbeddingCache.stats()}")
+        except Exception as e:
+            logging.error(f"Web corpus storing error: {str(e)}")
+
+    @classmethod
+    def search(cls, query: str, urls: List[str], top_k: Optional[int] = None) -> List[Dict[str, str]]:
+        """Rank the cached chunks of the given pages (cached and freshly stored alike) against the query"""
+        if not urls:
+            return []
+        try:
+            store = VectorStoreManager.get_instance()
+            query_vector = store.embed_texts([query])[0]
+            cls._client()  # Ensures the collection, so query_collection knows whether it is hybrid
+            results = store.query_collection(
+                Config.WEB_CORPUS_COLLECTION,
+                query,
+                query_vector,
+                models.Filter(must=[
+                    models.FieldCondition(key="url", match=models.MatchAny(any=[cls.canonical_url(url) for url in urls]))
+                ]),
+                Config.RAG_CANDIDATES,
+                with_vectors=[store.VECTOR_NAME]
+            )
+            return store.select_results(query_vector, results, top_k)
+        except Exception as e:
+            logging.error(f"Web corpus search error: {str(e)}")
+            return []
@@ -1,8 +1,9 @@
 import os
 import requests
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from backend.config import Config
+from backend.utils.web_corpus import WebCorpus
 
 class WebSearchAgent:
     """Agent for web search operations using Scrapy service"""
@@ -42,6 +43,63 @@ class WebSearchAgent:
         except Exception as e:
             return [{"title": "Error", "text": str(e), "source": ""}]
     
+    @staticmethod
+    def _format(raw_results: List[Dict]) -> List[Dict]:
+        return [
+            {
+                "title": result.get("title", "No Title"),
+                "text": result.get("content", "").strip(),
+                "source": result.get("url", "Unknown")
+            }
+            for result in raw_results
+        ]
+
+    def search_urls(self, query: str, max_results: int = 3) -> Optional[List[str]]:
+        """Result URLs only, without scraping; None if the service does not support it"""
+        try:
+            response = requests.post(
+                f"{self.web_search_url}/search/urls",
+                json={"query": query, "max_results": max_results},
+                timeout=30
+            )
+            if response.status_code == 200:
+                return response.json().get("urls", [])
+            return None
+        except Exception:
+            return None
+
+    def scrape(self, urls: List[str]) -> List[Dict]:
+        """Scrape specific URLs; same result format as search()"""
+        if not urls:
+            return []
+        try:
+            response = requests.post(
+                f"{self.web_search_url}/scrape",
+                json={"urls": urls},
+                timeout=self.scrape_timeout
+            )
+            if response.status_code == 200:
+                return self._format(response.json().get("results", []))
+            return []
+        except Exception:
+            return []
+
+    def search_with_corpus(self, query: str, max_results: int = 3) -> Tuple[List[str], List[Dict], List[str]]:
+        """
+        Search, but only scrape URLs the web corpus has no fresh copy of.
+        Returns (all result URLs, freshly scraped results, URLs served from the corpus).
+        """
+        urls = self.search_urls(query, max_results)
+        if urls is None:
+            # Older web search service: scrape everything in one call
+            results = [r for r in self.search(query, max_results) if r["title"] != "Error"]
+            return [r["source"] for r in results], results, []
+
+        cached = WebCorpus.fresh_urls(urls)
+        missing = [url for url in urls if WebCorpus.canonical_url(url) not in cached]
+        reused = [url for url in urls if WebCorpus.canonical_url(url) in cached]
+        return urls, self.scrape(missing), reused
+
     def format_results_for_evaluation(self, results: List[Dict]) -> str:
         """
         Format search results for use in evaluation prompts
@@ -0,0 +1,96 @@
+# benchmarks/bench_admission.py
+"""
+Load generator for LLM admission control. A fake model (fixed concurrency,
+FIFO, sleep-based latency) is shared by one heavy user firing evaluation
+batches and several interactive users measuring time-to-first-token.
+Runs once without admission and once with it; needs Redis at REDIS_HOST/REDIS_PORT.
+
+Run from the app directory: python benchmarks/bench_admission.py
+"""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.config import Config
+from backend.utils.admission import AdmissionController, PRIORITY_INTERACTIVE, PRIORITY_EVALUATION
+
+MODEL = "bench-model"
+MODEL_SLOTS = 2           # What the fake backend can run at once
+FIRST_TOKEN_SECONDS = 0.3
+EVALUATION_SECONDS = 1.5
+HEAVY_CALLS = 40
+INTERACTIVE_USERS = 4
+INTERACTIVE_TURNS = 5
+THINK_SECONDS = 0.5
+
+class FakeModel:
+    """FIFO server with a fixed number of slots, like a single Ollama instance"""
+    def __init__(self, slots):
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._free = slots
+        self._next_ticket = 0
+        self._serving = 0
+
+    def call(self, seconds):
+        with self._cond:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            while ticket != self._serving or self._free == 0:
+                self._cond.wait()
+            self._serving += 1
+            self._free -= 1
+            self._cond.notify_all()
+        try:
+            time.sleep(seconds)
+        finally:
+            with self._cond:
+                self._free += 1
+                self._cond.notify_all()
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def run(use_admission):
+    Config.ADMISSION_ENABLED = use_admission
+    Config.ADMISSION_MODEL_CONCURRENCY = {MODEL: MODEL_SLOTS}
+    Config.ADMISSION_REQUEST_COST_MS = int(EVALUATION_SECONDS * 1000)
+    model = FakeModel(MODEL_SLOTS)
+    ttfts = []
+    ttfts_lock = threading.Lock()
+
+    def heavy(i):
+        with AdmissionController.admit(MODEL, "heavy-user", PRIORITY_EVALUATION):
+            model.call(EVALUATION_SECONDS)
+
+    def interactive(user):
+        for _ in range(INTERACTIVE_TURNS):
+            start = time.perf_counter()
+            with AdmissionController.admit(MODEL, user, PRIORITY_INTERACTIVE):
+                model.call(FIRST_TOKEN_SECONDS)
+            with ttfts_lock:
+                ttfts.append(time.perf_counter() - start)
+            time.sleep(THINK_SECONDS)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=HEAVY_CALLS + INTERACTIVE_USERS) as pool:
+        heavy_jobs = [pool.submit(heavy, i) for i in range(HEAVY_CALLS)]
+        time.sleep(0.2)  # Heavy user's batch is already queued when others arrive
+        users = [pool.submit(interactive, f"user-{u}") for u in range(INTERACTIVE_USERS)]
+        for job in heavy_jobs + users:
+            job.result()
+    total = time.perf_counter() - start
+
+    label = "with admission" if use_admission else "no admission"
+    print(f"{label:>15}: interactive TTFT p50={percentile(ttfts, 0.5) * 1000:7.0f} ms "
+          f"p99={percentile(ttfts, 0.99) * 1000:7.0f} ms, total {total:.1f} s")
+
+if __name__ == "__main__":
+    AdmissionController.get_client().ping()
+    run(use_admission=False)
+    run(use_admission=True)
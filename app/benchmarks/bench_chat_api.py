@@ -0,0 +1,118 @@
+# benchmarks/bench_chat_api.py
+"""
+Concurrency benchmark for chat turns. Runs N concurrent users, each sending
+a few prompts, and reports time to first token, turn latency and throughput.
+
+  --mode api        async SSE clients against the chat API (scale it with --scale chat-api=N)
+  --mode inprocess  one thread per user running the pipeline in this process,
+                    which is how the Streamlit script executes turns
+
+Needs the full stack (Postgres, Redis, Ollama) and an existing user id.
+Run from the app directory of a container on the compose network:
+  python benchmarks/bench_chat_api.py --user-id <uuid> --mode api --url http://chat-api:8000 --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+PROMPTS = [
+    "Explain what a hash table is in two sentences.",
+    "Give me three tips for writing readable Python.",
+    "What is the difference between a process and a thread?",
+    "Summarize the rules of chess in one paragraph.",
+]
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float("nan")
+
+def report(label, ttfts, latencies, errors, elapsed):
+    print(f"{label}: {len(latencies)} turns in {elapsed:.1f} s ({len(latencies) / elapsed:.2f} turns/s), {errors} errors")
+    print(f"  TTFT    p50={percentile(ttfts, 0.5):6.2f} s  p95={percentile(ttfts, 0.95):6.2f} s")
+    print(f"  latency p50={percentile(latencies, 0.5):6.2f} s  p95={percentile(latencies, 0.95):6.2f} s")
+
+async def api_user(client, url, args, user_index, results):
+    session_id = None
+    for turn in range(args.turns):
+        payload = {"user_id": args.user_id, "session_id": session_id, "model": args.model,
+                   "prompt": f"{PROMPTS[(user_index + turn) % len(PROMPTS)]} (user {user_index}, turn {turn})"}
+        start = time.perf_counter()
+        first_token_at = None
+        done = False
+        try:
+            async with client.stream("POST", f"{url}/chat", json=payload) as response:
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    event = json.loads(line[5:])
+                    if event["type"] == "token" and first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    elif event["type"] == "session":
+                        session_id = event["session_id"]
+                    elif event["type"] == "done":
+                        done = True
+        except httpx.HTTPError:
+            done = False
+        end = time.perf_counter()
+        results.append(((first_token_at or end) - start, end - start) if done else None)
+
+async def run_api(args):
+    results = []
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(timeout=httpx.Timeout(600, connect=10), limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(api_user(client, args.url.rstrip("/"), args, i, results) for i in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+    return results, elapsed
+
+def run_inprocess(args):
+    from backend.utils.postgres_manager import PostgresManager
+    from backend.utils.chat_pipeline import run_turn, stream_events
+
+    PostgresManager.initialize_pool(maxconn=max(20, args.concurrency * 2))
+
+    def user(user_index):
+        session_id = None
+        timings = []
+        for turn in range(args.turns):
+            prompt = f"{PROMPTS[(user_index + turn) % len(PROMPTS)]} (user {user_index}, turn {turn})"
+            start = time.perf_counter()
+            first_token_at = None
+            done = False
+            for event in stream_events(run_turn, user_id=args.user_id, session_id=session_id, model=args.model, prompt=prompt):
+                if event["type"] == "token" and first_token_at is None:
+                    first_token_at = time.perf_counter()
+                elif event["type"] == "session":
+                    session_id = event["session_id"]
+                elif event["type"] == "done":
+                    done = True
+            end = time.perf_counter()
+            timings.append(((first_token_at or end) - start, end - start) if done else None)
+        return timings
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = [timing for timings in pool.map(user, range(args.concurrency)) for timing in timings]
+    return results, time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--mode", choices=["api", "inprocess"], default="api")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--model", default="deepseek-r1:1.5b")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=3)
+    args = parser.parse_args()
+
+    results, elapsed = asyncio.run(run_api(args)) if args.mode == "api" else run_inprocess(args)
+    ok = [r for r in results if r is not None]
+    report(f"{args.mode} x{args.concurrency}", [r[0] for r in ok], [r[1] for r in ok], len(results) - len(ok), elapsed)
@@ -0,0 +1,93 @@
+# benchmarks/bench_ingest.py
+"""
+Throughput and memory of streaming document ingestion. Ingests a file (or a
+generated 500-page text document) into a throwaway session and reports
+pages/sec and RSS sampled while it runs; flat RSS means memory does not grow
+with the document. Needs Qdrant (and Redis for the embedding cache, optional).
+
+Run from the app directory:
+  python benchmarks/bench_ingest.py [--file report.pdf] [--pages 500]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from qdrant_client import models
+from backend.config import Config
+from backend.utils.vector_store import VectorStoreManager
+from backend.utils.document_ingest import DocumentIngestor, save_upload
+
+WORDS = ["latency", "throughput", "the", "cache", "page", "model", "vector", "of", "and", "query", "results", "index"]
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+def make_text(path, pages, seed=0):
+    """Synthetic document of `pages` pages of about INGEST_TEXT_PAGE_CHARS characters"""
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        for page in range(pages):
+            written = 0
+            while written < Config.INGEST_TEXT_PAGE_CHARS:
+                line = " ".join(rng.choice(WORDS) for _ in range(14)) + f" (page {page + 1}).\n"
+                f.write(line)
+                written += len(line)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--file", help="PDF, TXT, MD or DOCX to ingest")
+    parser.add_argument("--pages", type=int, default=500, help="Pages of the generated document when --file is not given")
+    args = parser.parse_args()
+
+    Config.ATTACHMENT_DIR = os.path.join("/tmp", f"bench-ingest-{os.getpid()}")
+    os.makedirs(Config.ATTACHMENT_DIR, exist_ok=True)
+    source = args.file
+    if source is None:
+        source = os.path.join(Config.ATTACHMENT_DIR, "generated.txt")
+        make_text(source, args.pages)
+    file_name = os.path.basename(source)
+    with open(source, "rb") as f:
+        document_id = save_upload(f, file_name)
+
+    VectorStoreManager.warm_up()
+    session_id = f"bench-{uuid.uuid4()}"
+    samples = []
+    running = threading.Event()
+    running.set()
+    def sample():
+        while running.is_set():
+            samples.append(rss_mb())
+            time.sleep(0.1)
+    sampler = threading.Thread(target=sample, daemon=True)
+    baseline = rss_mb()
+    samples.append(baseline)
+    sampler.start()
+    try:
+        stats = DocumentIngestor.ingest(session_id, document_id, file_name)
+    finally:
+        running.clear()
+        sampler.join()
+        DocumentIngestor._client().delete(
+            Config.DOCUMENT_COLLECTION,
+            points_selector=models.FilterSelector(filter=models.Filter(must=[
+                models.FieldCondition(key="session_id", match=models.MatchValue(value=session_id))
+            ]))
+        )
+        shutil.rmtree(Config.ATTACHMENT_DIR, ignore_errors=True)
+
+    quarter = max(1, len(samples) // 4)
+    print(f"{file_name}: {stats['total_pages']} pages, {stats['chunks']} chunks in {stats['seconds']:.1f} s "
+          f"({stats['pages_per_second']:.1f} pages/s)")
+    print(f"RSS: baseline {baseline:.0f} MB, first quarter peak {max(samples[:quarter]):.0f} MB, "
+          f"last quarter peak {max(samples[-quarter:]):.0f} MB, overall peak {max(samples):.0f} MB")
+
+if __name__ == "__main__":
+    main()
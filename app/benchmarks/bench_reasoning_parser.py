@@ -0,0 +1,69 @@
+# benchmarks/bench_reasoning_parser.py
+"""
+Micro-benchmark for the streaming reasoning-tag parser.
+Compares per-token cost against the previous exact-match token loop.
+
+Run from the app directory: python benchmarks/bench_reasoning_parser.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.utils.reasoning_parser import parse_reasoning_stream, REASONING, ANSWER
+
+WORDS = ["the", "model", "considers", "whether", "x", "=", "42", "because", "\n", "**bold**", "$e^x$", "and"]
+
+def make_stream(n_tokens, split_tags, seed=0):
+    """Synthetic token stream: <think> reasoning </think> answer, tags optionally split"""
+    rng = random.Random(seed)
+    half = n_tokens // 2
+    reasoning = [rng.choice(WORDS) + " " for _ in range(half)]
+    answer = [rng.choice(WORDS) + " " for _ in range(n_tokens - half)]
+    if split_tags:
+        return ["<th", "ink>"] + reasoning + ["</", "think", ">\n\n"] + answer
+    return ["<think>"] + reasoning + ["</think>"] + answer
+
+def baseline(tokens):
+    """The previous loop: tags recognised only when a token equals the tag"""
+    reasoning, answer = [], []
+    in_reasoning = False
+    for token in tokens:
+        if token == "<think>":
+            in_reasoning = True
+        elif token == "</think>":
+            in_reasoning = False
+        elif token:
+            (reasoning if in_reasoning else answer).append(token)
+    return "".join(reasoning), "".join(answer)
+
+def incremental(tokens):
+    reasoning, answer = [], []
+    for event in parse_reasoning_stream(tokens):
+        (reasoning if event.kind == REASONING else answer).append(event.text)
+    return "".join(reasoning), "".join(answer)
+
+def time_per_token(fn, tokens, repeats=5):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(tokens)
+        best = min(best, time.perf_counter() - start)
+    return best / len(tokens) * 1e9
+
+if __name__ == "__main__":
+    n_tokens = 200_000
+    whole = make_stream(n_tokens, split_tags=False)
+    split = make_stream(n_tokens, split_tags=True)
+
+    assert incremental(whole) == baseline(whole)
+    reasoning, answer = incremental(split)
+    assert "<" not in reasoning.replace("$e^x$", "") and "think" not in answer
+
+    print(f"{'stream':<12}{'baseline ns/token':>20}{'parser ns/token':>20}")
+    for name, tokens in (("whole tags", whole), ("split tags", split)):
+        parser_ns = time_per_token(incremental, tokens)
+        print(f"{name:<12}{time_per_token(baseline, tokens):>20.1f}{parser_ns:>20.1f}"
+              f"   ({parser_ns / 2e7:.4%} of a 20 ms token)")
@@ -0,0 +1,85 @@
+# benchmarks/bench_segmenter.py
+"""
+Benchmark statement segmentation and highlighting on long answers.
+Compares the span-based segmenter with the previous char-concatenation
+splitter and per-statement str.replace highlighting.
+
+Run from the app directory: python benchmarks/bench_segmenter.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.utils.segmenter import segment_statements, apply_highlighting
+
+def old_break_into_statements(text):
+    sentences = []
+    current_sentence = ""
+    for char in text:
+        current_sentence += char
+        if char in ['.', '!', '?'] and len(current_sentence.strip()) > 0:
+            sentences.append(current_sentence.strip())
+            current_sentence = ""
+    if current_sentence.strip():
+        sentences.append(current_sentence.strip())
+    return [s for s in sentences if len(s.split()) > 3 and not s.startswith('#')]
+
+def old_apply_highlighting(text, statements, evaluation_results):
+    highlighted_text = text
+    for i, statement in enumerate(statements, 1):
+        if i in evaluation_results and not evaluation_results[i]:
+            highlighted_statement = f":red[:red-background[{statement}]]"
+            highlighted_text = highlighted_text.replace(statement, highlighted_statement)
+    return highlighted_text
+
+PARAGRAPH = (
+    "Tower {n} was completed in 1889 and is 330 m tall. "
+    "Tower {n} was designed by Gustave Eiffel's company, e.g. by engineers Koechlin and Nouguier. "
+    "The height of tower {n} grew by 6.5 cm after antennas were added! "
+    "Does tower {n} sway in the wind? Tower {n} moves about 6-7 cm in storms **(toureiffel.paris)[source]**.\n"
+)
+EXTRAS = [
+    "- Visitors per year: roughly 6.1 million, per the operator.\n",
+    "$$\nE = mc^2. \\quad v = 3.0 \\times 10^8\n$$\n",
+    "```python\nprint('not. a. statement.')\n```\n",
+    "## Section heading\n",
+    "Summit tickets cost $35. They are cheaper online than at the gate. The price of $E = mc^2$ is nothing.\n",
+]
+
+def make_answer(paragraphs, seed=0):
+    rng = random.Random(seed)
+    parts = []
+    for _ in range(paragraphs):
+        parts.append(PARAGRAPH.format(n=len(parts)))
+        parts.append(rng.choice(EXTRAS))
+        parts.append("\n")
+    return "".join(parts)
+
+def best_of(fn, repeats=3):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+if __name__ == "__main__":
+    print(f"{'chars':>8}{'old split ms':>14}{'new split ms':>14}{'old highlight ms':>18}{'new highlight ms':>18}")
+    for paragraphs in (10, 100, 500):
+        text = make_answer(paragraphs)
+        old_statements = old_break_into_statements(text)
+        spans = segment_statements(text)
+        # Every third statement judged inaccurate
+        old_results = {i: i % 3 != 0 for i in range(1, len(old_statements) + 1)}
+        new_results = {i: i % 3 != 0 for i in range(1, len(spans) + 1)}
+
+        print(
+            f"{len(text):>8}"
+            f"{best_of(lambda: old_break_into_statements(text)):>14.2f}"
+            f"{best_of(lambda: segment_statements(text)):>14.2f}"
+            f"{best_of(lambda: old_apply_highlighting(text, old_statements, old_results)):>18.2f}"
+            f"{best_of(lambda: apply_highlighting(text, spans, new_results)):>18.2f}"
+        )
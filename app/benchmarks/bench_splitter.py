@@ -0,0 +1,103 @@
+# benchmarks/bench_splitter.py
+"""
+Compare the token-aware splitter with langchain's RecursiveCharacterTextSplitter
+(750 chars, 200 overlap; the previous configuration): import time, chunking
+throughput, chunk sizes in all-MiniLM-L6-v2 tokens and the share of adjacent
+chunks that actually overlap. Chunks over 256 tokens are silently truncated by
+the embedding model. Needs fastembed for the tokenizer; langchain-text-splitters
+is optional (its rows are skipped if it is missing).
+
+Run from the app directory: python benchmarks/bench_splitter.py [--megabytes 4]
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+from backend.config import Config
+from backend.utils.text_splitter import TokenTextSplitter
+from backend.utils.vector_store import VectorStoreManager
+
+MODEL_LIMIT = 256
+WORDS = ["retrieval", "augmented", "generation", "the", "of", "Qdrant", "latency", "p99", "3.14", "embedding",
+         "tokenizer", "and", "a", "chunk", "overlap", "throughput", "naïve", "co-operative", "(see", "table)"]
+
+def make_corpus(megabytes, seed=0):
+    rng = random.Random(seed)
+    paragraphs, size = [], 0
+    while size < megabytes * 2**20:
+        sentences = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 40))).capitalize() + rng.choice([".", "?", "!"])
+                     for _ in range(rng.randint(1, 8))]
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+def import_seconds(statement, repeats=3):
+    """Best cold-process import time of a statement, interpreter start-up subtracted"""
+    def run(code):
+        best = float("inf")
+        for _ in range(repeats):
+            started = time.perf_counter()
+            result = subprocess.run([sys.executable, "-c", code], cwd=APP_DIR, capture_output=True)
+            if result.returncode != 0:
+                return None
+            best = min(best, time.perf_counter() - started)
+        return best
+    baseline = run("pass")
+    elapsed = run(statement)
+    return None if elapsed is None else elapsed - baseline
+
+def overlaps(first, second, min_chars=20):
+    """Whether the second chunk starts with text the first chunk ends with"""
+    return any(first.endswith(second[:size]) for size in range(min(len(first), len(second)), min_chars - 1, -1))
+
+def measure(name, split, corpus, count_tokens):
+    started = time.perf_counter()
+    chunks = split(corpus)
+    elapsed = time.perf_counter() - started
+    sizes = [count_tokens(chunk) for chunk in chunks]
+    over = sum(size > MODEL_LIMIT for size in sizes)
+    # Adjacent chunks should share a suffix/prefix; a low share means the overlap setting is not honoured
+    shared = sum(overlaps(first, second) for first, second in zip(chunks, chunks[1:]))
+    print(f"{name:>12}: {len(corpus) / 2**20 / elapsed:6.2f} MB/s, {len(chunks):6d} chunks, "
+          f"tokens mean {sum(sizes) / len(sizes):5.0f} max {max(sizes):4d}, {over} over {MODEL_LIMIT} ({over / len(sizes):.1%}), "
+          f"overlapping pairs {shared / max(1, len(chunks) - 1):.1%}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--megabytes", type=float, default=4)
+    args = parser.parse_args()
+
+    print("Import time (cold process):")
+    for name, statement in [
+        ("token", "import backend.utils.text_splitter"),
+        ("langchain", "import langchain_text_splitters"),
+    ]:
+        seconds = import_seconds(statement)
+        print(f"{name:>12}: " + ("not installed" if seconds is None else f"{seconds * 1000:6.0f} ms"))
+
+    corpus = make_corpus(args.megabytes)
+    tokenizer = VectorStoreManager.get_tokenizer()
+    count_tokens = lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids)
+    token_splitter = TokenTextSplitter(Config.SPLITTER_CHUNK_TOKENS, Config.SPLITTER_OVERLAP_TOKENS, lambda: tokenizer)
+    estimate_splitter = TokenTextSplitter(Config.SPLITTER_CHUNK_TOKENS, Config.SPLITTER_OVERLAP_TOKENS)
+
+    print(f"Chunking {args.megabytes} MB:")
+    measure("token", token_splitter.split_text, corpus, count_tokens)
+    measure("estimate", estimate_splitter.split_text, corpus, count_tokens)
+    try:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+    except ImportError:
+        print(f"{'langchain':>12}: not installed")
+        return
+    langchain_splitter = RecursiveCharacterTextSplitter(chunk_size=750, chunk_overlap=200, length_function=len)
+    measure("langchain", langchain_splitter.split_text, corpus, count_tokens)
+
+if __name__ == "__main__":
+    main()
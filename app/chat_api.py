@@ -0,0 +1,128 @@
+# chat_api.py
+"""
+Streaming chat API: the same turn pipeline as the Streamlit app, served over SSE.
+Stateless apart from Postgres/Redis, so it scales horizontally. It takes user and
+session ids on trust, so it is internal: only the Streamlit app calls it, never nginx.
+
+Run: uvicorn chat_api:app --host 0.0.0.0 --port 8000
+"""
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Optional
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from pydantic import BaseModel
+from backend.config import Config
+from backend.utils.postgres_manager import PostgresManager
+from backend.utils.chat_pipeline import run_turn, run_evaluation, run_ingest, run_with_emit, save_response
+from backend.utils.llm_helper import warm_up_models
+from backend.utils.telemetry import LLMTelemetry
+from backend.utils.vector_store import VectorStoreManager
+from backend.utils.embedding_cache import EmbeddingCache
+
+class ChatRequest(BaseModel):
+    user_id: str
+    session_id: Optional[str] = None
+    model: str = Config.OLLAMA_MODELS[0]
+    prompt: str
+    image: Optional[Dict] = None  # image_pipeline.prepare_image output, vision model only
+
+class EvaluationRequest(BaseModel):
+    user_id: str
+    session_id: str
+    model: str = Config.WEB_SEARCH_EVALUATION_MODEL
+    response: str
+    search_results: Optional[str] = None
+
+class IngestRequest(BaseModel):
+    user_id: str
+    session_id: Optional[str] = None
+    model: str = Config.OLLAMA_MODELS[0]
+    document_id: str  # document_ingest.save_upload output; the file is on the shared attachment volume
+    file_name: str
+    file_type: str = "application/octet-stream"
+
+class SaveRequest(BaseModel):
+    session_id: str
+    response: str
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Headroom over the executor for background summary updates
+    PostgresManager.initialize_pool(maxconn=Config.CHAT_API_WORKERS + 8)
+    # The pipeline's clients (psycopg2, redis, ollama) block, so each turn runs on a worker thread
+    app.state.executor = ThreadPoolExecutor(max_workers=Config.CHAT_API_WORKERS, thread_name_prefix="chat")
+    # Load the embedding model off the request path
+    threading.Thread(target=VectorStoreManager.warm_up, daemon=True).start()
+    if Config.OLLAMA_WARMUP_ENABLED:
+        # Serve immediately; requests that arrive before a model is loaded just wait for it
+        threading.Thread(target=warm_up_models, daemon=True).start()
+    yield
+    app.state.executor.shutdown(wait=False, cancel_futures=True)
+    PostgresManager.close_pool()
+
+app = FastAPI(title=f"{Config.PAGE_TITLE} API", lifespan=lifespan)
+
+async def pipeline_events(target: Callable[..., Dict], **kwargs):
+    """Run a pipeline function on the executor and yield its events without blocking the loop"""
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    emit = lambda event: loop.call_soon_threadsafe(events.put_nowait, event)
+    # The turn finishes (and is saved) even if the client disconnects
+    loop.run_in_executor(app.state.executor, lambda: run_with_emit(target, emit, **kwargs))
+    while True:
+        event = await events.get()
+        if event is None:
+            return
+        yield event
+
+async def sse(target: Callable[..., Dict], **kwargs):
+    async for event in pipeline_events(target, **kwargs):
+        yield f"data: {json.dumps(event)}\n\n"
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "embedding_ready": VectorStoreManager.is_ready()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Per-model LLM call totals and embedding cache counters for Prometheus (per API process)"""
+    return LLMTelemetry.prometheus() + EmbeddingCache.prometheus()
+
+@app.get("/metrics/summary")
+async def metrics_summary():
+    return {"llm": LLMTelemetry.summary(), "embedding_cache": EmbeddingCache.stats()}
+
+@app.post("/chat")
+async def chat(request: ChatRequest):
+    return StreamingResponse(sse(run_turn, **request.model_dump()), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/chat/evaluate")
+async def evaluate(request: EvaluationRequest):
+    return StreamingResponse(sse(run_evaluation, **request.model_dump()), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/chat/save")
+async def save(request: SaveRequest):
+    await asyncio.get_running_loop().run_in_executor(app.state.executor, save_response, request.session_id, request.response)
+    return {"status": "saved"}
+
+@app.post("/documents/ingest")
+async def ingest(request: IngestRequest):
+    return StreamingResponse(sse(run_ingest, **request.model_dump()), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.websocket("/ws/chat")
+async def chat_socket(websocket: WebSocket):
+    """One ChatRequest JSON message per turn; events are sent back as JSON messages"""
+    await websocket.accept()
+    try:
+        while True:
+            request = ChatRequest(**await websocket.receive_json())
+            async for event in pipeline_events(run_turn, **request.model_dump()):
+                await websocket.send_json(event)
+    except WebSocketDisconnect:
+        pass
@@ -0,0 +1,50 @@
+# migrate_qdrant.py
+"""
+Bring existing Qdrant collections to the current layout: on-disk float32 vectors,
+int8 scalar quantization, per-tenant HNSW graphs and payload indexes. Updates run
+in place; Qdrant rebuilds segments in the background and keeps serving searches.
+Collections that do not exist yet are left alone (they are created on first use).
+
+Run from the app directory: python migrate_qdrant.py [--dry-run]
+"""
+import argparse
+import logging
+from qdrant_client import QdrantClient
+from backend.config import Config
+from backend.utils.vector_store import VectorStoreManager, COLLECTION_LAYOUTS
+
+def describe(client, name):
+    info = client.get_collection(name)
+    vectors = info.config.params.vectors
+    on_disk = {key: params.on_disk for key, params in vectors.items()} if isinstance(vectors, dict) else vectors.on_disk
+    indexes = {
+        field: f"{schema.data_type}{' (tenant)' if getattr(schema.params, 'is_tenant', False) else ''}"
+        for field, schema in info.payload_schema.items()
+    }
+    sparse = list(info.config.params.sparse_vectors or {})
+    return (f"{info.points_count} points, status {info.status}, on_disk={on_disk}, sparse={sparse}, "
+            f"quantization={'int8' if info.config.quantization_config else 'none'}, "
+            f"hnsw m={info.config.hnsw_config.m} payload_m={info.config.hnsw_config.payload_m}, indexes={indexes}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dry-run", action="store_true", help="Only show the current layout")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    client = QdrantClient(f"http://{Config.QDRANT_HOST}:{Config.QDRANT_PORT}")
+    existing = [name for name in COLLECTION_LAYOUTS if client.collection_exists(name)]
+    for name in COLLECTION_LAYOUTS:
+        print(f"{name}: {describe(client, name) if name in existing else 'not created yet, skipped'}")
+    if args.dry_run:
+        return
+
+    store = VectorStoreManager.get_instance()
+    for name in existing:
+        store.ensure_collection(name)
+    print("After migration:")
+    for name in existing:
+        print(f"{name}: {describe(client, name)}")
+
+if __name__ == "__main__":
+    main()
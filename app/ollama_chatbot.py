@@ -4,6 +4,7 @@ from json import tool
 from turtle import mode
 import streamlit as st
 import hashlib
+import threading
 import json
 from datetime import datetime
 import pytz
@@ -11,6 +12,18 @@ from backend.config import Config
 from backend.utils.llm_helper import *
 from backend.utils.postgres_manager import PostgresManager
 from backend.utils.redis_manager import RedisManager
+from backend.utils.stream_renderer import StreamRenderer
+from backend.utils.chat_client import ChatClient
+from backend.utils.image_pipeline import prepare_image, load_thumbnail
+from backend.utils.document_ingest import save_upload
+
+@st.cache_resource
+def start_model_warmup():
+    """Preload the LLMs and the embedding model once per process (the chat API does this itself when used)"""
+    if Config.OLLAMA_WARMUP_ENABLED:
+        threading.Thread(target=warm_up_models, daemon=True).start()
+    threading.Thread(target=VectorStoreManager.warm_up, daemon=True).start()
+    return True
 
 def main():
     st.title(Config.PAGE_TITLE)
@@ -22,6 +35,9 @@ def main():
     
     user_id = st.session_state.user_id
     
+    if not Config.CHAT_API_URL:
+        start_model_warmup()
+    
     # Initialize session states
     if "active_session_id" not in st.session_state:
         st.session_state.active_session_id = None
@@ -33,6 +49,8 @@ def main():
         st.session_state.evaluation_stage = None
     if "web_search_results" not in st.session_state:
         st.session_state.web_search_results = None
+    if "last_call_stats" not in st.session_state:
+        st.session_state.last_call_stats = []
 
     def start_new_session():
         st.session_state.active_session_id = None
@@ -75,6 +93,8 @@ def main():
             index=Config.OLLAMA_MODELS.index(st.session_state.model) if st.session_state.model in Config.OLLAMA_MODELS else 0
         )
         
+        st.toggle("🔧 Debug panel", value=Config.DEBUG_PANEL, key="debug_panel", help="Show per-call model telemetry")
+        
         # Display chat history
         st.markdown("## Chat History")
         
@@ -106,8 +126,14 @@ def main():
     # Display existing chat messages
     if st.session_state.active_session_id:
         messages = PostgresManager.get_session_messages(st.session_state.active_session_id)
+        attachments = PostgresManager.get_message_attachments(
+            [message["message_id"] for message in messages if message.get("has_attachments")]
+        )
         for message in messages:
             with st.chat_message(message["role"]):
+                thumbnail = load_thumbnail(attachments.get(message["message_id"], []))
+                if thumbnail:
+                    st.image(thumbnail, width=Config.VISION_THUMBNAIL_SIDE)
                 st.markdown(message["content"])
     
     # Handle evaluation stage if active
@@ -126,16 +152,7 @@ def main():
                 
             if col2.button("Don't Evaluate"):
                 # Save original response
-                PostgresManager.add_message(
-                    st.session_state.active_session_id, 
-                    "assistant", 
-                    st.session_state.pending_evaluation
-                )
-                RedisManager.update_recent_context(
-                    st.session_state.active_session_id, 
-                    "assistant", 
-                    st.session_state.pending_evaluation
-                )
+                ChatClient.save_response(st.session_state.active_session_id, st.session_state.pending_evaluation)
                 
                 # Reset evaluation state
                 st.session_state.pending_evaluation = None
@@ -144,68 +161,19 @@ def main():
                 st.rerun()
     
     elif st.session_state.evaluation_stage == "evaluating" and st.session_state.pending_evaluation:
-        # Perform evaluation
-        with st.status("Evaluating response accuracy...", expanded=True) as status:
-            # Break response into statements
-            response_text = st.session_state.pending_evaluation
-            statements = break_into_statements(response_text)
-            
-            # Get web search results
-            search_results = st.session_state.web_search_results
-            
-            # Prepare evaluation prompt with JSON output format
-            evaluation_results = {}
-            
-            st.write("Analyzing statements for factual accuracy...")
-            
-            # Process statements in batches to avoid long prompts
-            batch_size = 3
-            for i in range(0, len(statements), batch_size):
-                batch = statements[i:i+batch_size]
-                batch_nums = list(range(i+1, i+len(batch)+1))
-                
-                # Create evaluation prompt for this batch
-                evaluation_prompt = create_json_evaluation_prompt(
-                    batch, 
-                    batch_nums,
-                    search_results
-                )
-                
-                st.write(f"Evaluating statements {batch_nums[0]}-{batch_nums[-1]}...")
-                
-                # Send to LLM for evaluation
-                model = st.session_state.model
-                messages = [{"role": "user", "content": evaluation_prompt}]
-                evaluation_stream = generate_response(model, messages)
-                
-                evaluation_response = ""
-                for token in stream_parser(evaluation_stream):
-                    if token:
-                        evaluation_response += token
-                
-                # Parse JSON response
-                batch_results = parse_json_evaluation(evaluation_response)
-                evaluation_results.update(batch_results)
-            
-            # Apply highlighting
-            highlighted_response = apply_highlighting(response_text, statements, evaluation_results)
-            status.update(label="Evaluation complete", state="complete", expanded=False)
+        # Perform evaluation (batches run concurrently with JSON-constrained output)
+        done = render_events(ChatClient.stream_evaluation(
+            user_id,
+            st.session_state.active_session_id,
+            st.session_state.model,
+            st.session_state.pending_evaluation,
+            st.session_state.web_search_results
+        ))
         
         # Display highlighted response
-        with st.chat_message("assistant"):
-            st.markdown(highlighted_response)
-            
-            # Save highlighted response
-            PostgresManager.add_message(
-                st.session_state.active_session_id, 
-                "assistant", 
-                highlighted_response
-            )
-            RedisManager.update_recent_context(
-                st.session_state.active_session_id, 
-                "assistant", 
-                highlighted_response
-            )
+        if done:
+            with st.chat_message("assistant"):
+                st.markdown(done["response"])
             
             # Reset evaluation state
             st.session_state.pending_evaluation = None
@@ -217,300 +185,146 @@ def main():
     img_data = None
     if st.session_state.model == "granite3.2-vision":
         img_data = st.file_uploader('Upload a PNG image', type=['png', 'jpg', 'jpeg'])
+    else:
+        doc_data = st.file_uploader('Upload a document', type=Config.DOCUMENT_TYPES)
+        # Each upload is saved and indexed once; later reruns see the same file_id
+        if doc_data is not None and st.session_state.get("ingested_file_id") != doc_data.file_id:
+            # Recorded before the attempt, so a failed ingest (already reported) is not retried on every rerun;
+            # uploading the file again retries it
+            st.session_state.ingested_file_id = doc_data.file_id
+            doc_data.seek(0)
+            document_id = save_upload(doc_data, doc_data.name)
+            render_events(ChatClient.stream_ingest(
+                user_id,
+                st.session_state.active_session_id,
+                st.session_state.model,
+                document_id,
+                doc_data.name,
+                doc_data.type or "application/octet-stream"
+            ))
+    
+    # Downsize, re-encode and store each upload once when it is sent, not on every rerun
+    prepared_image = None
+    if img_data is not None and user_prompt:
+        if st.session_state.get("prepared_image_id") != img_data.file_id:
+            st.session_state.prepared_image = prepare_image(img_data.getvalue(), img_data.name, img_data.type)
+            st.session_state.prepared_image_id = img_data.file_id
+        prepared_image = st.session_state.prepared_image
             
     # Handle user input
     if user_prompt and st.session_state.evaluation_stage is None:
         model = st.session_state.model
         
-        # Create session if not exists
-        if not st.session_state.active_session_id:
-            session_id = PostgresManager.create_chat_session(
-                user_id, 
-                model, 
-                title=user_prompt[:50] + "..." if len(user_prompt) > 50 else user_prompt
-            )
-            st.session_state.active_session_id = session_id
-        
         # Display user message
         with st.chat_message("user"):
             st.markdown(user_prompt)
         
-        # Save user message to DB
-        PostgresManager.add_message(st.session_state.active_session_id, "user", user_prompt)
-        
-        # Update Redis context
-        RedisManager.update_recent_context(
+        # Tool selection, search, generation and persistence run in the chat pipeline (in-process or via the chat API)
+        done = render_events(ChatClient.stream_turn(
+            user_id,
             st.session_state.active_session_id,
-            "user",
-            user_prompt
-        )
+            model,
+            user_prompt,
+            prepared_image
+        ))
         
-        cache_key = f"chat:{model}:{hashlib.md5(user_prompt.encode()).hexdigest()}"
-        cached_response = RedisManager.get_cached_response(cache_key)
-        
-        if cached_response:
-            with st.chat_message("assistant"):
-                st.markdown(cached_response)
-
-            PostgresManager.add_message(st.session_state.active_session_id, "assistant", cached_response)
-        else:
-            messages = RedisManager.get_recent_context(st.session_state.active_session_id)
-            if model == "granite3.2-vision":
-                with st.status("🛠️ Processing Image...", expanded=True) as tool_status:    
-                    messages = RedisManager.get_recent_context(st.session_state.active_session_id)
-                    
-                    # Process image upload
-                    vision_messages = messages.copy()
-                    if img_data:
-                        import base64
-                        img_bytes = img_data.read()
-                        img_base64 = base64.b64encode(img_bytes).decode('utf-8')
-                        
-                        if vision_messages and vision_messages[-1]['role'] == 'user':
-                            vision_messages[-1]['images'] = [img_base64]
-                        else:
-                            vision_messages.append({
-                                "role": "user",
-                                "content": user_prompt,
-                                "images": [img_base64]
-                            })
-                            
-                    tool_status.update(label="Processing image...", state="running")
-                    stream = ollama.chat(
-                        model=model,
-                        messages=vision_messages,
-                        stream=True
-                    )
-                    modified_user_message = None
-
-            # Qwen - Function Calling
-            elif model == "qwen2.5":
-                with st.status("🛠️ Processing tools...", expanded=True) as tool_status:
-                    # First status update for analysis
-                    st.write("🔍 Analyzing query for tool requirements...")
-                    tool_selection = select_tool(model, user_prompt)
-                    tool_name = tool_selection.get("tool", "none")
-                    tool_results = ""
-                    tool_context = None
-                    is_web_search = False  # Flag to track if we used web search
-                    search_results = None  # Store search results for evaluation
-
-                    if tool_name != "none":
-                        # Display selected tool
-                        st.write(f"🛠️ Selected tool: {tool_name.replace('_', ' ')}")
-                        
-                        # Define the status callback function
-                        def update_tool_status(message):
-                            st.write(message)
-                            
-                        parameters = tool_selection.get("parameters", {})
-                        tool_results = execute_tool(tool_name, parameters, st.session_state.active_session_id, update_tool_status)
-                        
-                        # Set web_search flag if applicable
-                        is_web_search = (tool_name == "web_search")
-                        
-                        # Save search results for evaluation if needed
-                        if is_web_search:
-                            # Assuming tool_results contains search results
-                            # This part depends on how your web search returns results
-                            try:
-                                search_results = tool_results
-                            except:
-                                search_results = f"Search results: {tool_results}"
-                        
-                        # Build tool context
-                        if tool_name == "calculator":
-                            tool_context = Config.CALCULATOR_CONTEXT
-                        elif tool_name == "web_search":
-                            tool_context = Config.WEB_SEARCH_CONTEXT
-                        else:
-                            tool_context = Config.SYSTEM_PROMPT
-
-                    modified_user_message = [{
-                        "role": "user",
-                        "content": f"""**TOOL RESULTS FROM {tool_name.upper()}:**\n{tool_results}\n{tool_context}\n**USER QUERY:**\n{user_prompt}"""
-                    }]
-                    stream = generate_response(model, modified_user_message)
-                    tool_status.update(label="✅ Tool processing complete!", state="complete", expanded=False)
-
-            # DeepSeek - Thinking Tokens
-            elif model == "deepseek-r1:1.5b":
-                modified_user_message = messages + [{"role": "user", "content": user_prompt}]
-                stream = generate_response(model, modified_user_message)
-                is_web_search = False
-
-            # Default for other models
-            else:
-                modified_user_message = messages + [{"role": "user", "content": user_prompt}]
-                stream = generate_response(model, modified_user_message)
-                is_web_search = False
-
-            # Thinking Phase (DeepSeek Only)
-            if model == "deepseek-r1:1.5b":
-                with st.status("🧠 Thinking...", expanded=True) as status:
-                    try:
-                        thinking_response = ""
-                        thinking_container = st.empty()
-                        buffer = []
-                        
-                        for token in stream_parser(stream):
-                            buffer.append(token)
-                            if token == "<think>":
-                                buffer = []
-                            elif token == "</think>":
-                                break
-                            else:
-                                thinking_response += token
-                                thinking_container.markdown(thinking_response)
-
-                        status.update(label="Thinking complete", state="complete", expanded=False)
-                        
-                    except Exception as e:
-                        status.update(label=f"Error: {str(e)}", state="error", expanded=True)
-
-            # Display Final Response
-            with st.chat_message("assistant"):
-                output_response = r""
-                output_placeholder = st.empty()
-                
-                for token in stream_parser(stream):
-                    if token and token not in ["<think>", "</think>"]:
-                        output_response += token
-                        output_placeholder.markdown(output_response)
-            
-            # Cache response
-            RedisManager.cache_response(cache_key, output_response)
-            
-            # If web search was used, enter evaluation stage
-            if model == "qwen2.5":
-                if is_web_search:
-                    st.session_state.pending_evaluation = output_response
-                    st.session_state.web_search_results = search_results
-                    st.session_state.evaluation_stage = "pending"
-                    st.rerun()
-                else:
-                    PostgresManager.add_message(st.session_state.active_session_id, "assistant", output_response)
-                    RedisManager.update_recent_context(st.session_state.active_session_id, "assistant", output_response)
-            else:
-                # Save to DB for non-web search responses
-                PostgresManager.add_message(st.session_state.active_session_id, "assistant", output_response)
-                RedisManager.update_recent_context(st.session_state.active_session_id, "assistant", output_response)
-
-# Helper functions for evaluation
-def break_into_statements(text):
-    """
-    Break text into individual statements for evaluation.
-    This is a simple implementation - for production, you might want more sophisticated sentence parsing.
-    """
-    # Split by periods, exclamation points, and question marks
-    sentences = []
-    current_sentence = ""
-    
-    for char in text:
-        current_sentence += char
-        if char in ['.', '!', '?'] and len(current_sentence.strip()) > 0:
-            sentences.append(current_sentence.strip())
-            current_sentence = ""
-    
-    # Add any remaining text as a sentence
-    if current_sentence.strip():
-        sentences.append(current_sentence.strip())
-    
-    # Filter out very short statements, headings, or other non-factual content
-    return [s for s in sentences if len(s.split()) > 3 and not s.startswith('#')]
-
-def create_json_evaluation_prompt(statements, statement_numbers, search_results):
-    """Create a prompt for the LLM to evaluate statements with JSON output"""
-    numbered_statements = [f"{i}. {statement}" for i, statement in zip(statement_numbers, statements)]
-    statements_text = "\n".join(numbered_statements)
+        # If web search was used, enter evaluation stage
+        if done and done["evaluation_pending"]:
+            st.session_state.pending_evaluation = done["response"]
+            st.session_state.web_search_results = done["search_results"]
+            st.session_state.evaluation_stage = "pending"
+            st.rerun()
     
-    return f"""You are a factual accuracy evaluator. 
-Evaluate each statement below against the provided search results to determine if it's accurate.
-
-SEARCH RESULTS:
-{search_results}
+    if st.session_state.debug_panel:
+        render_debug_panel()
 
-STATEMENTS TO EVALUATE:
-{statements_text}
-
-Provide your evaluation as a JSON object with the following structure:
-{{
-  "evaluations": [
-    {{
-      "statement_number": 1,
-      "is_accurate": true/false,
-      "confidence": "high/medium/low",
-      "explanation": "Brief explanation"
-    }},
-    ...
-  ]
-}}
-
-Only include the JSON object in your response, nothing else.
-"""
-
-def parse_json_evaluation(evaluation_response):
-    """
-    Parse the LLM's JSON evaluation response
-    Returns a dictionary mapping statement numbers to accuracy evaluations
-    """
-    # Extract JSON from response (in case there's other text)
-    try:
-        # Find JSON content (anything between braces)
-        json_start = evaluation_response.find('{')
-        json_end = evaluation_response.rfind('}') + 1
-        
-        if json_start >= 0 and json_end > 0:
-            json_content = evaluation_response[json_start:json_end]
-            data = json.loads(json_content)
-            
-            # Build the results dictionary
-            results = {}
-            if "evaluations" in data:
-                for eval_item in data["evaluations"]:
-                    statement_num = eval_item.get("statement_number")
-                    is_accurate = eval_item.get("is_accurate", True)
-                    
-                    if statement_num is not None:
-                        results[statement_num] = is_accurate
-            
-            return results
+def render_debug_panel():
+    """Per-call stats of the last turn and per-model aggregates"""
+    with st.expander("🔧 Model telemetry", expanded=True):
+        st.markdown("**Last turn**")
+        if st.session_state.last_call_stats:
+            st.dataframe(st.session_state.last_call_stats, hide_index=True)
         else:
-            # Fallback if no JSON brackets found
-            return {}
-            
-    except json.JSONDecodeError:
-        # Fallback with manual parsing in case JSON is malformed
-        results = {}
-        if "statement_number" in evaluation_response and "is_accurate" in evaluation_response:
-            lines = evaluation_response.split("\n")
-            for line in lines:
-                if "statement_number" in line and "is_accurate" in line:
-                    try:
-                        num_part = line.split("statement_number")[1].split(",")[0]
-                        num = int(''.join(filter(str.isdigit, num_part)))
-                        
-                        is_accurate = "true" in line.lower() and "false" not in line.lower()
-                        results[num] = is_accurate
-                    except:
-                        continue
-        return results
+            st.caption("No model calls yet.")
+        summary = ChatClient.telemetry_summary()
+        st.markdown("**Per model**")
+        if summary["llm"]:
+            st.dataframe(summary["llm"], hide_index=True)
+        else:
+            st.caption("No aggregated telemetry available.")
+        if summary["embedding_cache"].get("hit_ratio") is not None:
+            cache = summary["embedding_cache"]
+            st.caption(
+                f"Embedding cache: {cache['hit_ratio']:.0%} hits ({cache['hits']}/{cache['hits'] + cache['misses']}), "
+                f"~{cache['cpu_seconds_saved']:.1f}s CPU saved"
+            )
 
-def apply_highlighting(text, statements, evaluation_results):
-    """
-    Apply highlighting to the original text based on evaluation results
-    """
-    highlighted_text = text
-    
-    # Replace statements that were marked as inaccurate (false)
-    for i, statement in enumerate(statements, 1):
-        if i in evaluation_results and not evaluation_results[i]:
-            # Mark false statements with red highlighting (using Streamlit markdown syntax)
-            highlighted_statement = f":red[:red-background[{statement}]]"
-            # Replace in the text, being careful about exact matches
-            highlighted_text = highlighted_text.replace(statement, highlighted_statement)
+def render_events(events):
+    """Render chat pipeline events as they arrive; returns the final "done" event, or None on error"""
+    queue_notice = st.empty()
+    progress_bar = None
+    step_status = None
+    thinking_status = None
+    thinking_renderer = None
+    output_renderer = None
+    call_stats = []
     
-    return highlighted_text
+    for event in events:
+        kind = event["type"]
+        if kind == "session":
+            st.session_state.active_session_id = event["session_id"]
+        elif kind == "queue":
+            # Queue position feedback while waiting for a free model slot
+            if event["position"]:
+                queue_notice.info(f"⏳ The model is busy, you are number {event['position']} in the queue...")
+            else:
+                queue_notice.empty()
+        elif kind == "status":
+            if step_status is None:
+                step_status = st.status(event.get("label", "Working..."), expanded=True)
+            if "text" in event:
+                step_status.write(event["text"])
+            if "label" in event:
+                expanded = event.get("state") != "complete"
+                step_status.update(label=event["label"], state=event.get("state", "running"), expanded=expanded)
+        elif kind == "reasoning":
+            # Thinking Phase (reasoning models only)
+            if thinking_status is None:
+                thinking_status = st.status("🧠 Thinking...", expanded=True)
+                thinking_renderer = StreamRenderer(thinking_status.empty(), name="thinking")
+            thinking_renderer.write(event["text"])
+        elif kind == "token":
+            if output_renderer is None:
+                if thinking_renderer is not None:
+                    thinking_renderer.close()
+                    thinking_status.update(label="Thinking complete", state="complete", expanded=False)
+                output_renderer = StreamRenderer(st.chat_message("assistant").empty(), name="response")
+            output_renderer.write(event["text"])
+        elif kind == "progress":
+            if progress_bar is None:
+                progress_bar = st.progress(0.0)
+            total = event["total_pages"]
+            fraction = min(event["pages"] / total, 1.0) if total else 0.0
+            progress_bar.progress(fraction, text=f"📄 {event['pages']}/{total or '?'} pages · "
+                                                 f"{event['chunks']} chunks · {event['pages_per_second']:.1f} pages/s")
+        elif kind == "stats":
+            call_stats.append({key: value for key, value in event.items() if key != "type"})
+        elif kind == "error":
+            queue_notice.empty()
+            if step_status is not None:
+                step_status.update(state="error", expanded=True)
+            st.error(event["message"])
+            return None
+        elif kind == "done":
+            if call_stats:
+                st.session_state.last_call_stats = call_stats
+            if thinking_renderer is not None and output_renderer is None:
+                thinking_renderer.close()
+                thinking_status.update(label="Thinking complete", state="complete", expanded=False)
+            if output_renderer is not None:
+                output_renderer.close()
+            return event
+    return None
 
 if __name__ == "__main__":
     PostgresManager.initialize_pool()
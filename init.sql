@@ -42,4 +42,7 @@ CREATE TABLE IF NOT EXISTS message_attachments (
 -- Indexes for performance optimization
 CREATE INDEX IF NOT EXISTS idx_chat_sessions_user_id ON chat_sessions(user_id);
 CREATE INDEX IF NOT EXISTS idx_messages_session_id ON messages(session_id);
-CREATE INDEX IF NOT EXISTS idx_message_attachments_message_id ON message_attachments(message_id);
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_message_attachments_message_id ON message_attachments(message_id);
+-- Rolling conversation summary (kept in sync with Redis by ConversationMemory)
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS summary TEXT;
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS summary_message_count INTEGER DEFAULT 0;
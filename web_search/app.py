@@ -1,66 +1,106 @@
 from fastapi import FastAPI
-from scrapers.generic_scraper import scrape_generic
-import requests
+from scrapers.browser_pool import BrowserPool
+from scrapers.http_scraper import create_client
+from scrapers.tiered_fetcher import TieredFetcher
+from searxng_client import SearxngClient, SearchError
+from contextlib import asynccontextmanager
 import asyncio
 from pydantic import BaseModel
+from typing import List
 import logging
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One Chromium for the life of the service instead of one per URL
+    app.state.browser_pool = BrowserPool()
+    await app.state.browser_pool.start()
+    app.state.http_client = create_client()
+    app.state.fetcher = TieredFetcher(app.state.http_client, app.state.browser_pool)
+    app.state.searxng = SearxngClient()
+    try:
+        yield
+    finally:
+        await app.state.searxng.aclose()
+        await app.state.http_client.aclose()
+        await app.state.browser_pool.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 class SearchRequest(BaseModel):
     query: str
     max_results: int = 3  # Default value
 
+class ScrapeRequest(BaseModel):
+    urls: List[str]
+
 # 1. Search Engine Scraper to Get URLs
 async def get_search_results(query: str, max_results=5):
     logger.info(f"Searching for: {query}")
     try:
-        # Add timeout to the request
-        response = requests.get(
-            "http://searxng:8080/",  # Use Docker service name
-            params={
-                "q": query,
-                "format": "json",
-                "categories": "general",
-                "language": "en-US",
-                "safesearch": "1",  # Enable safe search
-                "pageno": 1
-            },
-            headers={"User-Agent": "Mozilla/5.0"},  # Mimic browser
-            timeout=15  # 15 seconds timeout
-        )
+        data = await app.state.searxng.search({
+            "q": query,
+            "format": "json",
+            "categories": "general",
+            "language": "en-US",
+            "safesearch": "1",  # Enable safe search
+            "pageno": 1
+        })
         
-        # Check if the response is valid
-        if response.status_code != 200:
-            logger.error(f"SearXNG returned status code: {response.status_code}")
-            return []
-            
         # Extract URLs from results
-        try:
-            data = response.json()
-            results = data.get("results", [])
-            urls = [result["url"] for result in results[:max_results]]
-            
-            logger.info(f"Found {len(urls)} URLs")
-            return urls
-        except ValueError as e:
-            logger.error(f"Failed to parse JSON from SearXNG: {e}")
-            return []
+        results = data.get("results", [])
+        urls = [result["url"] for result in results[:max_results]]
+        
+        logger.info(f"Found {len(urls)} URLs")
+        return urls
     
-    except requests.exceptions.Timeout:
-        logger.error("SearXNG request timed out")
-        return []
-    except requests.exceptions.ConnectionError:
-        logger.error("Connection error to SearXNG")
+    except SearchError as e:
+        logger.error(f"SearXNG unavailable: {e}")
         return []
     except Exception as e:
         logger.error(f"SearXNG Error: {e}")
         return []
     
+async def scrape_urls(urls: List[str]):
+    """Scrape URLs concurrently; returns only results with content, or None on the global timeout"""
+    tasks = [app.state.fetcher.scrape(url) for url in urls]
+    
+    # Add a global timeout for all scraping tasks
+    try:
+        # Set a reasonable overall timeout (e.g., 45 seconds)
+        results = await asyncio.wait_for(
+            asyncio.gather(*tasks, return_exceptions=True),
+            timeout=45
+        )
+    except asyncio.TimeoutError:
+        logger.error("Global timeout reached while scraping URLs")
+        return None
+    
+    # Process results and handle exceptions
+    processed_results = []
+    for i, result in enumerate(results):
+        if isinstance(result, Exception):
+            logger.error(f"Error scraping {urls[i]}: {result}")
+            processed_results.append({
+                "url": urls[i],
+                "title": "",
+                "content": "",
+                "error": str(result),
+                "success": False
+            })
+        else:
+            processed_results.append(result)
+    
+    # Filter out empty or failed results
+    valid_results = [r for r in processed_results if r.get('success') and r.get('content')]
+    
+    if not valid_results:
+        logger.warning("No valid content was scraped from any URL")
+    return valid_results
+
 @app.post("/search")
 async def handle_search(request: SearchRequest): 
     try:
@@ -76,58 +116,53 @@ async def handle_search(request: SearchRequest):
             }
         
         # Step 2: Scrape all URLs concurrently, but with a timeout
-        tasks = [scrape_generic(url) for url in urls]
-        
-        # Add a global timeout for all scraping tasks
-        try:
-            # Set a reasonable overall timeout (e.g., 45 seconds)
-            results = await asyncio.wait_for(
-                asyncio.gather(*tasks, return_exceptions=True),
-                timeout=45
-            )
-            
-            # Process results and handle exceptions
-            processed_results = []
-            for i, result in enumerate(results):
-                if isinstance(result, Exception):
-                    logger.error(f"Error scraping {urls[i]}: {result}")
-                    processed_results.append({
-                        "url": urls[i],
-                        "title": "",
-                        "content": "",
-                        "error": str(result),
-                        "success": False
-                    })
-                else:
-                    processed_results.append(result)
-            
-            # Filter out empty or failed results
-            valid_results = [r for r in processed_results if r.get('success') and r.get('content')]
-            
-            if not valid_results:
-                logger.warning("No valid content was scraped from any URL")
-            
-            return {
-                "query": request.query,
-                "results": valid_results,
-                "total_urls": len(urls),
-                "successful_scrapes": len(valid_results),
-                "success": len(valid_results) > 0
-            }
-            
-        except asyncio.TimeoutError:
-            logger.error("Global timeout reached while scraping URLs")
+        valid_results = await scrape_urls(urls)
+        if valid_results is None:
             return {
                 "query": request.query,
                 "results": [],
                 "message": "Timeout while scraping URLs",
                 "success": False
             }
+        
+        return {
+            "query": request.query,
+            "results": valid_results,
+            "total_urls": len(urls),
+            "successful_scrapes": len(valid_results),
+            "success": len(valid_results) > 0
+        }
     
     except Exception as e:
         logger.error(f"Unexpected error in search handler: {e}")
         return {"error": str(e), "success": False}
 
+# Two-step variant for callers that cache pages: get the URLs, then scrape only the ones they miss
+@app.post("/search/urls")
+async def handle_search_urls(request: SearchRequest):
+    urls = await get_search_results(request.query, request.max_results)
+    return {"query": request.query, "urls": urls, "success": len(urls) > 0}
+
+@app.post("/scrape")
+async def handle_scrape(request: ScrapeRequest):
+    try:
+        valid_results = await scrape_urls(request.urls) if request.urls else []
+        if valid_results is None:
+            return {"results": [], "message": "Timeout while scraping URLs", "success": False}
+        return {
+            "results": valid_results,
+            "total_urls": len(request.urls),
+            "successful_scrapes": len(valid_results),
+            "success": len(valid_results) > 0
+        }
+    except Exception as e:
+        logger.error(f"Unexpected error in scrape handler: {e}")
+        return {"error": str(e), "success": False}
+
 @app.get("/health")
 def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {
+        "status": "healthy",
+        "browser_pool": app.state.browser_pool.stats(),
+        "fetch_tiers": app.state.fetcher.stats()
+    }
\ No newline at end of file
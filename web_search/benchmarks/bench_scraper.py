@@ -0,0 +1,145 @@
+# benchmarks/bench_scraper.py
+"""
+Scrape throughput and resident memory: a Chromium launched per URL (the previous
+scrape_generic), the shared BrowserPool, and the tiered fetcher (HTTP first, the
+pool only for pages that need it). Pages come from a local HTTP server serving
+generated articles; --spa-share of them, on a second loopback host, render their
+text with JavaScript (the tiered fetcher remembers tiers per host). Memory
+is the peak RSS of this process and all its children (Chromium), sampled every
+100 ms; Linux only.
+
+Run from the web_search directory: python benchmarks/bench_scraper.py [--urls 60 --concurrency 4 --spa-share 0.2]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from playwright.async_api import async_playwright
+from scrapers import generic_scraper
+from scrapers.browser_pool import BrowserPool, LAUNCH_ARGS
+from scrapers.http_scraper import create_client
+from scrapers.tiered_fetcher import TieredFetcher
+
+PARAGRAPH = "<p>" + "Headless browsers are expensive to start and cheap to reuse. " * 12 + "</p>"
+
+class ArticleHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/spa/"):
+            # Client-side rendered: the article only exists after the script runs
+            body = (f"<html><head><title>App {self.path}</title></head><body><div id=\"root\"></div><script>"
+                    f"document.getElementById('root').innerHTML = '<article>' + {PARAGRAPH!r}.repeat(20) + '</article>';"
+                    f"</script></body></html>").encode()
+        else:
+            body = (f"<html><head><title>Article {self.path}</title></head><body><article>"
+                    f"{PARAGRAPH * 20}</article></body></html>").encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def tree_rss_mb(root=os.getpid()):
+    """Summed VmRSS of a process and its descendants, from /proc"""
+    children = {}
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            children.setdefault(ppid, []).append(int(pid))
+        except (OSError, ValueError, IndexError):
+            continue
+    total, stack = 0, [root]
+    while stack:
+        pid = stack.pop()
+        stack.extend(children.get(pid, []))
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+        except (OSError, StopIteration):
+            continue
+    return total / 1024
+
+async def sample_peak(peak, stop):
+    while not stop.is_set():
+        peak[0] = max(peak[0], tree_rss_mb())
+        await asyncio.sleep(0.1)
+
+async def scrape_with_launch(url):
+    """The previous scraper: a whole Chromium per URL"""
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True, args=LAUNCH_ARGS)
+        try:
+            context = await browser.new_context(viewport={"width": 1280, "height": 720})
+            page = await context.new_page()
+            await page.goto(url, timeout=30000, wait_until="domcontentloaded")
+            return bool(await page.content())
+        finally:
+            await browser.close()
+
+async def scrape_with_pool(url, pool):
+    return (await generic_scraper.scrape_generic(url, pool))["success"]
+
+async def scrape_with_fetcher(url, fetcher):
+    result = await fetcher.scrape(url)
+    return result["success"] and bool(result.get("content"))
+
+async def run(name, scrape, urls, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    async def bounded(url):
+        async with semaphore:
+            return await scrape(url)
+
+    peak, stop = [tree_rss_mb()], asyncio.Event()
+    sampler = asyncio.ensure_future(sample_peak(peak, stop))
+    started = time.perf_counter()
+    results = await asyncio.gather(*(bounded(url) for url in urls))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await sampler
+    print(f"{name:>7}: {len(urls) / elapsed:6.2f} pages/s, {sum(results)}/{len(urls)} ok, "
+          f"peak RSS {peak[0]:7.1f} MB")
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--urls", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--spa-share", type=float, default=0.2)
+    args = parser.parse_args()
+
+    servers = [ThreadingHTTPServer((host, 0), ArticleHandler) for host in ("127.0.0.1", "127.0.0.2")]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    article_base, spa_base = (f"http://{host}:{port}" for host, port in (server.server_address for server in servers))
+    spa_every = round(1 / args.spa_share) if args.spa_share else 0
+    urls = [f"{spa_base}/spa/{i}" if spa_every and i % spa_every == 0 else f"{article_base}/article/{i}"
+            for i in range(args.urls)]
+    generic_scraper.NAVIGATION_DELAY = (0, 0)  # Measure the browser, not the politeness delay
+
+    print(f"Idle RSS {tree_rss_mb():.1f} MB; {args.urls} pages, {args.concurrency} at a time")
+    await run("launch", scrape_with_launch, urls, args.concurrency)
+
+    pool = BrowserPool(size=args.concurrency)
+    await pool.start()
+    try:
+        await run("pool", lambda url: scrape_with_pool(url, pool), urls, args.concurrency)
+        print(f"   pool: {pool.stats()}")
+        async with create_client() as client:
+            fetcher = TieredFetcher(client, pool)
+            await run("tiered", lambda url: scrape_with_fetcher(url, fetcher), urls, args.concurrency)
+            print(f" tiered: {fetcher.stats()}")
+    finally:
+        await pool.stop()
+        for server in servers:
+            server.shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(main())
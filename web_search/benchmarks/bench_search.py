@@ -0,0 +1,118 @@
+# benchmarks/bench_search.py
+"""
+Load test of /search/urls against stub SearXNG instances: local HTTP servers that
+answer after --latency to 3x --latency ms and, like SearXNG, redirect queries sent
+to "/" to /search. The clients are pointed at "/", so the redirect is exercised.
+Compares the previous blocking requests.get lookup, which stalls the event loop,
+with the shared async client, with and without fan-out across --instances stubs. Reports requests per second
+and latency percentiles at --concurrency requests in flight. The app runs
+in-process through httpx's ASGI transport, so no browser is started.
+
+Run from the web_search directory: python benchmarks/bench_search.py [--requests 200 --concurrency 20 --latency 100]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import app as app_module
+from searxng_client import SearxngClient
+
+LATENCY = [0.1]  # Seconds, set from --latency
+
+class StubSearxng(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like SearXNG behind its web server
+
+    def do_GET(self):
+        path, _, query = self.path.partition("?")
+        if path != "/search":
+            # Like SearXNG, the index route redirects queries to /search
+            self.send_response(308 if path == "/" and query else 404)
+            if path == "/" and query:
+                self.send_header("Location", f"/search?{query}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        time.sleep(random.uniform(LATENCY[0], 3 * LATENCY[0]))
+        body = json.dumps({"results": [{"url": f"https://example.com/{i}"} for i in range(10)]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def blocking_search(requests, base_url):
+    """The previous lookup: requests.get inside an async handler"""
+    async def get_search_results(query, max_results=5):
+        response = requests.get(base_url, params={"q": query, "format": "json"}, timeout=15)
+        return [result["url"] for result in response.json()["results"][:max_results]]
+    return get_search_results
+
+async def load(name, requests_total, concurrency):
+    transport = httpx.ASGITransport(app=app_module.app)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://web-search", timeout=60) as client:
+        async def one(i):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/search/urls", json={"query": f"query {i}", "max_results": 3})
+                latencies.append(time.perf_counter() - started)
+                return response.json().get("success", False)
+
+        started = time.perf_counter()
+        ok = sum(await asyncio.gather(*(one(i) for i in range(requests_total))))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(f"{name:>14}: {requests_total / elapsed:7.1f} req/s, {ok}/{requests_total} ok, "
+          f"p50 {latencies[len(latencies) // 2] * 1000:6.0f} ms p95 {latencies[int(len(latencies) * 0.95)] * 1000:6.0f} ms")
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=100, help="Minimum stub response time in ms")
+    parser.add_argument("--instances", type=int, default=2)
+    args = parser.parse_args()
+    LATENCY[0] = args.latency / 1000
+
+    servers = [ThreadingHTTPServer(("127.0.0.1", 0), StubSearxng) for _ in range(args.instances)]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    urls = [f"http://127.0.0.1:{server.server_port}/" for server in servers]
+    async_search = app_module.get_search_results
+
+    try:
+        try:
+            import requests
+        except ImportError:
+            print(f"{'blocking':>14}: requests not installed")
+        else:
+            app_module.get_search_results = blocking_search(requests, urls[0])
+            # The blocking client serialises everything, so fewer requests keep the run short
+            await load("blocking", max(args.concurrency, args.requests // 10), args.concurrency)
+            app_module.get_search_results = async_search
+
+        for name, fanout in [("async", False), ("async fan-out", True)]:
+            app_module.app.state.searxng = SearxngClient(urls=urls, fanout=fanout)
+            try:
+                await load(name, args.requests, args.concurrency)
+            finally:
+                await app_module.app.state.searxng.aclose()
+    finally:
+        for server in servers:
+            server.shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(main())
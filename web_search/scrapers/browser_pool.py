@@ -0,0 +1,194 @@
+import os
+import re
+import random
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = int(os.getenv("SCRAPER_POOL_SIZE", "4"))  # Pages loading at once, one reusable context each
+MAX_PAGES_PER_BROWSER = int(os.getenv("SCRAPER_MAX_PAGES_PER_BROWSER", "200"))  # Restart Chromium to shed leaked memory
+
+LAUNCH_ARGS = [
+    "--no-sandbox",
+    "--disable-setuid-sandbox",
+    "--disable-dev-shm-usage",  # Overcome limited Docker resource issues
+    "--disable-gpu",
+    "--disable-software-rasterizer",
+    "--disable-extensions"
+]
+
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.101 Safari/537.36"
+]
+
+# Only text is extracted, so images, media and fonts are never downloaded
+BLOCKED_RESOURCES = re.compile(r"\.(png|jpe?g|gif|webp|avif|svg|ico|bmp|mp4|webm|mp3|woff2?|ttf|otf)(\?.*)?$", re.IGNORECASE)
+
+class _Browser:
+    """One Chromium process; retired browsers are closed once their last page is returned"""
+    def __init__(self, browser):
+        self.browser = browser
+        self.pages = 0
+        self.leases = 0
+        self.retired = False
+        self.closed = False
+
+class _Lease:
+    def __init__(self, owner: _Browser, context, page):
+        self.owner = owner
+        self.context = context
+        self.page = page
+
+class BrowserPool:
+    """
+    Long-lived Chromium shared by all scrapes. Pages are handed out through a
+    semaphore and their contexts are kept for reuse; the browser is replaced
+    after max_pages pages or when it crashes, without interrupting pages in flight.
+    """
+    def __init__(self, size: int = POOL_SIZE, max_pages: int = MAX_PAGES_PER_BROWSER):
+        self.size = size
+        self.max_pages = max_pages
+        self.pages_served = 0
+        self.restarts = 0
+        self._semaphore = asyncio.Semaphore(size)
+        self._lock = asyncio.Lock()
+        self._playwright = None
+        self._current = None
+        self._idle = []
+        self._in_use = 0
+
+    async def start(self):
+        self._playwright = await async_playwright().start()
+        async with self._lock:
+            await self._launch()
+
+    async def stop(self):
+        async with self._lock:
+            for lease in self._idle:
+                await self._close_context(lease)
+            self._idle.clear()
+            if self._current:
+                await self._close_browser(self._current)
+                self._current = None
+            if self._playwright:
+                await self._playwright.stop()
+                self._playwright = None
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "in_use": self._in_use,
+            "idle_contexts": len(self._idle),
+            "pages_served": self.pages_served,
+            "browser_restarts": self.restarts,
+        }
+
+    @asynccontextmanager
+    async def page(self):
+        """A pooled page for one scrape; at most `size` are out at once"""
+        async with self._semaphore:
+            lease = await self._acquire()
+            self._in_use += 1
+            reusable = False
+            try:
+                yield lease.page
+                reusable = True
+            finally:
+                self._in_use -= 1
+                await self._release(lease, reusable)
+
+    async def _launch(self):
+        browser = await self._playwright.chromium.launch(headless=True, args=LAUNCH_ARGS)
+        owner = _Browser(browser)
+        browser.on("disconnected", lambda _: self._on_disconnected(owner))
+        if self._current is not None:
+            self.restarts += 1
+        self._current = owner
+        logger.info(f"Launched Chromium {browser.version}")
+
+    def _on_disconnected(self, owner: _Browser):
+        if not owner.closed:
+            logger.warning("Chromium disconnected, a new browser is launched for the next page")
+        owner.retired = True
+        owner.closed = True
+
+    async def _retire(self, owner: _Browser):
+        owner.retired = True
+        if owner.leases == 0:
+            await self._close_browser(owner)
+
+    async def _close_browser(self, owner: _Browser):
+        if owner.closed:
+            return
+        owner.closed = True
+        try:
+            await owner.browser.close()
+        except Exception as e:
+            logger.warning(f"Error closing Chromium: {e}")
+
+    @staticmethod
+    async def _close_context(lease: _Lease):
+        try:
+            await lease.context.close()
+        except Exception:
+            pass  # Already gone with its browser
+
+    async def _current_browser(self) -> _Browser:
+        owner = self._current
+        if owner.retired or not owner.browser.is_connected() or owner.pages >= self.max_pages:
+            if not owner.retired:
+                logger.info(f"Restarting Chromium after {owner.pages} pages")
+            await self._retire(owner)
+            await self._launch()
+        return self._current
+
+    async def _new_lease(self, owner: _Browser) -> _Lease:
+        context = await owner.browser.new_context(
+            user_agent=random.choice(USER_AGENTS),
+            viewport={"width": 1280, "height": 720},  # Reduced size to save resources
+            java_script_enabled=True,
+            ignore_https_errors=True  # Handle SSL certificate issues
+        )
+        await context.route(BLOCKED_RESOURCES, lambda route: route.abort())
+        return _Lease(owner, context, await context.new_page())
+
+    async def _acquire(self) -> _Lease:
+        async with self._lock:
+            owner = await self._current_browser()
+            lease = None
+            while self._idle and lease is None:
+                candidate = self._idle.pop()
+                if candidate.owner is owner and not candidate.page.is_closed():
+                    lease = candidate
+                else:
+                    await self._close_context(candidate)
+            if lease is None:
+                lease = await self._new_lease(owner)
+            owner.pages += 1
+            owner.leases += 1
+            self.pages_served += 1
+            return lease
+
+    async def _release(self, lease: _Lease, reusable: bool):
+        owner = lease.owner
+        if reusable and not owner.retired and not lease.page.is_closed():
+            try:
+                # Unload the last document and its state before the context idles
+                await lease.page.goto("about:blank")
+                await lease.context.clear_cookies()
+            except Exception:
+                reusable = False  # Crashed or hung page: replace its context
+        else:
+            reusable = False
+        if reusable and not owner.retired:
+            self._idle.append(lease)
+        else:
+            await self._close_context(lease)
+        owner.leases -= 1
+        if owner.retired and owner.leases == 0:
+            await self._close_browser(owner)
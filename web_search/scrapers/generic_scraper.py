@@ -1,5 +1,5 @@
-from playwright.async_api import async_playwright
 from selectolax.parser import HTMLParser
+from scrapers.browser_pool import BrowserPool
 import random
 import asyncio
 import logging
@@ -8,44 +8,49 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-USER_AGENTS = [
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36",
-    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.101 Safari/537.36"
-]
+# Politeness delay before each navigation (seconds)
+NAVIGATION_DELAY = (0.5, 1.5)
 
-async def scrape_generic(url: str):
+def extract_content(html: str):
+    """(title, main text) of an HTML document, the text truncated to 5000 characters"""
+    tree = HTMLParser(html)
+    # Inline code would otherwise count as text (and hide pages rendered client-side)
+    tree.strip_tags(["script", "style", "noscript"])
+    
+    # Extract title
+    title = tree.css_first("title").text() if tree.css_first("title") else ""
+    logger.info(f"Extracted title: {title[:50]}...")
+    
+    # Improved content extraction
+    content_node = (
+        tree.css_first("article") or
+        tree.css_first("main") or
+        tree.css_first("div#content") or
+        tree.css_first("div.content") or
+        tree.css_first("body")
+    )
+    
+    content = ""
+    if content_node:
+        # Process content with paragraphs
+        paragraphs = content_node.css("p")
+        if paragraphs:
+            content = " ".join([p.text(strip=True) for p in paragraphs if p.text(strip=True)])
+        else:
+            content = content_node.text(deep=True, separator=" ", strip=True)
+        
+        content = content[:5000]  # Truncate
+    return title, content
+
+async def scrape_generic(url: str, pool: BrowserPool):
     logger.info(f"Starting to scrape: {url}")
+    # Random delay, waited out before taking a page so it does not hold a pool slot
+    await asyncio.sleep(random.uniform(*NAVIGATION_DELAY))
     try:
-        async with async_playwright() as p:
-            # Additional browser launch args to help with Docker environments
-            browser = await p.chromium.launch(
-                headless=True,
-                args=[
-                    "--no-sandbox", 
-                    "--disable-setuid-sandbox",
-                    "--disable-dev-shm-usage",  # Overcome limited Docker resource issues
-                    "--disable-gpu",
-                    "--disable-software-rasterizer",
-                    "--disable-extensions"
-                ]
-            )
-            
-            context = await browser.new_context(
-                user_agent=random.choice(USER_AGENTS),
-                viewport={"width": 1280, "height": 720},  # Reduced size to save resources
-                java_script_enabled=True,
-                ignore_https_errors=True  # Handle SSL certificate issues
-            )
-            
-            # Add timeout for the entire operation
+        async with pool.page() as page:
             try:
-                page = await context.new_page()
                 logger.info(f"Navigating to URL: {url}")
                 
-                # Reduce initial random delay
-                await asyncio.sleep(random.uniform(0.5, 1.5))
-                
                 # Set a reasonable timeout and handle navigation timeouts
                 response = await page.goto(
                     url, 
@@ -70,31 +75,7 @@ async def scrape_generic(url: str):
                     # Continue anyway, we might have partial content
                 
                 html = await page.content()
-                tree = HTMLParser(html)
-                
-                # Extract title
-                title = tree.css_first("title").text() if tree.css_first("title") else ""
-                logger.info(f"Extracted title: {title[:50]}...")
-                
-                # Improved content extraction
-                content_node = (
-                    tree.css_first("article") or
-                    tree.css_first("main") or
-                    tree.css_first("div#content") or
-                    tree.css_first("div.content") or
-                    tree.css_first("body")
-                )
-                
-                content = ""
-                if content_node:
-                    # Process content with paragraphs
-                    paragraphs = content_node.css("p")
-                    if paragraphs:
-                        content = " ".join([p.text(strip=True) for p in paragraphs if p.text(strip=True)])
-                    else:
-                        content = content_node.text(deep=True, separator=" ", strip=True)
-                    
-                    content = content[:5000]  # Truncate
+                title, content = extract_content(html)
                 
                 logger.info(f"Content length: {len(content)} chars")
                 
@@ -114,8 +95,6 @@ async def scrape_generic(url: str):
             except Exception as e:
                 logger.error(f"Error scraping {url}: {e}")
                 return {"url": url, "error": str(e), "success": False}
-            finally:
-                await context.close()
         
     except Exception as e:
         logger.error(f"Critical error with Playwright: {e}")
@@ -0,0 +1,69 @@
+import os
+import re
+import random
+import logging
+import httpx
+from scrapers.browser_pool import USER_AGENTS
+from scrapers.generic_scraper import extract_content
+
+logger = logging.getLogger(__name__)
+
+MAX_RESPONSE_BYTES = int(os.getenv("SCRAPER_MAX_RESPONSE_BYTES", str(2 * 1024 * 1024)))  # Stop reading bigger pages here
+MIN_CONTENT_CHARS = int(os.getenv("SCRAPER_MIN_CONTENT_CHARS", "400"))  # Shorter extractions go to the browser
+HTML_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+FINAL_STATUSES = {404, 410}  # A browser would get the same answer
+
+# Interstitials that ask for JavaScript or a bot check instead of showing the page
+JS_GATE = re.compile(
+    r"enable javascript|javascript is (required|disabled)|requires javascript|checking your browser|just a moment",
+    re.IGNORECASE
+)
+
+def create_client() -> httpx.AsyncClient:
+    """Pooled HTTP/2 client for page fetches; brotli/gzip/deflate are decoded on the fly"""
+    return httpx.AsyncClient(
+        http2=True,
+        follow_redirects=True,
+        max_redirects=5,
+        timeout=httpx.Timeout(10.0, connect=5.0),
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=30),
+        headers={
+            "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.5",
+            "Accept-Language": "en-US,en;q=0.8",
+        },
+        verify=False  # Same as the browser's ignore_https_errors
+    )
+
+async def scrape_http(url: str, client: httpx.AsyncClient):
+    """
+    Fetch and parse a page without a browser. Failures that a browser could fix
+    (JS-rendered or gated pages, bot walls, short or empty text) carry "escalate": True.
+    """
+    try:
+        async with client.stream("GET", url, headers={"User-Agent": random.choice(USER_AGENTS)}) as response:
+            if response.status_code >= 400:
+                logger.warning(f"HTTP status {response.status_code} for {url}")
+                return {"url": url, "error": f"HTTP status {response.status_code}", "success": False,
+                        "escalate": response.status_code not in FINAL_STATUSES}
+            content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+            if content_type and content_type not in HTML_TYPES:
+                return {"url": url, "error": f"Unsupported content type {content_type}", "success": False, "escalate": False}
+
+            # Read at most MAX_RESPONSE_BYTES of decoded body, then drop the connection
+            body = bytearray()
+            async for chunk in response.aiter_bytes():
+                body.extend(chunk)
+                if len(body) >= MAX_RESPONSE_BYTES:
+                    logger.info(f"Truncated {url} at {MAX_RESPONSE_BYTES} bytes")
+                    break
+            html = bytes(body[:MAX_RESPONSE_BYTES]).decode(response.encoding or "utf-8", errors="replace")
+    except httpx.HTTPError as e:
+        logger.warning(f"HTTP fetch failed for {url}: {e!r}")
+        return {"url": url, "error": str(e) or type(e).__name__, "success": False, "escalate": True}
+
+    title, content = extract_content(html)
+    # Pages that render their text client-side come back nearly empty; gates say so up front
+    if len(content) < MIN_CONTENT_CHARS or JS_GATE.search(f"{title} {content[:300]}"):
+        return {"url": url, "error": f"JavaScript-rendered or gated page ({len(content)} chars)", "success": False, "escalate": True}
+    logger.info(f"Content length: {len(content)} chars")
+    return {"url": url, "title": title, "content": content, "success": True}
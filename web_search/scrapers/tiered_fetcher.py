@@ -0,0 +1,73 @@
+import os
+import time
+import logging
+from collections import OrderedDict
+from urllib.parse import urlsplit
+import httpx
+from scrapers.browser_pool import BrowserPool
+from scrapers.generic_scraper import scrape_generic
+from scrapers.http_scraper import scrape_http
+
+logger = logging.getLogger(__name__)
+
+DOMAIN_MEMORY_SIZE = int(os.getenv("SCRAPER_DOMAIN_MEMORY_SIZE", "10000"))  # Domains remembered, least recent dropped first
+DOMAIN_MEMORY_TTL = int(os.getenv("SCRAPER_DOMAIN_MEMORY_TTL", "86400"))  # Seconds before a browser-only domain gets HTTP again
+
+class TieredFetcher:
+    """
+    Scrapes with plain HTTP first and hands a page to the browser pool only when the
+    HTTP tier says a browser could do better. The tier that worked is remembered per
+    domain, so known JavaScript-heavy sites skip the HTTP attempt until the entry expires.
+    """
+    def __init__(self, client: httpx.AsyncClient, pool: BrowserPool,
+                 max_domains: int = DOMAIN_MEMORY_SIZE, ttl: int = DOMAIN_MEMORY_TTL):
+        self.client = client
+        self.pool = pool
+        self.max_domains = max_domains
+        self.ttl = ttl
+        self._domains = OrderedDict()  # domain -> (tier, time recorded)
+        self.counts = {"http": 0, "escalated": 0, "browser_direct": 0, "failed": 0}
+
+    def stats(self):
+        browser_domains = sum(tier == "browser" for tier, _ in self._domains.values())
+        return {**self.counts, "domains": len(self._domains), "browser_domains": browser_domains}
+
+    def preferred_tier(self, domain: str) -> str:
+        entry = self._domains.get(domain)
+        if entry is None:
+            return "http"
+        tier, recorded = entry
+        if tier == "browser" and time.monotonic() - recorded > self.ttl:
+            del self._domains[domain]
+            return "http"
+        self._domains.move_to_end(domain)
+        return tier
+
+    def _remember(self, domain: str, tier: str):
+        self._domains[domain] = (tier, time.monotonic())
+        self._domains.move_to_end(domain)
+        while len(self._domains) > self.max_domains:
+            self._domains.popitem(last=False)
+
+    async def scrape(self, url: str):
+        domain = (urlsplit(url).hostname or "").lower()
+        direct = self.preferred_tier(domain) == "browser"
+        if not direct:
+            result = await scrape_http(url, self.client)
+            escalate = result.pop("escalate", False)
+            if result["success"]:
+                self.counts["http"] += 1
+                self._remember(domain, "http")
+                return result
+            if not escalate:
+                self.counts["failed"] += 1
+                return result
+            logger.info(f"Escalating {url} to the browser: {result['error']}")
+
+        result = await scrape_generic(url, self.pool)
+        if result.get("success") and result.get("content"):
+            self.counts["browser_direct" if direct else "escalated"] += 1
+            self._remember(domain, "browser")
+        else:
+            self.counts["failed"] += 1
+        return result
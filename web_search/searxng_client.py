@@ -0,0 +1,81 @@
+import os
+import random
+import asyncio
+import logging
+import httpx
+
+logger = logging.getLogger(__name__)
+
+SEARXNG_URLS = [url.strip() for url in os.getenv("SEARXNG_URLS", "http://searxng:8080/search").split(",") if url.strip()]
+SEARXNG_FANOUT = os.getenv("SEARXNG_FANOUT", "false").lower() == "true"  # Query every instance, use the first answer
+SEARXNG_RETRIES = int(os.getenv("SEARXNG_RETRIES", "2"))  # Extra attempts per instance
+SEARXNG_BACKOFF = float(os.getenv("SEARXNG_BACKOFF", "0.25"))  # Seconds, doubled per retry, full jitter
+SEARXNG_TIMEOUT = float(os.getenv("SEARXNG_TIMEOUT", "15"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class SearchError(Exception):
+    """Every SearXNG instance failed"""
+
+class SearxngClient:
+    """
+    Shared async client for SearXNG with keep-alive pooling. Each instance is
+    retried with jittered exponential backoff; with fan-out all instances are
+    queried at once and the first good answer wins, otherwise they are tried in turn.
+    """
+    def __init__(self, urls=None, fanout: bool = SEARXNG_FANOUT, retries: int = SEARXNG_RETRIES,
+                 backoff: float = SEARXNG_BACKOFF):
+        self.urls = urls or SEARXNG_URLS
+        self.fanout = fanout
+        self.retries = retries
+        self.backoff = backoff
+        self.client = httpx.AsyncClient(
+            follow_redirects=True,  # SearXNG answers queries on "/" with a 308 to /search
+            timeout=httpx.Timeout(SEARXNG_TIMEOUT, connect=5.0),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30),
+            headers={"User-Agent": "Mozilla/5.0"}  # Mimic browser
+        )
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def _query(self, base_url: str, params: dict) -> dict:
+        error = None
+        for attempt in range(self.retries + 1):
+            try:
+                response = await self.client.get(base_url, params=params)
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response.json()
+                error = f"HTTP status {response.status_code}"
+            except httpx.TransportError as e:
+                error = repr(e)
+            if attempt < self.retries:
+                delay = random.uniform(0, self.backoff * 2 ** attempt)
+                logger.warning(f"SearXNG {base_url} failed ({error}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+        raise SearchError(f"{base_url}: {error}")
+
+    async def search(self, params: dict) -> dict:
+        """SearXNG JSON response for the query params"""
+        if not self.fanout or len(self.urls) == 1:
+            errors = []
+            for base_url in random.sample(self.urls, len(self.urls)):
+                try:
+                    return await self._query(base_url, params)
+                except (SearchError, httpx.HTTPStatusError, ValueError) as e:
+                    errors.append(str(e))
+            raise SearchError("; ".join(errors))
+
+        tasks = [asyncio.ensure_future(self._query(base_url, params)) for base_url in self.urls]
+        try:
+            errors = []
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    return await next_done
+                except (SearchError, httpx.HTTPStatusError, ValueError) as e:
+                    errors.append(str(e))
+            raise SearchError("; ".join(errors))
+        finally:
+            for task in tasks:
+                task.cancel()